@@ -1,6 +1,5 @@
 import xml.etree.ElementTree as ET
 import requests
-import zipfile
 import time
 from datetime import datetime
 import os
@@ -8,6 +7,13 @@ import yaml
 import sys
 import smtplib
 from email.mime.text import MIMEText
+import http_session
+import token_cache
+import polling
+import project_cache
+import archive_utils
+import source_state
+import source_filters
 
 # Open the YAML file
 with open('config_sast.yaml', 'r') as file:
@@ -32,7 +38,52 @@ SMTP_password = config['SMTP_password']
 Email_from = config['Email_from']
 Email_subject = config['Email_subject']
 project_list = ""
+project_list_time = 0
 SAST_high_threshold = -1
+# Project name -> id cache and project list lifetime, a ttl of 0 disables them. Entries are scoped by API url and user
+SAST_cache_namespace = 'sast:' + SAST_api_url + ':' + SAST_username
+SAST_project_cache_file = config.get('SAST_project_cache_file', project_cache.default_cache_file)
+SAST_project_cache_ttl = config.get('SAST_project_cache_ttl', 86400)
+SAST_project_list_ttl = config.get('SAST_project_list_ttl', 600)
+# Optional file keeping the access tokens between runs
+SAST_token_cache_file = config.get('SAST_token_cache_file')
+# Shared session of the API calls, a token the server rejects with 401 is renewed and the request sent once more
+SAST_session = requests.Session()
+http_session.add_token_renewal(SAST_session, lambda access_token: token_cache.renew_token(access_token, SAST_token_cache_file))
+# Build the source zip in memory instead of next to the source folder, see archive_utils.new_spooled_buffer
+SAST_in_memory_zip = config.get('SAST_in_memory_zip', False)
+# Source zip compression, 'auto' stores already compressed files (jars, images, archives) as is, see archive_utils.open_zip
+SAST_zip_compression = config.get('SAST_zip_compression', 'auto')
+SAST_zip_compresslevel = config.get('SAST_zip_compresslevel')
+# Per-file (size, mtime, hash) state of the last completed scan of each project, used by incremental scans.
+# When set, every scan records the state, otherwise only incremental scans do, in source_state.default_state_dir
+SAST_source_state_dir = config.get('SAST_source_state_dir')
+# Incremental scans fall back to a full scan when more than this share of the files changed
+SAST_incremental_max_change_ratio = config.get('SAST_incremental_max_change_ratio', 0.3)
+# Files left out of the source zip, see source_filters.new_filter. Off by default, when SAST_source_filter is true
+# binaries and source_filters.sast_prune_dirs are skipped, the languages limit the zip to the sources of those languages
+SAST_source_filter = config.get('SAST_source_filter', False)
+SAST_source_languages = config.get('SAST_source_languages', [])
+SAST_source_exclude_extensions = config.get('SAST_source_exclude_extensions', [])
+SAST_source_max_file_size_mb = config.get('SAST_source_max_file_size_mb', 0)
+SAST_source_prune_dirs = config.get('SAST_source_prune_dirs')
+SAST_source_use_ignore_files = config.get('SAST_source_use_ignore_files', False)
+
+# Scan and report status polling, see polling.poll_until
+SAST_scan_poll_settings = {
+    'initial_delay': config.get('SAST_poll_initial_delay', 5),
+    'backoff_factor': config.get('SAST_poll_backoff_factor', 1.5),
+    'max_interval': config.get('SAST_poll_max_interval', 60),
+    'jitter': config.get('SAST_poll_jitter', 0.1),
+    'deadline': config.get('SAST_poll_deadline', 600)
+}
+SAST_report_poll_settings = {
+    'initial_delay': 1,
+    'backoff_factor': 1.5,
+    'max_interval': 10,
+    'jitter': 0.1,
+    'deadline': config.get('SAST_report_poll_deadline', 300)
+}
 
 def send_email(sender, email_recipients, subject, body, is_html=False):
     recipients_list = email_recipients.split(',')  # Split the email_recipients string into individual email addresses
@@ -99,10 +150,15 @@ def SAST_get_report(project_name, report_type, access_token="", start_time="", e
             report_id = SAST_post_report_request(access_token, scan_id, report_type)
             
             # Wait for report to be ready
-            status = 0
-            while status != 2:
-                status = SAST_get_report_status(access_token, report_id)
-                time.sleep(1)
+            status, poll_stats = polling.poll_until(
+                lambda: SAST_poll_report_status(access_token, report_id),
+                lambda status: status == 2,
+                name='report status',
+                **SAST_report_poll_settings
+            )
+            if poll_stats['timed_out']:
+                print(f"Report {report_id} was not ready within {SAST_report_poll_settings['deadline']} seconds")
+                return ""
 
             # Construct report URL
             headers = {
@@ -112,7 +168,7 @@ def SAST_get_report(project_name, report_type, access_token="", start_time="", e
             report_url = f"{SAST_api_url}/reports/sastScan/{report_id}"
             
             # Fetch report content
-            response = requests.get(report_url, headers=headers)
+            response = SAST_session.get(report_url, headers=headers)
 
             response.raise_for_status()  # Raise exception for non-200 status codes
             report_content = response.content
@@ -131,7 +187,7 @@ def SAST_get_report(project_name, report_type, access_token="", start_time="", e
         print(f"Exception: {e}")
         return ""
 
-def get_access_token(scope = 'sast_rest_api'):
+def request_access_token(scope = 'sast_rest_api'):
     try:
         payload = {
             'scope': scope,
@@ -148,11 +204,15 @@ def get_access_token(scope = 'sast_rest_api'):
         response = requests.post(SAST_auth_url, headers=headers, data=payload)
         response.raise_for_status()  # Raise exception for HTTP errors
         print(f'get_SAST_access_token ')
-        access_token = response.json()['access_token']
-        return access_token
+        return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Exception: get SAST access token failed: {e}")
-        return ""
+        return None
+
+def get_access_token(scope = 'sast_rest_api'):
+    # One cached token per scope, only requested again shortly before it expires
+    cache_key = f'sast:{SAST_auth_url}:{SAST_username}:{scope}'
+    return token_cache.get_token(cache_key, lambda: request_access_token(scope), SAST_token_cache_file)
 
 def get_projects(access_token=""):
 
@@ -166,7 +226,7 @@ def get_projects(access_token=""):
 
         url = f'{SAST_api_url}/projects'
 
-        response = requests.get(url, headers=headers)
+        response = SAST_session.get(url, headers=headers)
         response.raise_for_status()  # Raise exception for HTTP errors
         
         print('SAST_get_projects')
@@ -227,7 +287,7 @@ def create_project(project_name, access_token="", team_name=""):
         url = f'{SAST_api_url}/projects'  # Removed 'help/' from URL path
 
         # Make API request
-        response = requests.post(
+        response = SAST_session.post(
             url, 
             headers=headers, 
             json=payload, 
@@ -264,25 +324,50 @@ def create_project(project_name, access_token="", team_name=""):
         print(f"Exception in create_project: {e}")
         return 0
         
+def get_project_list(access_token, refresh=False):
+    global project_list, project_list_time
+
+    # The project list is fetched again once it is older than SAST_project_list_ttl
+    if(refresh or project_list == "" or time.time() - project_list_time > SAST_project_list_ttl):
+        projects = get_projects(access_token)
+        if projects != "":
+            project_list = projects
+            project_list_time = time.time()
+    return project_list
+
 def get_project_ID(project_name, access_token="", team_name=""):
-    global project_list
-    
+    projId = project_cache.get_cached(SAST_cache_namespace, project_name, 'id', SAST_project_cache_ttl, SAST_project_cache_file)
+    if projId:
+        return projId
+
     if(not access_token):
         access_token = get_access_token()
 
     try:
-        if(project_list == ""):
-            project_list = get_projects(access_token)
-        projects = project_list
+        previous_list_time = project_list_time
+        projects = get_project_list(access_token)
 
         projId = next((project['id'] for project in projects if project['name'] == project_name), 0)
+        if(projId == 0 and previous_list_time and project_list_time == previous_list_time):
+            # Refresh a list fetched earlier before creating a duplicate project
+            projects = get_project_list(access_token, refresh=True)
+            projId = next((project['id'] for project in projects if project['name'] == project_name), 0)
         if(projId == 0):
             projId = create_project(project_name, access_token, team_name)
     except Exception as e:
         print(f"Exception: SAST_get_project_ID: {e}")
         return ""
+
+    if projId:
+        project_cache.set_cached(SAST_cache_namespace, project_name, 'id', projId, SAST_project_cache_file)
     return projId
 
+def invalidate_project(project_name=None):
+    # Forget the cached id of a project (or of all projects) and the project list, e.g. after a rename or deletion
+    global project_list
+    project_list = ""
+    project_cache.invalidate(SAST_cache_namespace, project_name, cache_file=SAST_project_cache_file)
+
 def get_project_latest_scan_id(access_token, project_name, project_id=None):
     try:
         if(not access_token):
@@ -297,7 +382,7 @@ def get_project_latest_scan_id(access_token, project_name, project_id=None):
                 'Authorization': f'Bearer {access_token}'
             }
 
-            response = requests.get(url, headers=headers)
+            response = SAST_session.get(url, headers=headers)
             response.raise_for_status()  # Raise exception for HTTP errors
             
             response_json = response.json()
@@ -330,7 +415,7 @@ def SAST_get_project_latest_scan_comment(access_token, project_name):
             'Authorization': f'Bearer {access_token}'
         }
 
-        response = requests.get(url, headers=headers)
+        response = SAST_session.get(url, headers=headers)
         response.raise_for_status()  # Raise exception for HTTP errors
 
         response_json = response.json()
@@ -354,7 +439,7 @@ def SAST_post_report_request(access_token, sast_scan, report_type):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = SAST_session.post(url, headers=headers, json=payload)
         response.raise_for_status()  # Raise exception for HTTP errors
         
         response_json = response.json()
@@ -365,6 +450,12 @@ def SAST_post_report_request(access_token, sast_scan, report_type):
         return response_json.get('reportId', "")
 
 def SAST_get_report_status(access_token, report_id):
+    status_id, retry_after = SAST_poll_report_status(access_token, report_id)
+    return status_id
+
+def SAST_poll_report_status(access_token, report_id):
+    # Same as SAST_get_report_status, also returns the server Retry-After hint (or None)
+    retry_after = None
     try:
         headers = {
             'Authorization': f'Bearer {access_token}'
@@ -372,17 +463,17 @@ def SAST_get_report_status(access_token, report_id):
 
         url = f"{SAST_api_url}/reports/sastScan/{report_id}/status"
 
-        response = requests.get(url, headers=headers)
+        response = SAST_session.get(url, headers=headers)
+        retry_after = polling.get_retry_after(response)
         response.raise_for_status()  # Raise exception for       errors
         
         response_json = response.json()  # Parse the JSON response
         status_id = response_json.get("status", {}).get("id")
     except Exception as e:
         print(f"Exception: SAST_get_report_status: {e}")
-        return ""
+        return "", retry_after
     else:
-        print('SAST_get_report_status')
-        return status_id
+        return status_id, retry_after
 
 def SAST_get_scan_statistics(project_name, scan_id=0, access_token=""):
     """
@@ -427,7 +518,7 @@ def SAST_get_scan_statistics(project_name, scan_id=0, access_token=""):
         url = f"{SAST_api_url}/sast/scans/{scan_id_str}/resultsStatistics"
 
         try:
-            response = requests.get(url, headers=headers, proxies=proxy_servers, verify=False)
+            response = SAST_session.get(url, headers=headers, proxies=proxy_servers, verify=False)
             response.raise_for_status()  # Raise exception for HTTP errors
             
             report_content = response.json()
@@ -475,7 +566,7 @@ def SAST_get_scan_results(project_name, access_token = ""):
 
         url = f"{SAST_api_url}/sast/scans/{scan_id}/results"
 
-        response = requests.get(url, headers=headers)
+        response = SAST_session.get(url, headers=headers)
         response.raise_for_status()  # Raise exception for errors
 
         result_content = response.json()
@@ -498,7 +589,7 @@ def SAST_get_vulnerability_details(result_id, access_token = ""):
 
         url = f"{SAST_api_url}/sast/vulnerabilities/{result_id}"
 
-        response = requests.get(url, headers=headers)
+        response = SAST_session.get(url, headers=headers)
         response.raise_for_status()  # Raise exception for errors
 
         result_content = response.json()
@@ -520,7 +611,7 @@ def SAST_get_teams(access_token=""):
         }
         url = f"{SAST_api_url}/auth/teams"
 
-        response = requests.get(url, headers=headers, verify=False)
+        response = SAST_session.get(url, headers=headers, verify=False)
         response.raise_for_status()  # Raise HTTPError for bad responses (4xx and 5xx)
         teams_json = response.json()
 
@@ -553,7 +644,7 @@ def SAST_get_team_members(access_token="", team_id=0):
         headers = {'Authorization': f'Bearer {access_token}'}
         url = f"{SAST_api_url}/auth/teams/{team_id}/Users"
 
-        response = requests.get(url, headers=headers, proxies=proxy_servers, verify=False)
+        response = SAST_session.get(url, headers=headers, proxies=proxy_servers, verify=False)
         response.raise_for_status()  # Raise HTTPError for bad responses (4xx and 5xx)
         response_json = response.json()
     except requests.exceptions.RequestException as e:
@@ -700,7 +791,59 @@ def get_team_email_recipients(xml_team_full_path, team_id=0):
         print(f"Exception in get_team_email_recipients: {e}")
         return ""
         
-def upload_file(access_token, project_id, source_folder, isIncremental=False):
+def get_source_filter():
+    # Filter built from the SAST_source_* settings, None zips every file
+    if not SAST_source_filter:
+        return None
+    return source_filters.new_filter(
+        SAST_source_languages,
+        SAST_source_exclude_extensions,
+        int(SAST_source_max_file_size_mb * 1024 * 1024) if SAST_source_max_file_size_mb else None,
+        SAST_source_prune_dirs,
+        SAST_source_use_ignore_files
+    )
+
+def get_source_files(source_folder):
+    """Return the paths of the files to scan, relative to source_folder, filtered during the walk by get_source_filter."""
+    stats = source_filters.new_stats()
+    rel_paths = list(source_filters.walk_files(source_folder, get_source_filter(), stats))
+    source_filters.print_stats(stats)
+    return rel_paths
+
+def promote_pending_state(state, access_token):
+    # The files uploaded by an earlier run become the baseline once that scan completed, returns True when the state changed
+    pending = state.get('pending')
+    if not pending:
+        return False
+    status = SAST_get_scan_status(pending['scan_id'], access_token)
+    if status == 'Completed':
+        state['files'] = pending['files']
+    elif status not in ['Failed', 'Canceled']:
+        return False
+    del state['pending']
+    return True
+
+def get_changed_files(previous_files, current_files):
+    """
+    Select the files to upload for an incremental scan.
+
+    Deleted files cannot be expressed in an incremental upload, they only count towards the change ratio.
+
+    Returns:
+        list: Added and modified files, or None when a full scan is needed (no baseline or too many changes)
+    """
+    if not previous_files:
+        print("No state of a completed scan, running a full scan")
+        return None
+    added, modified, deleted = source_state.compare(previous_files, current_files)
+    change_ratio = (len(added) + len(modified) + len(deleted)) / max(1, len(previous_files))
+    print(f"{len(added)} added, {len(modified)} modified, {len(deleted)} deleted files since the last scan ({change_ratio:.1%})")
+    if change_ratio > SAST_incremental_max_change_ratio:
+        print(f"More than {SAST_incremental_max_change_ratio:.0%} of the files changed, running a full scan")
+        return None
+    return sorted(added + modified)
+
+def upload_file(access_token, project_id, source_folder, isIncremental=False, in_memory=None, file_list=None):
     """
     Zip a source folder and upload it for scanning.
     
@@ -709,6 +852,9 @@ def upload_file(access_token, project_id, source_folder, isIncremental=False):
         project_id (int): ID of the project to scan
         source_folder (str): Path to the source folder to scan
         isIncremental (bool, optional): Whether to perform an incremental scan. Defaults to False.
+        in_memory (bool, optional): Build the zip in a spooled buffer that only spills to a temporary
+            file when large, instead of next to the source folder. Defaults to SAST_in_memory_zip.
+        file_list (list, optional): Files to zip, relative to source_folder. Defaults to all files from get_source_files.
         
     Returns:
         str: Scan ID if successful, None if failed
@@ -721,25 +867,35 @@ def upload_file(access_token, project_id, source_folder, isIncremental=False):
         upload_url = f"{SAST_api_url}/sast/scanWithSettings"
 
         # Zip the source folder
+        if in_memory is None:
+            in_memory = SAST_in_memory_zip
         folder_name = os.path.basename(source_folder.rstrip('/\\'))
-        output_zip = os.path.join(os.path.dirname(source_folder), f"{folder_name}.zip")
-        
-        with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files in os.walk(source_folder):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    zipf.write(file_path, os.path.relpath(file_path, source_folder))
-        print(f"Folder '{source_folder}' zipped successfully into '{output_zip}'")
-        
-        # Check if zip file exists
-        if not os.path.exists(output_zip):
-            print(f"Error: Zip file '{output_zip}' does not exist.")
-            return None
+        zip_name = f"{folder_name}.zip"
+        if in_memory:
+            zip_target = archive_utils.new_spooled_buffer()
+        else:
+            output_zip = os.path.join(os.path.dirname(source_folder), zip_name)
+            zip_target = output_zip
+        
+        if file_list is None:
+            file_list = get_source_files(source_folder)
+        with archive_utils.open_zip(zip_target, SAST_zip_compression, SAST_zip_compresslevel) as zipf:
+            for rel_path in file_list:
+                archive_utils.add_file(zipf, os.path.join(source_folder, rel_path), rel_path)
+        if in_memory:
+            print(f"Folder '{source_folder}' zipped successfully in memory ({len(file_list)} files, {archive_utils.get_size(zip_target)} bytes)")
+        else:
+            print(f"Folder '{source_folder}' zipped successfully into '{output_zip}' ({len(file_list)} files)")
+        
+            # Check if zip file exists
+            if not os.path.exists(output_zip):
+                print(f"Error: Zip file '{output_zip}' does not exist.")
+                return None
 
-        # Read the zip file in binary mode
-        with open(output_zip, 'rb') as source_file:
+        # Read the zip file in binary mode, requests builds the multipart body from the complete archive
+        with (zip_target if in_memory else open(output_zip, 'rb')) as source_file:
             files = {
-                "zippedSource": (os.path.basename(output_zip), source_file, "application/octet-stream")
+                "zippedSource": (zip_name, archive_utils.get_upload_body(source_file) if in_memory else source_file, "application/octet-stream")
             }
             headers = {
                 "Accept": "application/json;v=1.0",
@@ -752,8 +908,8 @@ def upload_file(access_token, project_id, source_folder, isIncremental=False):
             }
 
             # Make the POST request
-            print(f"Uploading file: {output_zip} to {upload_url}")
-            upload_response = requests.post(upload_url, headers=headers, data=data, files=files)
+            print(f"Uploading file: {zip_name} to {upload_url}")
+            upload_response = SAST_session.post(upload_url, headers=headers, data=data, files=files)
            
             if upload_response.status_code != 201:
                 print(f"Upload failed with status {upload_response.status_code}: {upload_response.text}")
@@ -806,7 +962,7 @@ def SAST_get_scan_status(scan_id, access_token=""):
             'Authorization': f'Bearer {access_token}'
         }
 
-        response = requests.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
+        response = SAST_session.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
         
         # Check for HTTP errors
         response.raise_for_status()
@@ -838,7 +994,33 @@ def SAST_get_scan_status(scan_id, access_token=""):
         print(f"Exception in SAST_get_scan_status: {e}")
         return ""
             
-def scan_source_folder(project_name, source_folder, team_name='', incremental=False):
+def check_scan_threshold(project_name, scan_id, access_token):
+    """
+    Compare the high vulnerability count of a scan with SAST_high_threshold.
+
+    Args:
+        project_name (str): Name of the project
+        scan_id (int): Scan ID, 0 for the latest scan of the project
+        access_token (str): Access token
+
+    Returns:
+        int: 1 if high vulnerabilities exceed threshold, 0 below threshold, None on errors
+    """
+    try:
+        high_vulnerability_count, medium_vulnerability_count, created_at = SAST_get_scan_statistics(project_name, scan_id, access_token)
+        print(f'high = {high_vulnerability_count}')
+        print(f'medium = {medium_vulnerability_count}')
+        
+        # Check against threshold
+        if high_vulnerability_count > SAST_high_threshold:
+            return 1
+        return 0  # Explicitly return 0 for successful scan below threshold
+        
+    except Exception as e:
+        print(f"Error getting scan statistics: {e}")
+        return None
+
+def scan_source_folder(project_name, source_folder, team_name='', incremental=False, in_memory=None):
     """
     Scan a source folder for vulnerabilities and check against threshold.
     
@@ -846,7 +1028,10 @@ def scan_source_folder(project_name, source_folder, team_name='', incremental=Fa
         project_name (str): Name of the project
         source_folder (str): Path to the source folder to scan
         team_name (str, optional): Team name. Defaults to ''.
-        incremental (bool, optional): Whether to perform an incremental scan. Defaults to False.
+        incremental (bool, optional): Whether to perform an incremental scan. Only the files added or modified
+            since the last completed scan are uploaded, with a full scan when there is no state of a completed
+            scan or more than SAST_incremental_max_change_ratio of the files changed. Defaults to False.
+        in_memory (bool, optional): Build the source zip in memory. Defaults to SAST_in_memory_zip.
         
     Returns:
         int: 1 if high vulnerabilities exceed threshold, 0 for successful scan below threshold, 
@@ -870,56 +1055,69 @@ def scan_source_folder(project_name, source_folder, team_name='', incremental=Fa
             print(f"Error: Failed to get project ID for project '{project_name}'")
             return None
             
+        # Per-file state of the last completed scan, incremental scans only upload the files that changed since.
+        # Hashing reads the whole tree once more, full scans skip it unless state tracking is configured
+        file_list = None
+        state_dir = SAST_source_state_dir or (source_state.default_state_dir if incremental else None)
+        state_file = source_state.get_state_file(state_dir, project_name) if state_dir else None
+        if state_file:
+            state = source_state.load_state(state_file)
+            if promote_pending_state(state, access_token):
+                source_state.save_state(state_file, state)
+            file_list = get_source_files(source_folder)
+            current_files = source_state.scan_files(source_folder, file_list, state.get('files'))
+
+            if incremental:
+                changed_files = get_changed_files(state.get('files'), current_files)
+                if changed_files is None:
+                    incremental = False
+                elif not changed_files:
+                    print("No source changes since the last scan, checking the results of the latest scan")
+                    if SAST_high_threshold is not None and SAST_high_threshold >= 0:
+                        return check_scan_threshold(project_name, 0, access_token)
+                    return 0
+                else:
+                    file_list = changed_files
+
         # Upload file and get scan ID
-        scan_id = upload_file(access_token, project_id, source_folder, incremental)
+        scan_id = upload_file(access_token, project_id, source_folder, incremental, in_memory, file_list)
         if not scan_id:
             print("Error: Failed to upload file and obtain scan ID")
+            # The cached project id may be stale, look it up again on the next run
+            invalidate_project(project_name)
             return None
+
+        if state_file:
+            # Becomes the baseline once the scan completed, checked by this or the next run
+            state['pending'] = {'scan_id': scan_id, 'files': current_files}
+            source_state.save_state(state_file, state)
             
         print(f'scan id = {scan_id}')
         print(f'SAST_high_threshold = {SAST_high_threshold}')
         
         # Check if threshold validation is needed
         if SAST_high_threshold is not None and SAST_high_threshold >= 0:
-            # Wait for scan completion
-            status = 'Running'
-            max_retries = 120  # 10 minutes with 5-second intervals
-            retries = 0
-            
-            while status != 'Completed' and retries < max_retries:
-                try:
-                    time.sleep(5)
-                    retries += 1
-                    status = SAST_get_scan_status(scan_id, access_token)
-                    print(f'scan status: {status}')
-                    
-                    # Check for failed or canceled scans
-                    if status in ['Failed', 'Canceled']:
-                        print(f"Scan ended with status: {status}")
-                        return None
-                        
-                except Exception as e:
-                    print(f"Error checking scan status: {e}")
-                    # Continue waiting, don't abort the loop
-            
+            # Wait for scan completion, stop early on failed or canceled scans
+            status, poll_stats = polling.poll_until(
+                lambda: SAST_get_scan_status(scan_id, access_token),
+                lambda status: status in ['Completed', 'Failed', 'Canceled'],
+                name='scan status',
+                **SAST_scan_poll_settings
+            )
+
+            if status in ['Failed', 'Canceled']:
+                print(f"Scan ended with status: {status}")
+                return None
+
             if status != 'Completed':
                 print(f"Scan did not complete within the maximum wait time")
                 return None
-                
-            # Get scan statistics
-            try:
-                high_vulnerability_count, medium_vulnerability_count, created_at = SAST_get_scan_statistics(project_name, scan_id, access_token)
-                print(f'high = {high_vulnerability_count}')
-                print(f'medium = {medium_vulnerability_count}')
-                
-                # Check against threshold
-                if high_vulnerability_count > SAST_high_threshold:
-                    return 1
-                return 0  # Explicitly return 0 for successful scan below threshold
-                
-            except Exception as e:
-                print(f"Error getting scan statistics: {e}")
-                return None
+
+            if state_file:
+                state['files'] = state.pop('pending')['files']
+                source_state.save_state(state_file, state)
+
+            return check_scan_threshold(project_name, scan_id, access_token)
         
         # If no threshold check is needed, return successful result
         return 0
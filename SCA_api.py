@@ -4,7 +4,13 @@ import os
 import yaml
 import smtplib
 from email.mime.text import MIMEText
-import time
+import http_session
+import token_cache
+import polling
+import project_cache
+import manifest_cache
+import archive_utils
+import risk_reports
 
 # Open the YAML file
 with open('config_sca.yaml', 'r') as file:
@@ -32,6 +38,38 @@ Email_from = config['Email_from']
 Email_subject = config['Email_subject']
 Email_body = config['Email_body']
 
+# Shared session, every SCA call reuses its pooled connections
+SCA_session = http_session.create_session(
+    pool_size=config.get('SCA_pool_size', 10),
+    keep_alive=config.get('SCA_keep_alive', True),
+    retries=config.get('SCA_retries', 3),
+    proxies=proxy_servers,
+    verify=False
+)
+
+# Optional file keeping the access token between runs
+SCA_token_cache_file = config.get('SCA_token_cache_file')
+SCA_token_cache_key = 'sca:' + SCA_auth_url + ':' + SCA_account + ':' + SCA_username
+# A token the server rejects with 401 is renewed and the request sent once more
+http_session.add_token_renewal(SCA_session, lambda access_token: token_cache.renew_token(access_token, SCA_token_cache_file))
+
+# Project name -> id / latestScanId cache, a ttl of 0 disables it. Entries are scoped by API url and account
+SCA_cache_namespace = 'sca:' + SCA_api_url + ':' + SCA_account
+SCA_project_cache_file = config.get('SCA_project_cache_file', project_cache.default_cache_file)
+SCA_project_cache_ttl = config.get('SCA_project_cache_ttl', 86400)
+SCA_scan_id_cache_ttl = config.get('SCA_scan_id_cache_ttl', 300)
+# Fingerprint and summary of the last scan of each project, reused with reuse_results
+SCA_last_scan_ttl = config.get('SCA_last_scan_ttl', 7 * 86400)
+
+# Scan status polling, see polling.poll_until
+SCA_poll_settings = {
+    'initial_delay': config.get('SCA_poll_initial_delay', 2),
+    'backoff_factor': config.get('SCA_poll_backoff_factor', 1.5),
+    'max_interval': config.get('SCA_poll_max_interval', 30),
+    'jitter': config.get('SCA_poll_jitter', 0.1),
+    'deadline': config.get('SCA_poll_deadline', 600)
+}
+
 # Function to send email
 def send_email(sender, email_recipients, subject, body):
     recipients_list = email_recipients.split(',')  # Split the email_recipients string into individual email addresses
@@ -55,7 +93,7 @@ def send_email(sender, email_recipients, subject, body):
     except Exception as e:
         print("Exception: Failed to send email:", str(e))
 
-def get_access_token():
+def request_access_token():
     try:
         payload = {
             'username': SCA_username,
@@ -70,15 +108,18 @@ def get_access_token():
             'Content-Type': 'application/x-www-form-urlencoded'
         }
 
-        response = requests.post(SCA_auth_url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
+        response = SCA_session.post(SCA_auth_url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
 
-        print('get_access_token - token = ' + response.text)
+        print('get_access_token')
         response.raise_for_status()  # Raise an HTTPError for bad responses
-        access_token = response.json()['access_token']
-        return access_token
+        return response.json()
     except requests.RequestException as e:
         print("Exception: Failed to get access token:", str(e))
-        return ""
+        return None
+
+def get_access_token():
+    # Cached token, only requested again shortly before it expires
+    return token_cache.get_token(SCA_token_cache_key, request_access_token, SCA_token_cache_file)
 
 def SCA_get_projects(access_token=""):
     if(not access_token):
@@ -91,7 +132,7 @@ def SCA_get_projects(access_token=""):
         'Authorization': 'Bearer ' + access_token
         }
 
-        response = requests.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
+        response = SCA_session.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
         response_json = response.json()
     except Exception as e:
         print("Exception: SCA_get_project_latest_scan_id:", str(e))
@@ -103,6 +144,10 @@ def SCA_get_projects(access_token=""):
             return ""
 
 def SCA_get_project_latest_scan_id(project_name, access_token=""):
+    scan_id = project_cache.get_cached(SCA_cache_namespace, project_name, 'latest_scan_id', SCA_scan_id_cache_ttl, SCA_project_cache_file)
+    if scan_id:
+        return scan_id
+
     if(not access_token):
         access_token = get_access_token()
 
@@ -114,7 +159,7 @@ def SCA_get_project_latest_scan_id(project_name, access_token=""):
         'Authorization': 'Bearer ' + access_token
         }
 
-        response = requests.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
+        response = SCA_session.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
         response_json = response.json()
     except Exception as e:
         print("Exception: SCA_get_project_latest_scan_id:", str(e))
@@ -122,9 +167,20 @@ def SCA_get_project_latest_scan_id(project_name, access_token=""):
     else:
         try:
             print('SCA_get_project_latest_scan_id scan_id= ' + response_json['latestScanId'])
+            cache_project(project_name, response_json)
             return response_json['latestScanId']
         except Exception as e:
             return ""
+
+def cache_project(project_name, project_json):
+    if project_json.get('id'):
+        project_cache.set_cached(SCA_cache_namespace, project_name, 'id', project_json['id'], SCA_project_cache_file)
+    if project_json.get('latestScanId'):
+        project_cache.set_cached(SCA_cache_namespace, project_name, 'latest_scan_id', project_json['latestScanId'], SCA_project_cache_file)
+
+def SCA_invalidate_project(project_name=None):
+    # Forget cached ids of a project (or of all projects), e.g. after a rename or deletion
+    project_cache.invalidate(SCA_cache_namespace, project_name, cache_file=SCA_project_cache_file)
         
 def SCA_create_project(project_name, access_token="", team_name=None):
     if(not access_token):
@@ -141,7 +197,7 @@ def SCA_create_project(project_name, access_token="", team_name=None):
         'Authorization': 'Bearer ' + access_token
         }
 
-        response = requests.request("POST", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
+        response = SCA_session.request("POST", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
         response.raise_for_status()  # Raise an error for bad responses
 
         response_json = response.json()
@@ -151,9 +207,15 @@ def SCA_create_project(project_name, access_token="", team_name=None):
         return ""
     else:
         print('SCA_create_project - project_name= ' + response.text)
+        project_cache.set_cached(SCA_cache_namespace, project_name, 'id', project_id, SCA_project_cache_file)
         return project_id
     
-def SCA_get_project_id(project_name, access_token=""):
+def SCA_get_project_id(project_name, access_token="", use_cache=True):
+    if use_cache:
+        project_id = project_cache.get_cached(SCA_cache_namespace, project_name, 'id', SCA_project_cache_ttl, SCA_project_cache_file)
+        if project_id:
+            return project_id
+
     if(not access_token):
         access_token = get_access_token()
 
@@ -164,7 +226,7 @@ def SCA_get_project_id(project_name, access_token=""):
             'Authorization': 'Bearer ' + access_token
         }
 
-        response = requests.get(url, headers=headers, proxies=proxy_servers, verify=False)
+        response = SCA_session.get(url, headers=headers, proxies=proxy_servers, verify=False)
         response.raise_for_status()  # Raise an error for bad responses
 
         response_json = response.json()
@@ -174,9 +236,11 @@ def SCA_get_project_id(project_name, access_token=""):
         return ""
     except (KeyError, IndexError):
         print("Exception: Project ID not found")
+        SCA_invalidate_project(project_name)
         return ""
     else:
         print('SCA_get_project_id id:', project_id)
+        cache_project(project_name, response_json)
         return project_id
 
 def SCA_get_upload_link(project_id, access_token):
@@ -194,7 +258,7 @@ def SCA_get_upload_link(project_id, access_token):
             'Authorization': 'Bearer ' + access_token
         }
 
-        response = requests.post(url, headers=headers, json=payload, proxies=proxy_servers, verify=False)
+        response = SCA_session.post(url, headers=headers, json=payload, proxies=proxy_servers, verify=False)
         response.raise_for_status()  # Raise an error for bad responses
 
         response_json = response.json()
@@ -210,19 +274,24 @@ def SCA_get_upload_link(project_id, access_token):
         return upload_url
 
 def SCA_upload_file(upload_link, zip_file_path, access_token=""):
+    # zip_file_path is a path or an in-memory archive from archive_utils.new_spooled_buffer
     if(not access_token):
         access_token = get_access_token()
 
     try:
-        with open(zip_file_path, 'rb') as file:
-            headers = {
-                'Accept': 'application/json',
-                'Content-Type': 'application/x-zip-compressed',
-                'Authorization': 'Bearer ' + access_token
-            }
-            response = requests.put(upload_link, headers=headers, data=file, proxies=proxy_servers, verify=False)
-            response.raise_for_status()  # Raise an error for bad responses
-            print('SCA_upload_file:', response.text)
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/x-zip-compressed',
+            'Authorization': 'Bearer ' + access_token
+        }
+        if hasattr(zip_file_path, 'read'):
+            # The presigned upload link needs a Content-Length, so the archive is sent once it is complete
+            response = SCA_session.put(upload_link, headers=headers, data=archive_utils.get_upload_body(zip_file_path), proxies=proxy_servers, verify=False)
+        else:
+            with open(zip_file_path, 'rb') as file:
+                response = SCA_session.put(upload_link, headers=headers, data=file, proxies=proxy_servers, verify=False)
+        response.raise_for_status()  # Raise an error for bad responses
+        print('SCA_upload_file:', response.text)
     except requests.RequestException as e:
         print("Exception: Failed to upload file:", str(e))
 
@@ -242,7 +311,7 @@ def SCA_scan_zip(project_id, upload_file_url, access_token=""):
             'Authorization': 'Bearer ' + access_token
         }
 
-        response = requests.post(url, headers=headers, json=payload, proxies=proxy_servers, verify=False)
+        response = SCA_session.post(url, headers=headers, json=payload, proxies=proxy_servers, verify=False)
         response.raise_for_status()  # Raise an error for bad responses
 
         response_json = response.json()
@@ -256,10 +325,16 @@ def SCA_scan_zip(project_id, upload_file_url, access_token=""):
         return None
 
 def SCA_get_scan_status(scan_id, access_token=""):
+    current_status, retry_after = SCA_poll_scan_status(scan_id, access_token)
+    return current_status
+
+def SCA_poll_scan_status(scan_id, access_token=""):
+    # Same as SCA_get_scan_status, also returns the server Retry-After hint (or None)
     if(not access_token):
         access_token = get_access_token()
 
     url = SCA_api_url + "/api/scans/" + scan_id
+    retry_after = None
 
     try:
         payload = {}
@@ -267,7 +342,8 @@ def SCA_get_scan_status(scan_id, access_token=""):
         'Authorization': 'Bearer ' + access_token
         }
 
-        response = requests.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
+        response = SCA_session.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
+        retry_after = polling.get_retry_after(response)
         status = response.content
 
         # Convert binary to string and parse JSON
@@ -279,16 +355,16 @@ def SCA_get_scan_status(scan_id, access_token=""):
    
     except Exception as e:
         print("Exception: SCA_get_scan_status", str(e))
-        return ""
+        return "", retry_after
     else:
-        print('SCSCA_get_scan_status')
-        return current_status
+        return current_status, retry_after
 
-def SCA_get_report(project_name, report_type, access_token=""):
+def SCA_get_report(project_name, report_type, access_token="", scan_id=None):
     if(not access_token):
         access_token = get_access_token()
 
-    scan_id = SCA_get_project_latest_scan_id(project_name, access_token)
+    if not scan_id:
+        scan_id = SCA_get_project_latest_scan_id(project_name, access_token)
     if scan_id:
         try:
             url = SCA_api_url + "/risk-management/risk-reports/" + scan_id + '/' + 'export?format=' + report_type + '&dataType[]=All'
@@ -298,7 +374,12 @@ def SCA_get_report(project_name, report_type, access_token=""):
             'Authorization': 'Bearer ' + access_token
             }
 
-            response = requests.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
+            response = SCA_session.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
+            if response.status_code == 404:
+                # The cached scan id may belong to a deleted scan or project
+                project_cache.invalidate(SCA_cache_namespace, project_name, 'latest_scan_id', SCA_project_cache_file)
+                print("Exception: SCA_get_report scan " + scan_id + " not found")
+                return ""
             pdf_content = response.content
             if report_type.lower() == 'csv':
                 report_path = os.getcwd() + '\\' + project_name + '_SCA_report.zip'
@@ -316,53 +397,126 @@ def SCA_get_report(project_name, report_type, access_token=""):
         return ""
 
 
-def SCA_report_get_details_from_json(file_path):
-    try:
-        # Load JSON data from the file with explicit encoding
-        with open(file_path, encoding='utf-8') as file:
-            json_data = json.load(file)
+def SCA_get_report_details(project_name, access_token="", scan_id=None):
+    """
+    Return (result url, high, medium) of a scan from the RiskReportSummary of its json report.
 
-        high_vulnerability_count = json_data['RiskReportSummary']['HighVulnerabilityCount']
-        medium_vulnerability_count = json_data['RiskReportSummary']['MediumVulnerabilityCount']
-        resultUrl = SCA_url + '/#/projects/' + json_data['RiskReportSummary']['ProjectId']
+    See risk_reports.get_report_details.
 
-    except Exception as e:
-        print("Exception: SCA_report_get_high_vulnerabilities_count failed:", str(e))
+    Returns:
+        tuple: (resultUrl, high_vulnerability_count, medium_vulnerability_count), 0 on failure
+    """
+    if(not access_token):
+        access_token = get_access_token()
+
+    if not scan_id:
+        scan_id = SCA_get_project_latest_scan_id(project_name, access_token)
+    if not scan_id:
         return 0
-    else:
-        return resultUrl, high_vulnerability_count, medium_vulnerability_count
 
-def SCA_scan_packages(project_name, zip_manifest_file, access_token="", team_name=None):
+    # The cached scan id may belong to a deleted scan or project
+    return risk_reports.get_report_details(
+        SCA_session.request, SCA_api_url, SCA_url, scan_id, access_token,
+        on_not_found=lambda: project_cache.invalidate(SCA_cache_namespace, project_name, 'latest_scan_id', SCA_project_cache_file),
+        proxies=proxy_servers, verify=False
+    )
+
+def SCA_get_report_summary(project_name, access_token="", scan_id=None):
+    # Read the RiskReportSummary of a scan (default: the latest one) and return its summary dict, or None
+    details = SCA_get_report_details(project_name, access_token, scan_id)
+    if not details:
+        return None
+    resultUrl, high_vulnerability_count, medium_vulnerability_count = details
+    print('high = ' + str(high_vulnerability_count))
+    print('medium = ' + str(medium_vulnerability_count))
+    print('result pth = ' + resultUrl)
+    return {'high': high_vulnerability_count, 'medium': medium_vulnerability_count, 'result_url': resultUrl}
+
+def SCA_reuse_last_scan(project_name, fingerprint, access_token=""):
+    """
+    Return the summary of the last scan of the project when its manifests had the same fingerprint.
+
+    The cached summary is used as is, a scan without a cached summary only has its report fetched again.
+
+    Returns:
+        dict: Last scan {'fingerprint', 'scan_id', 'summary'}, or None when the project has to be scanned
+    """
+    last_scan = project_cache.get_cached(SCA_cache_namespace, project_name, 'last_scan', SCA_last_scan_ttl, SCA_project_cache_file)
+    if not fingerprint or not last_scan or last_scan.get('fingerprint') != fingerprint:
+        return None
+
+    print('manifests unchanged since scan ' + str(last_scan['scan_id']) + ', reusing its results')
+    if last_scan.get('summary') is None and SCA_high_threshold is not None and SCA_high_threshold > 0:
+        last_scan['summary'] = SCA_get_report_summary(project_name, access_token, last_scan['scan_id'])
+        if last_scan['summary'] is None:
+            return None
+        project_cache.set_cached(SCA_cache_namespace, project_name, 'last_scan', last_scan, SCA_project_cache_file)
+    return last_scan
+
+def SCA_scan_packages(project_name, zip_manifest_file, access_token="", team_name=None, reuse_results=False):
     try:
         if(not access_token):
             access_token = get_access_token()
 
+        # Same manifests as the last scan of the project: return its verdict without uploading
+        fingerprint = manifest_cache.manifest_fingerprint(zip_manifest_file)
+        if reuse_results:
+            last_scan = SCA_reuse_last_scan(project_name, fingerprint, access_token)
+            if last_scan is not None:
+                summary = last_scan.get('summary')
+                if summary is not None and SCA_high_threshold is not None and SCA_high_threshold > 0:
+                    print('high = ' + str(summary['high']))
+                    print('medium = ' + str(summary['medium']))
+                    print('result pth = ' + summary['result_url'])
+                    if(summary['high'] > SCA_high_threshold):
+                        return 1
+                return None
+
         project_id = SCA_get_project_id(project_name, access_token)
         if (project_id == ''):
             project_id = SCA_create_project(project_name, access_token, team_name)
         if (project_id == ''):
             return None
         upload_file_url = SCA_get_upload_link(project_id, access_token)
+        if not upload_file_url:
+            # The cached project id may be stale (project renamed or deleted), look it up again once
+            SCA_invalidate_project(project_name)
+            project_id = SCA_get_project_id(project_name, access_token, use_cache=False)
+            if (project_id == ''):
+                project_id = SCA_create_project(project_name, access_token, team_name)
+            if (project_id == ''):
+                return None
+            upload_file_url = SCA_get_upload_link(project_id, access_token)
         if upload_file_url:
             SCA_upload_file(upload_file_url, zip_manifest_file, access_token)
             scan_id = SCA_scan_zip(project_id, upload_file_url, access_token)
+            if scan_id:
+                project_cache.set_cached(SCA_cache_namespace, project_name, 'latest_scan_id', scan_id, SCA_project_cache_file)
 
             if SCA_high_threshold is not None and SCA_high_threshold > 0:
-                status = 'Running'
-                while(status == 'Running'):
-                    time.sleep(5)
-                    status = SCA_get_scan_status(scan_id, access_token)
-                    print('scan status:' + status)
-
-                report_path = SCA_get_report(project_name, 'json')
-                resultUrl, high_vulnerability_count, medium_vulnerability_count = SCA_report_get_details_from_json(report_path)
-                print('high = ' + str(high_vulnerability_count))
-                print('medium = ' + str(medium_vulnerability_count))
-                print('result pth = ' + resultUrl)
-
-                if(high_vulnerability_count > SCA_high_threshold):
+                status, poll_stats = polling.poll_until(
+                    lambda: SCA_poll_scan_status(scan_id, access_token),
+                    lambda status: status != 'Running',
+                    name='scan status',
+                    **SCA_poll_settings
+                )
+                if poll_stats['timed_out']:
+                    print('scan did not complete within ' + str(SCA_poll_settings['deadline']) + ' seconds')
+                    return None
+
+                summary = SCA_get_report_summary(project_name, access_token, scan_id)
+                if summary is None:
+                    return None
+                if scan_id and fingerprint and status == 'Done':
+                    project_cache.set_cached(SCA_cache_namespace, project_name, 'last_scan', {'fingerprint': fingerprint, 'scan_id': scan_id, 'summary': summary}, SCA_project_cache_file)
+
+                if(summary['high'] > SCA_high_threshold):
                     return 1
 
+            elif scan_id and fingerprint:
+                # Scan not awaited, its report is fetched the first time the results are reused
+                project_cache.set_cached(SCA_cache_namespace, project_name, 'last_scan', {'fingerprint': fingerprint, 'scan_id': scan_id, 'summary': None}, SCA_project_cache_file)
+
             return None
     except Exception as e:
         print("Exception: SCA_report_get_high_vulnerabilities_count failed:", str(e))
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import stat
+import tempfile
+import zipfile
+
+# Fixed entry metadata of reproducible archives, 1980-01-01 is the earliest date a zip entry can hold
+reproducible_date_time = (1980, 1, 1, 0, 0, 0)
+reproducible_file_mode = 0o644
+
+# In-memory archives spill to a temporary file above this size
+spool_max_size = 64 * 1024 * 1024
+
+# Compression of the archives opened with open_zip, 'auto' deflates everything except already compressed files
+compression_methods = {
+    'deflated': zipfile.ZIP_DEFLATED,
+    'stored': zipfile.ZIP_STORED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA,
+    'auto': zipfile.ZIP_DEFLATED
+}
+default_compression = 'deflated'
+default_compresslevel = None
+
+# Files that are stored as is in 'auto' mode, compressing them again costs CPU time for almost no gain
+compressed_extensions = {
+    '.zip', '.jar', '.war', '.ear', '.aar', '.apk', '.nupkg', '.whl', '.egg',
+    '.gz', '.tgz', '.bz2', '.tbz2', '.xz', '.txz', '.lz', '.lzma', '.zst', '.7z', '.rar', '.cab',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico', '.heic',
+    '.mp3', '.mp4', '.m4a', '.avi', '.mov', '.mkv', '.webm', '.ogg',
+    '.woff', '.woff2', '.pdf', '.docx', '.xlsx', '.pptx'
+}
+
+def open_zip(target, compression=None, compresslevel=None):
+    """
+    Open a zip for writing with the configured compression.
+
+    Args:
+        target (str or file): Zip file path or file object, e.g. from new_spooled_buffer
+        compression (str, optional): 'deflated', 'stored', 'bzip2', 'lzma' or 'auto'. Defaults to default_compression.
+        compresslevel (int, optional): 0-9 for deflated, 1-9 for bzip2, ignored otherwise. Defaults to default_compresslevel.
+
+    Returns:
+        zipfile.ZipFile: Zip to pass to add_file
+    """
+    compression = compression or default_compression
+    if compression not in compression_methods:
+        raise ValueError(f"Unknown compression '{compression}', expected one of {', '.join(compression_methods)}")
+    if compresslevel is None:
+        compresslevel = default_compresslevel
+    zipf = zipfile.ZipFile(target, 'w', compression_methods[compression], compresslevel=compresslevel)
+    # add_file stores already compressed files of this zip as is
+    zipf.store_compressed_files = compression == 'auto'
+    return zipf
+
+def get_compress_type(zipf, file_name):
+    if getattr(zipf, 'store_compressed_files', False) and os.path.splitext(file_name)[1].lower() in compressed_extensions:
+        return zipfile.ZIP_STORED
+    return zipf.compression
+
+def add_file(zipf, file_path, arcname, reproducible=False):
+    """
+    Add a file to an open zip.
+
+    In reproducible mode the entry gets a fixed timestamp, fixed permissions and a fixed creating
+    system, so the archive bytes only depend on the entry names, their order and their contents.
+
+    Args:
+        zipf (zipfile.ZipFile): Zip opened for writing
+        file_path (str): File to add
+        arcname (str): Name of the entry in the zip
+        reproducible (bool, optional): Write fixed entry metadata. Defaults to False.
+    """
+    compress_type = get_compress_type(zipf, file_path)
+    if not reproducible:
+        zipf.write(file_path, arcname, compress_type=compress_type)
+        return
+
+    info = zipfile.ZipInfo(arcname.replace(os.sep, '/'), date_time=reproducible_date_time)
+    info.external_attr = (stat.S_IFREG | reproducible_file_mode) << 16
+    info.create_system = 3
+    with open(file_path, 'rb') as src:
+        zipf.writestr(info, src.read(), compress_type=compress_type, compresslevel=zipf.compresslevel)
+
+def new_spooled_buffer(max_size=None):
+    """
+    Return a buffer to build an archive in memory, it moves to a temporary file once it grows above max_size.
+
+    Args:
+        max_size (int, optional): Spill threshold in bytes. Defaults to spool_max_size.
+    """
+    return tempfile.SpooledTemporaryFile(max_size=max_size or spool_max_size, mode='w+b')
+
+def get_size(file):
+    # Size of a path or a seekable file object, the position of the file object is kept
+    if not hasattr(file, 'read'):
+        return os.path.getsize(file)
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return size
+
+def get_upload_body(buffer, max_size=None):
+    """
+    Return the request body for an archive built with new_spooled_buffer.
+
+    Archives still held in memory are sent as bytes. Spilled archives are sent as the file object,
+    requests takes the Content-Length from the file and streams it from disk.
+    """
+    size = get_size(buffer)
+    buffer.seek(0)
+    if size <= (max_size or spool_max_size):
+        return buffer.read()
+    return buffer
+
+def get_seekable(file):
+    """
+    Return a path or file object zipfile can read, buffers from new_spooled_buffer are unwrapped.
+
+    SpooledTemporaryFile only has seekable() from Python 3.11 on, which zipfile needs to read entries.
+    Its BytesIO, or its temporary file once it spilled, is handed to zipfile instead.
+    """
+    if isinstance(file, tempfile.SpooledTemporaryFile):
+        return file._file
+    return file
+
+def get_file_digest(file):
+    """Return the sha256 hex digest of a path or a file object, e.g. of a reproducible zip to use as a cache key."""
+    digest = hashlib.sha256()
+    if hasattr(file, 'read'):
+        file.seek(0)
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+        file.seek(0)
+        return digest.hexdigest()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def print_digest(zip_file):
+    try:
+        print(f"Zip sha256: {get_file_digest(zip_file)}")
+    except OSError as e:
+        print(f"Error computing digest of {zip_file}: {e}")
@@ -0,0 +1,334 @@
+import archive_utils
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+
+# (compression, level) pairs compared by the compression benchmark
+compression_modes = [
+    ('stored', None),
+    ('deflated', 1),
+    ('deflated', 6),
+    ('deflated', 9),
+    ('auto', 1),
+    ('auto', 6),
+    ('bzip2', 9),
+    ('lzma', None)
+]
+
+def create_sample_tree(folder, text_mb=20, binary_mb=20, seed=0):
+    """
+    Create a source tree with compressible text files and incompressible binaries (jars, images).
+
+    Args:
+        folder (str): Folder to create
+        text_mb (int, optional): Size of the text files in MB. Defaults to 20.
+        binary_mb (int, optional): Size of the binary files in MB. Defaults to 20.
+        seed (int, optional): Random seed, the same seed gives the same tree. Defaults to 0.
+    """
+    rng = random.Random(seed)
+    words = ['public', 'class', 'return', 'import', 'def', 'self', 'value', 'string', 'int', 'if', 'else', 'for', 'in', 'while', 'null', 'true', 'false', 'config', 'request', 'response']
+
+    for i in range(text_mb * 4):
+        path = os.path.join(folder, 'src', f'module{i % 16}', f'file{i}.java')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            size = 0
+            while size < 256 * 1024:
+                line = '    ' + ' '.join(rng.choice(words) for _ in range(12)) + ';\n'
+                f.write(line)
+                size += len(line)
+
+    for i in range(binary_mb):
+        extension = ('.jar', '.png', '.gz')[i % 3]
+        path = os.path.join(folder, 'lib', f'binary{i}{extension}')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(rng.randbytes(1024 * 1024))
+
+def zip_tree(folder, zip_path, compression, compresslevel):
+    # Zip a whole tree the way SAST_api.upload_file does, returns the number of files and their total size
+    file_count = 0
+    total_size = 0
+    with archive_utils.open_zip(zip_path, compression, compresslevel) as zipf:
+        for root, _, files in os.walk(folder):
+            for file in files:
+                file_path = os.path.join(root, file)
+                archive_utils.add_file(zipf, file_path, os.path.relpath(file_path, folder))
+                file_count += 1
+                total_size += os.path.getsize(file_path)
+    return file_count, total_size
+
+def benchmark_compression(folders, modes=compression_modes, repeat=1):
+    """
+    Measure the zip time and size of each compression mode on each folder.
+
+    Returns:
+        list: One dict per (folder, mode) with the best time of the repeats
+    """
+    results = []
+    for folder in folders:
+        for compression, compresslevel in modes:
+            elapsed = None
+            with tempfile.TemporaryDirectory() as temp_dir:
+                zip_path = os.path.join(temp_dir, 'benchmark.zip')
+                for _ in range(max(1, repeat)):
+                    start_time = time.perf_counter()
+                    file_count, total_size = zip_tree(folder, zip_path, compression, compresslevel)
+                    run_time = time.perf_counter() - start_time
+                    elapsed = run_time if elapsed is None else min(elapsed, run_time)
+                zip_size = os.path.getsize(zip_path)
+            results.append({
+                'folder': folder,
+                'compression': compression,
+                'level': compresslevel,
+                'files': file_count,
+                'size': total_size,
+                'zip_size': zip_size,
+                'seconds': elapsed
+            })
+    return results
+
+def print_compression_results(results):
+    print(f"{'folder':30} {'compression':12} {'level':>5} {'files':>7} {'MB':>9} {'zip MB':>9} {'ratio':>6} {'seconds':>8} {'MB/s':>8}")
+    for result in results:
+        size_mb = result['size'] / (1024 * 1024)
+        ratio = result['zip_size'] / result['size'] if result['size'] else 0
+        throughput = size_mb / result['seconds'] if result['seconds'] else 0
+        level = '' if result['level'] is None else result['level']
+        print(f"{os.path.basename(os.path.normpath(result['folder'])):30.30} {result['compression']:12} {level:>5} {result['files']:>7} "
+              f"{size_mb:>9.1f} {result['zip_size'] / (1024 * 1024):>9.1f} {ratio:>6.2f} {result['seconds']:>8.2f} {throughput:>8.1f}")
+
+def parse_modes(modes):
+    # 'deflated:6,auto:1,stored' -> [('deflated', 6), ('auto', 1), ('stored', None)]
+    parsed = []
+    for mode in modes.split(','):
+        compression, _, level = mode.strip().partition(':')
+        parsed.append((compression, int(level) if level else None))
+    return parsed
+
+def create_sample_packages_csv(package_count=50000, seed=0):
+    """
+    Return the text of a Packages.csv export with package_count rows.
+
+    About 10% of the packages are high severity, a few percent carry an AGPL or GPL license and some have no license.
+    """
+    rng = random.Random(seed)
+    licenses = ['MIT', 'Apache-2.0', 'BSD-3-Clause', 'ISC', 'MIT;Apache-2.0', 'LGPL-2.1', 'GPL-3.0', 'AGPL-3.0', 'MIT;AGPL-3.0', '']
+    license_weights = [40, 30, 10, 8, 5, 3, 2, 1, 1, 5]
+    severities = ['High', 'Medium', 'Low', 'None']
+    severity_weights = [10, 20, 20, 50]
+    lines = ['Id,Name,Version,Severity,IsDirectDependency,Licenses']
+    for i in range(package_count):
+        license_text = rng.choices(licenses, license_weights)[0]
+        lines.append(f'Npm-package{i}-1.{i % 100}.0,package{i},1.{i % 100}.0,{rng.choices(severities, severity_weights)[0]},'
+                     f'{rng.random() < 0.2},"{license_text}"' if license_text else
+                     f'Npm-package{i}-1.{i % 100}.0,package{i},1.{i % 100}.0,{rng.choices(severities, severity_weights)[0]},{rng.random() < 0.2},')
+    return '\n'.join(lines) + '\n'
+
+def classify_packages_iterrows(packages_df, restricted_licenses):
+    # Former per-row classification of sca-resolver_sa.get_vulnerable_packages_from_report, the baseline of the benchmark
+    packages_df['Severity'] = packages_df['Severity'].astype(str).str.lower()
+    # Missing licenses stay NaN after astype(str) with pandas 3
+    packages_df['Licenses'] = packages_df['Licenses'].fillna('').astype(str)
+    vulnerabilities = []
+    license_issues = []
+    for _, row in packages_df.iterrows():
+        dependency_type = "(direct)" if row['IsDirectDependency'] else "(transitive)"
+        found_due_to_license = [license for license in restricted_licenses if license in row['Licenses']]
+        if row['Severity'] == 'high':
+            vulnerabilities.append((row['Name'], row['Version'], dependency_type))
+        if found_due_to_license:
+            license_text = f" - Found due to {', '.join(found_due_to_license)} license"
+            license_issues.append((row['Name'], row['Version'], dependency_type + license_text))
+    return vulnerabilities, license_issues
+
+def benchmark_report_analysis(csv_text, restricted_licenses, repeat=1):
+    """
+    Time the per-row and the vectorized classification of the same Packages.csv and check they return the same tuples.
+
+    Returns:
+        list: One dict per implementation with the best time of the repeats
+    """
+    import pandas as pd
+    import report_analysis
+
+    results = []
+    outputs = {}
+    for name, classify in [('iterrows', classify_packages_iterrows), ('vectorized', report_analysis.classify_packages)]:
+        elapsed = None
+        for _ in range(max(1, repeat)):
+            packages_df = pd.read_csv(io.StringIO(csv_text))
+            start_time = time.perf_counter()
+            outputs[name] = classify(packages_df, restricted_licenses)
+            run_time = time.perf_counter() - start_time
+            elapsed = run_time if elapsed is None else min(elapsed, run_time)
+        results.append({
+            'implementation': name,
+            'packages': len(packages_df),
+            'high': len(outputs[name][0]),
+            'licenses': len(outputs[name][1]),
+            'seconds': elapsed
+        })
+
+    if outputs['iterrows'] != outputs['vectorized']:
+        print("Warning: the vectorized classification differs from the per-row classification")
+    return results
+
+def print_report_analysis_results(results):
+    print(f"{'implementation':15} {'packages':>9} {'high':>7} {'licenses':>9} {'seconds':>9} {'speedup':>8}")
+    baseline = results[0]['seconds']
+    for result in results:
+        speedup = baseline / result['seconds'] if result['seconds'] else 0
+        print(f"{result['implementation']:15} {result['packages']:>9} {result['high']:>7} {result['licenses']:>9} "
+              f"{result['seconds']:>9.3f} {speedup:>7.1f}x")
+
+def benchmark_export(workers_list, projects, settings, parse_workers=None):
+    """
+    Time create_sca_report_sa exporting every project of a mock Checkmarx server, once per download worker count.
+
+    Each run gets a fresh server and working directory, so every run downloads the same reports.
+
+    Args:
+        workers_list (list): Download worker counts to compare
+        projects (int): Projects with a finished scan on the server
+        settings (dict): mock_checkmarx_server settings, e.g. latency and failure_rate
+        parse_workers (int, optional): Parse processes. Defaults to the exporter default.
+
+    Returns:
+        list: One dict per worker count with the time and the request counts of the server
+    """
+    import create_sca_report_sa
+    import mock_checkmarx_server
+
+    results = []
+    current_dir = os.getcwd()
+    for workers in workers_list:
+        server = mock_checkmarx_server.start_server(dict(settings, projects=projects))
+        work_dir = tempfile.mkdtemp(prefix='benchmark_export_')
+        try:
+            urls = mock_checkmarx_server.get_urls(server)
+            create_sca_report_sa.SCA_api_url = urls['SCA_api_url']
+            create_sca_report_sa.SCA_auth_url = urls['SCA_auth_url']
+            create_sca_report_sa.download_workers = workers
+            if parse_workers:
+                create_sca_report_sa.parse_workers = parse_workers
+            create_sca_report_sa.export_watermarks = False
+            os.chdir(work_dir)
+
+            start_time = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                create_sca_report_sa.create_sca_report()
+            elapsed = time.perf_counter() - start_time
+
+            stats = server.state['stats']
+            results.append({
+                'workers': workers,
+                'projects': projects,
+                'requests': stats['requests'],
+                'failures': stats['failures'],
+                'mb': stats['bytes_out'] / (1024 * 1024),
+                'seconds': elapsed
+            })
+        finally:
+            os.chdir(current_dir)
+            server.shutdown()
+            server.server_close()
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def print_export_results(results):
+    print(f"{'workers':>7} {'projects':>9} {'requests':>9} {'failures':>9} {'MB':>8} {'seconds':>9} {'speedup':>8}")
+    baseline = results[0]['seconds']
+    for result in results:
+        speedup = baseline / result['seconds'] if result['seconds'] else 0
+        print(f"{result['workers']:>7} {result['projects']:>9} {result['requests']:>9} {result['failures']:>9} "
+              f"{result['mb']:>8.1f} {result['seconds']:>9.3f} {speedup:>7.1f}x")
+
+def run_compression(args):
+    folders = list(args.folders)
+    sample_folder = None
+    if not folders:
+        sample_folder = tempfile.mkdtemp(prefix='benchmark_tree_')
+        print(f"Creating sample tree in {sample_folder}: {args.text_mb} MB of sources, {args.binary_mb} MB of binaries")
+        create_sample_tree(sample_folder, args.text_mb, args.binary_mb)
+        folders = [sample_folder]
+    try:
+        modes = parse_modes(args.modes) if args.modes else compression_modes
+        print_compression_results(benchmark_compression(folders, modes, args.repeat))
+    finally:
+        if sample_folder:
+            shutil.rmtree(sample_folder, ignore_errors=True)
+
+def run_report_analysis(args):
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        print("The report analysis benchmark requires pandas")
+        return
+    if args.csv_file:
+        with open(args.csv_file, 'r', encoding='utf-8') as f:
+            csv_text = f.read()
+    else:
+        print(f"Creating a Packages.csv with {args.packages} packages")
+        csv_text = create_sample_packages_csv(args.packages)
+    licenses = [license.strip() for license in args.licenses.split(',') if license.strip()]
+    print_report_analysis_results(benchmark_report_analysis(csv_text, licenses, args.repeat))
+
+def run_export(args):
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        print("The export benchmark requires pandas")
+        return
+    settings = {
+        'latency': args.latency,
+        'latency_jitter': args.latency_jitter,
+        'failure_rate': args.failure_rate,
+        'package_count': args.packages
+    }
+    workers_list = [int(workers) for workers in args.workers.split(',') if workers.strip()]
+    print(f"Exporting {args.projects} mock projects of {args.packages} packages, {args.latency * 1000:.0f} ms latency")
+    print_export_results(benchmark_export(workers_list, args.projects, settings, args.parse_workers))
+
+#################################################
+# main code
+#################################################
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the scan tooling")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    compression_parser = subparsers.add_parser('compression', help="Zip size and time of each compression mode.")
+    compression_parser.add_argument("folders", nargs='*', help="Source trees to zip, a generated sample tree when omitted.")
+    compression_parser.add_argument("--modes", default="", help="Optional: Comma separated compression[:level] list, e.g. 'deflated:6,auto:1,stored'.")
+    compression_parser.add_argument("--repeat", type=int, default=1, help="Optional: Runs per mode, the best time is reported.")
+    compression_parser.add_argument("--text_mb", type=int, default=20, help="Optional: Size of the sources of the sample tree in MB.")
+    compression_parser.add_argument("--binary_mb", type=int, default=20, help="Optional: Size of the binaries of the sample tree in MB.")
+    compression_parser.set_defaults(run=run_compression)
+
+    report_parser = subparsers.add_parser('report-analysis', help="Per-row vs vectorized classification of a Packages.csv report.")
+    report_parser.add_argument("--csv_file", default="", help="Optional: Packages.csv to classify, a generated report when omitted.")
+    report_parser.add_argument("--packages", type=int, default=50000, help="Optional: Rows of the generated report.")
+    report_parser.add_argument("--licenses", default="AGPL,GPL", help="Optional: Comma separated restricted licenses.")
+    report_parser.add_argument("--repeat", type=int, default=3, help="Optional: Runs per implementation, the best time is reported.")
+    report_parser.set_defaults(run=run_report_analysis)
+
+    export_parser = subparsers.add_parser('export', help="create_sca_report_sa against a local mock Checkmarx server.")
+    export_parser.add_argument("--projects", type=int, default=50, help="Optional: Projects to export.")
+    export_parser.add_argument("--packages", type=int, default=500, help="Optional: Packages of each risk report.")
+    export_parser.add_argument("--workers", default="1,4,8", help="Optional: Comma separated download worker counts to compare.")
+    export_parser.add_argument("--parse_workers", type=int, default=None, help="Optional: Processes parsing the reports.")
+    export_parser.add_argument("--latency", type=float, default=0.05, help="Optional: Seconds added to every mock response.")
+    export_parser.add_argument("--latency_jitter", type=float, default=0.0, help="Optional: Random extra latency in seconds.")
+    export_parser.add_argument("--failure_rate", type=float, default=0.0, help="Optional: Share of mock requests failing with 503.")
+    export_parser.set_defaults(run=run_export)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == '__main__':
+    main()
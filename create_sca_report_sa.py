@@ -1,9 +1,22 @@
+# Standalone script with its settings inline. It needs these local modules copied next to it:
+# archive_utils, project_cache, report_analysis and results_store.
+# pandas is required, pyarrow is optional (without it the results go to sca_results.csv).
 import requests
 import os
-import zipfile
 import pandas as pd
 import gc
 import argparse
+import time
+import multiprocessing
+import contextlib
+import re
+from datetime import datetime, timedelta, timezone
+import results_store
+import report_analysis
+import archive_utils
+import project_cache
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 
 SCA_account = 'moj'
 SCA_username = 'yoel2b'
@@ -16,6 +29,31 @@ proxy_servers = {
    'https': SCA_proxy
 }
 
+# Concurrent report downloads, and processes parsing the downloaded Packages.csv files
+download_workers = 8
+parse_workers = min(4, os.cpu_count() or 1)
+# Downloaded or parsed reports waiting for the writer, per download worker
+pending_reports_per_worker = 4
+
+# Columns of sca_results.csv
+columns_to_keep = [
+    'Name', 'Version', 'ReleaseDate', 'Licenses',
+    'NewestVersion', 'NewestVersionReleaseDate',
+    'Severity', 'PackageRepository',
+    'IsDirectDependency'
+]
+export_columns = ['Project'] + columns_to_keep
+
+# 'parquet' upserts each project into the results store, see results_store, 'csv' appends to sca_results.csv
+results_format = 'parquet'
+results_store_dir = 'sca_results'
+
+# Project -> scan id of its last export, projects whose latest scan was already exported are skipped. The watermarks
+# are kept with the output they track, in the results store or next to sca_results.csv, see get_watermark_file
+export_watermarks = True
+# Exported projects between two writes of the watermarks, they are also written once the export ends
+watermark_save_interval = 50
+
 def SCA_get_access_token():
     try:
         payload = {
@@ -88,38 +126,238 @@ def SCA_get_project_latest_scan_id(project_name, access_token=""):
         except Exception as e:
             return ""
 
-def SCA_get_report(project_name, report_type, access_token=""):
+def SCA_get_scan_created_on(scan_id, access_token=""):
+    # Creation time of a scan as an aware datetime, None when unknown
     if(not access_token):
         access_token = SCA_get_access_token()
 
-    scan_id = SCA_get_project_latest_scan_id(project_name, access_token)
-    if scan_id:
-        try:
-            url = SCA_api_url + "/risk-management/risk-reports/" + scan_id + '/' + 'export?format=' + report_type + '&dataType[]=All'
-        
-            payload = {}
-            headers = {
-            'Authorization': 'Bearer ' + access_token
-            }
-
-            response = requests.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
-            pdf_content = response.content
-            if report_type.lower() == 'csv':
-                report_path = os.getcwd() + '\\' + project_name + '_SCA_report.zip'
-            else:    
-                report_path = os.getcwd() + '\\' + project_name + '_SCA_report.' + report_type
-            with open(report_path, 'wb') as f:
-                f.write(pdf_content)
-        except Exception as e:
-            print("Exception: SCA_get_report", str(e))
+    url = SCA_api_url + "/risk-management/scans/" + scan_id
+
+    try:
+        headers = {
+        'Authorization': 'Bearer ' + access_token
+        }
+
+        response = requests.request("GET", url, headers=headers, proxies=proxy_servers, verify=False)
+        response.raise_for_status()
+        return parse_timestamp(response.json().get('createdOn', ''))
+    except Exception as e:
+        print("Exception: SCA_get_scan_created_on:", str(e))
+        return None
+
+def SCA_get_report_buffer(project_name, report_type, access_token="", scan_id=None):
+    """
+    Stream a report export into a spooled buffer instead of a file in the working directory.
+
+    The buffer stays in memory up to archive_utils.spool_max_size and only spills to an anonymous
+    temporary file for larger reports.
+
+    Returns:
+        SpooledTemporaryFile: Report positioned at its start, the caller closes it. None on failure
+    """
+    if(not access_token):
+        access_token = SCA_get_access_token()
+
+    if not scan_id:
+        scan_id = SCA_get_project_latest_scan_id(project_name, access_token)
+    if not scan_id:
+        return None
+
+    buffer = archive_utils.new_spooled_buffer()
+    try:
+        url = SCA_api_url + "/risk-management/risk-reports/" + scan_id + '/' + 'export?format=' + report_type + '&dataType[]=All'
+        headers = {
+        'Authorization': 'Bearer ' + access_token
+        }
+
+        with requests.request("GET", url, headers=headers, proxies=proxy_servers, verify=False, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                buffer.write(chunk)
+        buffer.seek(0)
+        print('SCA_get_report_buffer')
+        return buffer
+    except Exception as e:
+        print("Exception: SCA_get_report_buffer", str(e))
+        buffer.close()
+        return None
+
+def read_packages_report(report, project_name):
+    """
+    Read Packages.csv from a csv export and return the rows to export.
+
+    Only the exported columns and the dependency flags are parsed, and the development and test
+    dependencies are dropped chunk by chunk, so only the kept rows are held in memory.
+
+    Args:
+        report (bytes or file): Export zip from SCA_get_report_buffer
+        project_name (str): Value of the Project column
+
+    Returns:
+        pandas.DataFrame: Rows with export_columns, None when the report has no Packages.csv
+    """
+    kept_chunks = []
+    try:
+        for packages_df in report_analysis.iter_packages_csv(report, columns_to_keep + ['IsDevelopmentDependency', 'IsTestDependency']):
+            # Filter out development and test dependencies
+            kept_chunks.append(packages_df[
+                (packages_df['IsDevelopmentDependency'].fillna(True) == False) &
+                (packages_df['IsTestDependency'].fillna(True) == False)
+            ])
+    except KeyError:
+        print(f"File Packages.csv not found in zip for project: {project_name}")
+        return None
+
+    packages_df = pd.concat(kept_chunks, ignore_index=True)
+
+    # Format date columns
+    for date_col in ['ReleaseDate', 'NewestVersionReleaseDate']:
+        packages_df[date_col] = packages_df[date_col].str.split('T', n=1).str[0]
+
+    result_df = packages_df[columns_to_keep].copy()
+
+    # Add Project column and put it first
+    result_df['Project'] = project_name
+    return result_df[export_columns]
+
+def parse_packages_report(report, project_name, results_dir=None):
+    """
+    Export the packages of a csv export, runs in a worker process.
+
+    Args:
+        report (bytes or file): Export zip from SCA_get_report_buffer, a file object is closed once read
+        project_name (str): Project of the report
+        results_dir (str, optional): Results store the project rows are upserted into. Defaults to returning CSV rows.
+
+    Returns:
+        str: CSV rows without header, or the written parquet file with results_dir. "" when the report has no Packages.csv
+    """
+    try:
+        result_df = read_packages_report(report, project_name)
+        if result_df is None:
             return ""
-        else:
-            print('SCA_get_report')
-            return report_path
-    else:
-        return ""
+        if results_dir:
+            return results_store.upsert_project(results_dir, project_name, result_df)
+        return result_df.to_csv(index=False, header=False, lineterminator='\n')
 
-def create_sca_report(projname=""):
+    finally:
+        if hasattr(report, 'close'):
+            report.close()
+
+def parse_timestamp(value):
+    """
+    Parse an ISO 8601 time, e.g. '2024-05-01', '2024-05-01T10:20:30' or '2024-05-01T10:20:30.1234567Z'.
+
+    Returns:
+        datetime: Aware datetime, UTC when the value has no offset. None when the value cannot be parsed
+    """
+    if not value:
+        return None
+    # fromisoformat takes neither 'Z' nor more than 6 fraction digits before Python 3.11
+    value = re.sub(r'(\.\d{6})\d+', r'\1', value.strip()).replace('Z', '+00:00')
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def parse_since(value):
+    # --since value: an ISO 8601 time, or an age such as '36h' or '7d'
+    match = re.fullmatch(r'(\d+)([hd])', value.strip())
+    if match:
+        amount = int(match.group(1))
+        return datetime.now(timezone.utc) - (timedelta(hours=amount) if match.group(2) == 'h' else timedelta(days=amount))
+    since = parse_timestamp(value)
+    if since is None:
+        raise ValueError(f"Invalid --since value '{value}', expected e.g. '2024-05-01', '2024-05-01T08:00:00' or '7d'")
+    return since
+
+def download_packages_report(project, access_token, parse_pool, results_dir=None, exported_scan_id=None, since=None):
+    """
+    Download the csv export of the latest scan of a project and hand it to a parse process.
+
+    Args:
+        project (dict): Project from SCA_get_projects, its latestScanId saves a lookup when present
+        access_token (str): Access token
+        parse_pool (ProcessPoolExecutor): Pool running parse_packages_report
+        results_dir (str, optional): Results store passed to parse_packages_report. Defaults to None.
+        exported_scan_id (str, optional): Scan id of the last export, the project is skipped when it is still the latest
+        since (datetime, optional): Skip the project when its latest scan is older. Defaults to None.
+
+    Returns:
+        tuple: (scan id, parse future or None, skipped) where skipped is True for an already exported or older scan
+    """
+    project_name = project['name']
+    scan_id = project.get('latestScanId') or SCA_get_project_latest_scan_id(project_name, access_token)
+    if not scan_id:
+        print(f"No SCA report found for project: {project_name}")
+        return None, None, False
+    if scan_id == exported_scan_id:
+        return scan_id, None, True
+    if since:
+        created_on = SCA_get_scan_created_on(scan_id, access_token)
+        if created_on and created_on < since:
+            return scan_id, None, True
+
+    report = SCA_get_report_buffer(project_name, 'csv', access_token, scan_id)
+    if not report:
+        print(f"No SCA report found for project: {project_name}")
+        return scan_id, None, False
+
+    # Reports held in memory go to a parse process as bytes, a report that spilled to disk
+    # cannot be handed over without a named file and is parsed in this thread instead
+    report_body = archive_utils.get_upload_body(report)
+    if isinstance(report_body, bytes):
+        report.close()
+        return scan_id, parse_pool.submit(parse_packages_report, report_body, project_name, results_dir), False
+    parse_future = Future()
+    try:
+        parse_future.set_result(parse_packages_report(report, project_name, results_dir))
+    except Exception as e:
+        parse_future.set_exception(e)
+    return scan_id, parse_future, False
+
+def get_watermark_file(results_dir, sca_csv_path):
+    # A new results store or csv file starts without watermarks, so its projects are exported again
+    if results_dir:
+        return os.path.join(results_dir, '_export_watermarks.json')
+    return sca_csv_path + '.watermarks.json'
+
+def get_exported_scan_id(watermarks, project_name, results_dir):
+    # Scan id of the last export of a project, None when its rows are no longer in the results store
+    if results_dir and not os.path.isdir(results_store.get_project_dir(results_dir, project_name)):
+        return None
+    return watermarks.get(project_name, {}).get('scan_id')
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+def print_progress(done, total, project_name, start_time):
+    elapsed = time.time() - start_time
+    eta = elapsed / done * (total - done) if done else 0
+    print(f"[{done}/{total}] {project_name} - elapsed {format_duration(elapsed)}, ETA {format_duration(eta)}")
+
+def create_sca_report(projname="", max_projects=None, since=None, full_export=False):
+    """
+    Export the packages of the latest scan of each project into the results store, or sca_results.csv.
+
+    Reports are downloaded by download_workers threads and parsed by parse_workers processes. The
+    results store gets one partition per project, replacing its previous rows. In csv mode a single
+    writer appends the results in project order, so the file has the same rows as a serial export.
+    At most download_workers * pending_reports_per_worker reports are in flight at any time.
+
+    Projects whose latest scan id matches their export watermark are skipped without downloading a
+    report, the watermark of a project moves once its export has been written. The watermarks are
+    written every watermark_save_interval projects and when the export ends.
+
+    Args:
+        projname (str, optional): Export only this project. Defaults to all projects.
+        max_projects (int, optional): Export at most this many projects. Defaults to no limit.
+        since (datetime, optional): Only export scans created after this time. Defaults to None.
+        full_export (bool, optional): Ignore the watermarks and export every project. Defaults to False.
+    """
     try:
         # Step 1: Get the access token
         access_token = SCA_get_access_token()
@@ -128,85 +366,81 @@ def create_sca_report(projname=""):
         if projname:
             projects = [{"name": projname}]
         else:
-            projects = SCA_get_projects(access_token)
-       
+            projects = SCA_get_projects(access_token) or []
+
+        if max_projects:
+            projects = projects[:max_projects]
+        total = len(projects)
+
+        skipped_count = 0
+
+        results_dir = None
+        if results_format == 'parquet':
+            if results_store.is_available():
+                results_dir = os.path.abspath(results_store_dir)
+                os.makedirs(results_dir, exist_ok=True)
+            else:
+                print("pyarrow is not installed, writing sca_results.csv instead of the results store")
+        sca_csv_path = os.path.join(os.getcwd(), 'sca_results.csv')
+
+        watermark_file = get_watermark_file(results_dir, sca_csv_path) if export_watermarks else None
+        watermarks = {}
+        if watermark_file and (results_dir or os.path.exists(sca_csv_path)):
+            watermarks = project_cache.load_store(watermark_file)
+        unsaved_count = 0
         processed_count = 0
-        for project in projects:
+        start_time = time.time()
+        max_pending = max(1, download_workers * pending_reports_per_worker)
+
+        with ThreadPoolExecutor(max_workers=download_workers) as download_pool, \
+                ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context('spawn')) as parse_pool, \
+                (open(sca_csv_path, 'a') if not results_dir else contextlib.nullcontext()) as sca_csv:
+            if sca_csv and sca_csv.tell() == 0:
+                sca_csv.write(','.join(export_columns) + '\n')
+
+            # Parse processes are spawned, forking while the download threads run is unsafe
+            next_project = 0
+            pending = deque()
             try:
-                project_name = project['name']
-                print(f"Processing project {processed_count + 1}: {project_name}")
-
-                # Step 3: Get the SCA report path
-                SCA_report_path = SCA_get_report(project_name, 'csv', access_token)
-                if not SCA_report_path:
-                    print(f"No SCA report found for project: {project_name}")
-                    continue
-
-                print(f"SCA report location: {SCA_report_path}")
-
-                # Step 4: Extract and process the CSV files from the zip
-                csv_filenames = ['Packages.csv']
-                extracted_data = {}
-                with zipfile.ZipFile(SCA_report_path, 'r') as zip_ref:
-                    for filename in csv_filenames:
-                        try:
-                            with zip_ref.open(filename) as csv_file:
-                                extracted_data[filename] = pd.read_csv(csv_file)
-                        except KeyError:
-                            print(f"File {filename} not found in zip for project: {project_name}")
-
-                # Process Packages.csv
-                if 'Packages.csv' in extracted_data:
-                    packages_df = extracted_data['Packages.csv']
-
-                    # Filter out development and test dependencies
-                    packages_df = packages_df[
-                        (packages_df['IsDevelopmentDependency'].fillna(True) == False) &
-                        (packages_df['IsTestDependency'].fillna(True) == False)
-                    ]
-
-                    # Format date columns
-                    for date_col in ['ReleaseDate', 'NewestVersionReleaseDate']:
-                        packages_df[date_col] = packages_df[date_col].apply(
-                            lambda x: x.split('T')[0] if pd.notnull(x) else x
-                        )
-
-                    columns_to_keep = [
-                        'Name', 'Version', 'ReleaseDate', 'Licenses',
-                        'NewestVersion', 'NewestVersionReleaseDate', 
-                        'Severity', 'PackageRepository',
-                        'IsDirectDependency'
-                    ]
-
-                    result_df = packages_df[columns_to_keep].copy()
-
-                    # Add Project column
-                    result_df['Project'] = project_name
-
-                    # Reorder columns to put Project first
-                    final_columns = ['Project'] + columns_to_keep
-                    result_df = result_df[final_columns]
-
-                    # Save results to sca_results.csv
-                    sca_csv_path = os.path.join(os.getcwd(), 'sca_results.csv')
-                    if os.path.exists(sca_csv_path):
-                        result_df.to_csv(sca_csv_path, mode='a', index=False, header=False)
-                    else:
-                        result_df.to_csv(sca_csv_path, mode='w', index=False)
-
-                    print(f"Packages data for project '{project_name}' saved to '{sca_csv_path}'.")
-                
-                processed_count += 1
-
-            except Exception as project_error:
-                print(f"Error processing project '{project_name}': {project_error}")
-
+                while pending or next_project < total:
+                    # Keep the pools busy while the writer waits for the oldest project
+                    while next_project < total and len(pending) < max_pending:
+                        project = projects[next_project]
+                        exported_scan_id = None if full_export else get_exported_scan_id(watermarks, project['name'], results_dir)
+                        pending.append((project['name'], download_pool.submit(download_packages_report, project, access_token,
+                                                                              parse_pool, results_dir, exported_scan_id, since)))
+                        next_project += 1
+
+                    project_name, download_future = pending.popleft()
+                    try:
+                        scan_id, parse_future, skipped = download_future.result()
+                        if skipped:
+                            skipped_count += 1
+                        if parse_future is not None:
+                            result = parse_future.result()
+                            if result and results_dir:
+                                print(f"Packages data for project '{project_name}' saved to '{result}'.")
+                            elif result:
+                                sca_csv.write(result)
+                                sca_csv.flush()
+                                print(f"Packages data for project '{project_name}' saved to '{sca_csv_path}'.")
+                            processed_count += 1
+                            watermarks[project_name] = {'scan_id': scan_id, 'exported_at': datetime.now(timezone.utc).isoformat()}
+                            unsaved_count += 1
+                            if watermark_file and unsaved_count >= watermark_save_interval:
+                                project_cache.save_store(watermark_file, watermarks)
+                                unsaved_count = 0
+                    except Exception as project_error:
+                        print(f"Error processing project '{project_name}': {project_error}")
+
+                    print_progress(next_project - len(pending), total, project_name, start_time)
             finally:
-                # Delete the zip file after processing
-                if os.path.exists(SCA_report_path):
-                    os.remove(SCA_report_path)
+                # The watermarks of the projects written so far, also when the export stops early
+                if watermark_file and unsaved_count:
+                    project_cache.save_store(watermark_file, watermarks)
 
-        print(f"Processed {processed_count} projects in total.")
+        print(f"Processed {processed_count} projects in total in {format_duration(time.time() - start_time)}, "
+              f"skipped {skipped_count} projects already exported or scanned before --since.")
 
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
@@ -219,10 +453,19 @@ def create_sca_report(projname=""):
 # main code
 #################################################
 def main():
+    global download_workers, parse_workers, results_format, results_store_dir, export_watermarks
+
     # Set up argument parser
     parser = argparse.ArgumentParser(description='Generate SCA reports for projects')
     parser.add_argument('-p', '--project', help='Specific project name to process', default="")
     parser.add_argument('-m', '--max', type=int, help='Maximum number of projects to process', default=None)
+    parser.add_argument('-w', '--workers', type=int, help='Concurrent report downloads', default=download_workers)
+    parser.add_argument('--parse_workers', type=int, help='Processes parsing the downloaded reports', default=parse_workers)
+    parser.add_argument('-f', '--format', choices=['parquet', 'csv'], help='Write the results store or append to sca_results.csv', default=results_format)
+    parser.add_argument('--results_dir', help='Directory of the results store', default=results_store_dir)
+    parser.add_argument('-s', '--since', help="Only export scans created after this time, e.g. '2024-05-01T08:00:00' or '7d'", default="")
+    parser.add_argument('--full', action='store_true', help='Export every project, also when its latest scan was already exported')
+    parser.add_argument('--no_watermarks', action='store_true', help='Neither read nor write the export watermarks')
     
     args = parser.parse_args()
     
@@ -231,7 +474,21 @@ def main():
     
     print('max_projects : ' + str(max_projects))
 
-    create_sca_report(args.project, max_projects)
+    download_workers = max(1, args.workers)
+    parse_workers = max(1, args.parse_workers)
+    results_format = args.format
+    results_store_dir = args.results_dir
+    export_watermarks = not args.no_watermarks
+
+    try:
+        since = parse_since(args.since) if args.since else None
+    except ValueError as e:
+        print(str(e))
+        exit(1)
+    if since:
+        print('since : ' + since.isoformat())
+
+    create_sca_report(args.project, max_projects, since, args.full)
     exit(0)
 
 if __name__ == '__main__':
@@ -0,0 +1,83 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Only idempotent reads are retried, uploads and POST requests are sent once
+retry_methods = frozenset(['GET', 'HEAD', 'OPTIONS'])
+retry_status_codes = (429, 500, 502, 503, 504)
+
+def create_session(pool_size=10, keep_alive=True, retries=3, backoff_factor=0.5, proxies=None, verify=True):
+    """
+    Create a requests session with a pooled, retrying adapter.
+
+    Args:
+        pool_size (int, optional): Number of connections kept per host. Defaults to 10.
+        keep_alive (bool, optional): Reuse connections between calls. Defaults to True.
+        retries (int, optional): Retries for connection errors and 429/5xx responses. Defaults to 3.
+        backoff_factor (float, optional): Backoff factor between retries. Defaults to 0.5.
+        proxies (dict, optional): Proxies used by every request. Defaults to None.
+        verify (bool, optional): Verify TLS certificates. Defaults to True.
+
+    Returns:
+        requests.Session: Session to be shared by all calls to the same service
+    """
+    session = requests.Session()
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=retry_status_codes,
+        allowed_methods=retry_methods,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    if proxies:
+        session.proxies.update({scheme: proxy for scheme, proxy in proxies.items() if proxy})
+    session.verify = verify
+
+    return session
+
+def add_token_renewal(session, renew_token):
+    """
+    Send a request rejected with 401 once more, with a renewed bearer token.
+
+    Args:
+        session (requests.Session): Session whose requests carry 'Authorization: Bearer <token>'
+        renew_token (callable): Called with the rejected token, returns a new token or an empty string,
+            e.g. token_cache.renew_token
+    """
+    def retry_unauthorized(response, *args, **kwargs):
+        request = response.request
+        authorization = request.headers.get('Authorization', '')
+        if response.status_code != 401 or not authorization.startswith('Bearer ') or getattr(request, 'token_renewed', False):
+            return response
+        body = request.body
+        if hasattr(body, 'seek'):
+            body.seek(0)
+        elif body is not None and not isinstance(body, (bytes, str)):
+            # A streamed body cannot be sent again
+            return response
+
+        access_token = renew_token(authorization[len('Bearer '):])
+        if not access_token:
+            return response
+        print('Access token rejected, retrying with a new token')
+
+        # Read and release the rejected response before the connection is used again
+        response.content
+        response.close()
+        retry_request = request.copy()
+        retry_request.headers['Authorization'] = 'Bearer ' + access_token
+        retry_request.token_renewed = True
+        retry_response = response.connection.send(retry_request, **kwargs)
+        retry_response.history.append(response)
+        retry_response.request = retry_request
+        return retry_response
+
+    session.hooks['response'].append(retry_unauthorized)
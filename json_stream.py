@@ -0,0 +1,111 @@
+import codecs
+import json
+import re
+
+# Characters that change the scanner state outside of strings, and inside strings
+structure_chars = re.compile(r'["{}\[\],:]')
+string_chars = re.compile(r'["\\]')
+
+def read_member(chunks, member, encoding='utf-8-sig'):
+    """
+    Return the value of one top-level member of a JSON object read from a stream of chunks.
+
+    The document is scanned without being decoded: the values of the other members are skipped
+    without being kept, and reading stops as soon as the requested value is complete, e.g. after
+    RiskReportSummary at the start of a risk report export.
+
+    Args:
+        chunks (iterable): bytes or str chunks of the document, e.g. response.iter_content()
+        member (str): Name of the top-level member
+        encoding (str, optional): Encoding of bytes chunks. Defaults to 'utf-8-sig'.
+
+    Returns:
+        object: Decoded value of the member, None when the object has no such member
+
+    Raises:
+        ValueError: The document is not a JSON object or ends before the member value
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    depth = 0
+    in_string = False
+    escape_pending = False
+    expect_key = False
+    key_parts = None
+    last_key = None
+    value_parts = None
+
+    for chunk in chunks:
+        text = decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        i = 0
+        key_start = 0
+        value_start = 0
+        while i < len(text):
+            if in_string:
+                if escape_pending:
+                    escape_pending = False
+                    i += 1
+                    continue
+                match = string_chars.search(text, i)
+                if not match:
+                    i = len(text)
+                    break
+                j = match.start()
+                if text[j] == '\\':
+                    if j + 1 < len(text):
+                        i = j + 2
+                    else:
+                        escape_pending = True
+                        i = len(text)
+                    continue
+                in_string = False
+                i = j + 1
+                if key_parts is not None:
+                    key_parts.append(text[key_start:j])
+                    last_key = json.loads('"' + ''.join(key_parts) + '"')
+                    key_parts = None
+                continue
+
+            match = structure_chars.search(text, i)
+            if not match:
+                i = len(text)
+                break
+            j = match.start()
+            char = text[j]
+            i = j + 1
+            if char == '"':
+                in_string = True
+                if depth == 1 and expect_key:
+                    key_parts = []
+                    key_start = i
+            elif char in '{[':
+                if depth == 0 and char != '{':
+                    raise ValueError("The document is not a JSON object")
+                depth += 1
+                expect_key = depth == 1
+            elif char in '}]':
+                depth -= 1
+                if value_parts is not None and depth <= 1:
+                    # The end of the member value: its closing bracket, or the ',' / '}' after a scalar
+                    end = j + 1 if depth == 1 else j
+                    value_parts.append(text[value_start:end])
+                    return json.loads(''.join(value_parts))
+                if depth == 0:
+                    return None
+            elif char == ':' and depth == 1:
+                expect_key = False
+                if last_key == member:
+                    value_parts = []
+                    value_start = i
+            elif char == ',' and depth == 1:
+                if value_parts is not None:
+                    value_parts.append(text[value_start:j])
+                    return json.loads(''.join(value_parts))
+                expect_key = True
+
+        # Keep the partial key or value of this chunk, the rest of the chunk is dropped
+        if key_parts is not None:
+            key_parts.append(text[key_start:])
+        if value_parts is not None:
+            value_parts.append(text[value_start:])
+
+    raise ValueError("The document ended before the end of the JSON object")
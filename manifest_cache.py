@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+import archive_utils
+import project_cache
+
+# Bump when the processors change their output so old cache entries are not reused
+cache_version = 1
+
+# Per-user and private (0700), other users of the machine can neither read nor plant cached manifests
+default_cache_dir = os.path.join(project_cache.get_user_cache_dir(), 'manifests')
+
+def is_private_dir(cache_dir):
+    # Owned by the current user and not writable by others, always true where there are no POSIX owners
+    if not hasattr(os, 'getuid'):
+        return True
+    try:
+        stat_result = os.stat(cache_dir)
+    except OSError:
+        return False
+    return stat_result.st_uid == os.getuid() and not stat_result.st_mode & 0o022
+
+def hash_settings(*settings):
+    """Return a stable sha256 of JSON serializable settings, e.g. the exclusion list."""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def get_cache_key(file_path, handler_name, settings_hash):
+    """
+    Key of a processed manifest: hash of its content, the handler that processes it and the settings hash.
+
+    Returns:
+        str: Hex key, or None when the file cannot be read
+    """
+    digest = hashlib.sha256()
+    digest.update(f'{cache_version}:{handler_name}:{settings_hash}:'.encode('utf-8'))
+    try:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    except OSError as e:
+        print(f"Error hashing manifest {file_path}: {e}")
+        return None
+    return digest.hexdigest()
+
+def get_entry_dir(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], key)
+
+def load_entry(cache_dir, key):
+    """
+    Return the cached outputs of a manifest, or None on a cache miss or when the cache directory is not private.
+
+    Returns:
+        dict: {'modified': bool, 'files': {output name: path of the cached file}}
+    """
+    if not cache_dir or not key or not is_private_dir(cache_dir):
+        return None
+    entry_dir = get_entry_dir(cache_dir, key)
+    try:
+        with open(os.path.join(entry_dir, 'entry.json'), 'r') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    files = {name: os.path.join(entry_dir, name) for name in entry.get('files', [])}
+    if not all(os.path.isfile(path) for path in files.values()):
+        return None
+    return {'modified': entry.get('modified', False), 'files': files}
+
+def store_entry(cache_dir, key, modified, files):
+    """
+    Store the outputs of a processed manifest.
+
+    Args:
+        cache_dir (str): Cache directory
+        key (str): Key from get_cache_key
+        modified (bool): False when the processor kept the original file
+        files (dict): {output name: path of the file to copy into the cache}
+    """
+    if not cache_dir or not key:
+        return
+    entry_dir = get_entry_dir(cache_dir, key)
+    if os.path.exists(entry_dir):
+        return
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        if not is_private_dir(cache_dir):
+            print(f"Warning: Manifest cache {cache_dir} is shared with other users, not caching")
+            return
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+
+        # Build the entry next to its final place and rename it, concurrent writers of the same key keep the first one
+        staging_dir = tempfile.mkdtemp(prefix=key + '.', dir=os.path.dirname(entry_dir))
+        try:
+            for name, path in files.items():
+                shutil.copyfile(path, os.path.join(staging_dir, name))
+            with open(os.path.join(staging_dir, 'entry.json'), 'w') as f:
+                json.dump({'modified': modified, 'files': sorted(files)}, f)
+            os.rename(staging_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            if not os.path.exists(entry_dir):
+                raise
+    except OSError as e:
+        print(f"Warning: Could not write manifest cache entry {entry_dir}: {e}")
+
+def manifest_fingerprint(zip_file_path):
+    """
+    Return a sha256 over the sorted entry names and contents of a manifest zip.
+
+    Timestamps, entry order and compression do not change the fingerprint, so two zips of the same
+    processed manifests have the same fingerprint.
+
+    Args:
+        zip_file_path (str or file): Zip path, or the spooled buffer of an in-memory zip
+
+    Returns:
+        str: Hex fingerprint, or None when the zip cannot be read
+    """
+    digest = hashlib.sha256()
+    try:
+        with zipfile.ZipFile(archive_utils.get_seekable(zip_file_path), 'r') as zipf:
+            for name in sorted(info.filename for info in zipf.infolist() if not info.is_dir()):
+                content = zipf.read(name)
+                digest.update(f'{name}\0{len(content)}\0'.encode('utf-8'))
+                digest.update(content)
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"Error fingerprinting {zip_file_path}: {e}")
+        return None
+    return digest.hexdigest()
@@ -0,0 +1,164 @@
+import fnmatch
+import os
+import re
+
+# Directories that never hold the project's own manifests
+default_prune_dirs = ['node_modules', 'bower_components', '.git', '.svn', '.hg', 'bin', 'obj', 'target', '.venv', 'venv', '__pycache__', 'vendor', '.idea', '.vs']
+
+# Ignore files honored in every directory, using .gitignore syntax
+ignore_file_names = ['.gitignore', '.scaignore']
+
+def compile_manifest_matcher(handlers):
+    """
+    Compile manifest patterns into a single lookup.
+
+    Exact file names go into a dictionary and all glob patterns into one regular expression,
+    so each file name is checked once instead of once per pattern.
+
+    Args:
+        handlers (list): (pattern, handler) pairs, e.g. ('*.csproj', process_csproj).
+            Exact names win over globs, globs are tried in the given order.
+
+    Returns:
+        callable: Takes a file name and returns its handler, or None when no pattern matches
+    """
+    exact_names = {}
+    glob_patterns = []
+    glob_handlers = []
+    for pattern, handler in handlers:
+        # Case folding follows fnmatch.fnmatch, i.e. case insensitive on Windows
+        pattern = os.path.normcase(pattern)
+        if any(char in pattern for char in '*?['):
+            glob_patterns.append(pattern)
+            glob_handlers.append(handler)
+        else:
+            exact_names.setdefault(pattern, handler)
+
+    # One numbered group per glob, the group that matched identifies the handler
+    glob_regex = None
+    if glob_patterns:
+        glob_regex = re.compile('|'.join('(' + glob_to_regex(pattern) + ')' for pattern in glob_patterns), re.DOTALL)
+
+    def match(file_name):
+        file_name = os.path.normcase(file_name)
+        handler = exact_names.get(file_name)
+        if handler is not None or glob_regex is None:
+            return handler
+        match_result = glob_regex.fullmatch(file_name)
+        return glob_handlers[match_result.lastindex - 1] if match_result else None
+
+    return match
+
+def glob_to_regex(pattern):
+    # Translate '*', '?' and '[...]' globs into a regular expression without groups
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '*':
+            regex += '.*'
+        elif char == '?':
+            regex += '.'
+        elif char == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            body = pattern[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            regex += '[' + body.replace('\\', '\\\\') + ']'
+            i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex
+
+def new_stats():
+    return {'skipped_dirs': 0, 'skipped_files': 0}
+
+def print_stats(stats):
+    print(f"Skipped {stats['skipped_dirs']} directories and {stats['skipped_files']} files")
+
+def parse_ignore_file(ignore_file_path, base_directory):
+    # Each rule is (base directory, pattern, negated, directories only, anchored to the base directory)
+    rules = []
+    try:
+        with open(ignore_file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                line = line.rstrip('\r\n')
+                if not line.strip() or line.startswith('#'):
+                    continue
+                negated = line.startswith('!')
+                if negated:
+                    line = line[1:]
+                directories_only = line.endswith('/')
+                line = line.strip('/') if directories_only else line
+                anchored = '/' in line
+                rules.append((base_directory, line.lstrip('/'), negated, directories_only, anchored))
+    except OSError as e:
+        print(f"Error reading ignore file {ignore_file_path}: {e}")
+    return rules
+
+def load_ignore_rules(directory, parent_rules):
+    """Return the rules that apply inside directory: the parent rules plus the ignore files found in it."""
+    rules = parent_rules
+    for ignore_file_name in ignore_file_names:
+        ignore_file_path = os.path.join(directory, ignore_file_name)
+        if os.path.isfile(ignore_file_path):
+            rules = rules + parse_ignore_file(ignore_file_path, directory)
+    return rules
+
+def is_ignored(path, is_dir, rules):
+    # The last matching rule wins, as in .gitignore
+    ignored = False
+    for base_directory, pattern, negated, directories_only, anchored in rules:
+        if directories_only and not is_dir:
+            continue
+        rel_path = os.path.relpath(path, base_directory).replace(os.sep, '/')
+        if rel_path.startswith('..'):
+            continue
+        if anchored:
+            matched = fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(rel_path, pattern.replace('**/', ''))
+        else:
+            matched = fnmatch.fnmatch(os.path.basename(path), pattern)
+        if matched:
+            ignored = not negated
+    return ignored
+
+def is_pruned(directory, name, prune_dirs, rules):
+    return name in prune_dirs or (bool(rules) and is_ignored(os.path.join(directory, name), True, rules))
+
+def walk(top, prune_dirs=default_prune_dirs, use_ignore_files=True, stats=None):
+    """
+    os.walk that never enters pruned or ignored directories and skips ignored files.
+
+    Args:
+        top (str): Folder to walk
+        prune_dirs (list, optional): Directory names that are never entered. Defaults to default_prune_dirs.
+        use_ignore_files (bool, optional): Honor .gitignore and .scaignore files. Defaults to True.
+        stats (dict, optional): Counters from new_stats(), updated with the skipped directories and files.
+
+    Yields:
+        tuple: (root, dirs, files) as os.walk
+    """
+    if stats is None:
+        stats = new_stats()
+    prune_dirs = set(prune_dirs or [])
+    rules_by_directory = {top: []}
+
+    for root, dirs, files in os.walk(top):
+        rules = rules_by_directory.pop(root, [])
+        if use_ignore_files:
+            rules = load_ignore_rules(root, rules)
+
+        # Prune in place so that os.walk does not descend into excluded subtrees
+        kept_dirs = [name for name in dirs if not is_pruned(root, name, prune_dirs, rules)]
+        stats['skipped_dirs'] += len(dirs) - len(kept_dirs)
+        dirs[:] = kept_dirs
+        for name in dirs:
+            rules_by_directory[os.path.join(root, name)] = rules
+
+        if rules:
+            kept_files = [name for name in files if not is_ignored(os.path.join(root, name), False, rules)]
+            stats['skipped_files'] += len(files) - len(kept_files)
+            files = kept_files
+
+        yield root, dirs, files
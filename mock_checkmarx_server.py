@@ -0,0 +1,571 @@
+import argparse
+import csv
+import io
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit, unquote
+
+# Behaviour of the mock server, every value can be changed while it runs through server.settings
+default_settings = {
+    'latency': 0.0,              # seconds added to every response
+    'latency_jitter': 0.0,       # random extra latency, up to this many seconds
+    'failure_rate': 0.0,         # share of API requests answered with 503 and a Retry-After header
+    'scan_duration': 2.0,        # seconds until a scan is Done (SCA) or Completed (SAST)
+    'scan_failure_rate': 0.0,    # share of scans that end Failed
+    'report_duration': 0.5,      # seconds until a SAST report is ready
+    'package_count': 200,        # packages of each SCA risk report
+    'token_lifetime': 3600,      # expires_in of the access tokens
+    'projects': 0,               # SCA and SAST projects created at start, each with a finished scan
+    'seed': 0                    # ids, scan failures, reports and injected failures all derive from the seed
+}
+
+sast_prefix = '/cxrestapi'
+severities = ['High', 'Medium', 'Low', 'None']
+licenses = ['MIT', 'Apache-2.0', 'BSD-3-Clause', 'ISC', 'GPL-3.0', 'AGPL-3.0', 'LGPL-2.1']
+
+def new_state(seed=0):
+    return {
+        'lock': threading.Lock(),
+        # Ids and scan outcomes, in creation order, and the latency and failures of the requests
+        'rng': random.Random(f"{seed}:state"),
+        'request_rng': random.Random(f"{seed}:requests"),
+        'next_id': 1,
+        'sca_projects': {},     # name -> project
+        'sca_scans': {},        # scan id -> scan
+        'uploads': {},          # upload id -> {'project_id', 'size'}
+        'sast_projects': {},    # id -> project
+        'sast_scans': {},       # id -> scan
+        'sast_reports': {},     # id -> report
+        'stats': {'requests': 0, 'failures': 0, 'bytes_in': 0, 'bytes_out': 0, 'routes': {}}
+    }
+
+def next_id(state):
+    # Caller holds the state lock
+    value = state['next_id']
+    state['next_id'] += 1
+    return value
+
+def new_uuid(state):
+    # Caller holds the state lock
+    return str(uuid.UUID(int=state['rng'].getrandbits(128), version=4))
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+def format_local_time(timestamp):
+    # SAST returns server local times without offset
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]
+
+def get_scan_rng(settings, scan_id):
+    return random.Random(f"{settings['seed']}:{scan_id}")
+
+def is_finished(scan, settings):
+    return time.time() - scan['created'] >= settings['scan_duration']
+
+#################################################
+# SCA
+#################################################
+def create_sca_project(state, name, team_names=None):
+    with state['lock']:
+        project = state['sca_projects'].get(name)
+        if project is None:
+            project = {
+                'id': new_uuid(state),
+                'name': name,
+                'createdOn': format_time(time.time()),
+                'assignedTeams': team_names or [],
+                'latestScanId': None
+            }
+            state['sca_projects'][name] = project
+        return project
+
+def create_sca_scan(state, settings, project, created=None):
+    with state['lock']:
+        scan = {
+            'scanId': new_uuid(state),
+            'projectId': project['id'],
+            'created': time.time() if created is None else created,
+            'failed': state['rng'].random() < settings['scan_failure_rate']
+        }
+        state['sca_scans'][scan['scanId']] = scan
+        project['latestScanId'] = scan['scanId']
+    return scan
+
+def get_sca_scan_status(scan, settings):
+    if not is_finished(scan, settings):
+        return 'Running'
+    return 'Failed' if scan['failed'] else 'Done'
+
+def create_packages(settings, scan_id):
+    # Packages of a risk report, the same scan id always gives the same packages
+    rng = get_scan_rng(settings, scan_id)
+    packages = []
+    for i in range(settings['package_count']):
+        name = f"package{i}"
+        version = f"{rng.randint(0, 9)}.{rng.randint(0, 20)}.{rng.randint(0, 9)}"
+        released = datetime(2020, 1, 1) + timedelta(days=rng.randint(0, 1500))
+        packages.append({
+            'Id': f"Npm-{name}-{version}",
+            'Name': name,
+            'Version': version,
+            'Licenses': rng.choices(licenses, [40, 30, 10, 8, 5, 2, 5])[0],
+            'ReleaseDate': released.strftime('%Y-%m-%dT%H:%M:%S'),
+            'NewestVersion': f"{rng.randint(10, 12)}.0.0",
+            'NewestVersionReleaseDate': (released + timedelta(days=rng.randint(0, 400))).strftime('%Y-%m-%dT%H:%M:%S'),
+            'Severity': rng.choices(severities, [5, 15, 20, 60])[0],
+            'PackageRepository': 'Npm',
+            'IsDirectDependency': rng.random() < 0.2,
+            'IsDevelopmentDependency': rng.random() < 0.1,
+            'IsTestDependency': rng.random() < 0.05,
+            'RiskScore': round(rng.random() * 10, 1)
+        })
+    return packages
+
+def create_risk_report(settings, scan, project):
+    packages = create_packages(settings, scan['scanId'])
+    summary = {
+        'RiskReportId': scan['scanId'],
+        'ProjectId': project['id'],
+        'ProjectName': project['name'],
+        'CreatedOn': format_time(scan['created']),
+        'HighVulnerabilityCount': sum(package['Severity'] == 'High' for package in packages),
+        'MediumVulnerabilityCount': sum(package['Severity'] == 'Medium' for package in packages),
+        'LowVulnerabilityCount': sum(package['Severity'] == 'Low' for package in packages),
+        'TotalPackages': len(packages)
+    }
+    return summary, packages
+
+def get_sca_project_by_id(state, project_id):
+    return next((project for project in state['sca_projects'].values() if project['id'] == project_id), None)
+
+def sca_projects(server, request):
+    state = server.state
+    name = request['query'].get('name')
+    if request['method'] == 'POST':
+        body = json.loads(request['body'] or b'{}')
+        if not body.get('name'):
+            return 400, {'message': 'name is required'}
+        if body['name'] in state['sca_projects']:
+            return 409, {'message': f"Project {body['name']} already exists"}
+        return 201, create_sca_project(state, body['name'], body.get('assignedTeams'))
+    if name:
+        project = state['sca_projects'].get(name)
+        return (200, project) if project else (404, {'message': 'Project not found'})
+    return 200, list(state['sca_projects'].values())
+
+def sca_uploads(server, request):
+    body = json.loads(request['body'] or b'{}')
+    with server.state['lock']:
+        upload_id = new_uuid(server.state)
+        server.state['uploads'][upload_id] = {'project_id': body.get('projectId'), 'size': None}
+    return 200, {'url': f"http://{request['host']}/uploads/{upload_id}"}
+
+def sca_upload_file(server, request, upload_id):
+    upload = server.state['uploads'].get(upload_id)
+    if upload is None:
+        return 404, {'message': 'Upload not found'}
+    upload['size'] = len(request['body'])
+    return 200, {}
+
+def sca_scan_uploaded_zip(server, request):
+    body = json.loads(request['body'] or b'{}')
+    project = get_sca_project_by_id(server.state, body.get('projectId'))
+    upload_id = (body.get('uploadedFileUrl') or '').rstrip('/').rsplit('/', 1)[-1]
+    upload = server.state['uploads'].get(upload_id)
+    if project is None or upload is None or upload['size'] is None:
+        return 400, {'message': 'Unknown project or upload'}
+    scan = create_sca_scan(server.state, server.settings, project)
+    return 201, {'scanId': scan['scanId']}
+
+def sca_scan(server, request, scan_id):
+    scan = server.state['sca_scans'].get(scan_id)
+    if scan is None:
+        return 404, {'message': 'Scan not found'}
+    return 200, {
+        'scanId': scan_id,
+        'projectId': scan['projectId'],
+        'status': get_sca_scan_status(scan, server.settings),
+        'createdOn': format_time(scan['created'])
+    }
+
+def sca_export_report(server, request, scan_id):
+    scan = server.state['sca_scans'].get(scan_id)
+    if scan is None or get_sca_scan_status(scan, server.settings) != 'Done':
+        return 404, {'message': 'Risk report not found'}
+    project = get_sca_project_by_id(server.state, scan['projectId'])
+    summary, packages = create_risk_report(server.settings, scan, project)
+    report_format = request['query'].get('format', 'json').lower()
+
+    if report_format == 'json':
+        return 200, {'RiskReportSummary': summary, 'Packages': packages, 'Vulnerabilities': [], 'Licenses': []}
+    if report_format == 'csv':
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            text = io.StringIO()
+            writer = csv.DictWriter(text, fieldnames=list(packages[0]) if packages else ['Id', 'Name', 'Version'])
+            writer.writeheader()
+            writer.writerows(packages)
+            zipf.writestr('Packages.csv', text.getvalue())
+            zipf.writestr('Summary.csv', ','.join(summary) + '\n' + ','.join(str(value) for value in summary.values()) + '\n')
+        return 200, archive.getvalue(), {'Content-Type': 'application/zip'}
+    return 400, {'message': f"Unsupported format {report_format}"}
+
+#################################################
+# SAST
+#################################################
+def create_sast_project(state, name, team_id=1):
+    with state['lock']:
+        project = next((project for project in state['sast_projects'].values() if project['name'] == name), None)
+        if project is None:
+            project_id = next_id(state)
+            project = {'id': project_id, 'name': name, 'teamId': int(team_id or 1), 'isPublic': True}
+            state['sast_projects'][project_id] = project
+        return project
+
+def create_sast_scan(state, settings, project_id, is_incremental=False, size=0, created=None):
+    with state['lock']:
+        scan_id = next_id(state)
+        scan = {
+            'id': scan_id,
+            'projectId': project_id,
+            'created': time.time() if created is None else created,
+            'failed': state['rng'].random() < settings['scan_failure_rate'],
+            'isIncremental': is_incremental,
+            'size': size
+        }
+        state['sast_scans'][scan_id] = scan
+    return scan
+
+def get_sast_scan_json(scan, settings):
+    scan_json = {
+        'id': scan['id'],
+        'project': {'id': scan['projectId']},
+        'isIncremental': scan['isIncremental'],
+        'comment': '',
+        'dateAndTime': {'startedOn': format_local_time(scan['created'])},
+        'status': {'id': 3, 'name': 'Scanning'},
+        'finishedScanStatus': None
+    }
+    if is_finished(scan, settings):
+        scan_json['status'] = {'id': 9, 'name': 'Failed'} if scan['failed'] else {'id': 7, 'name': 'Finished'}
+        scan_json['finishedScanStatus'] = {'id': 1 if scan['failed'] else 0, 'value': 'Failed' if scan['failed'] else 'Completed'}
+        scan_json['dateAndTime']['finishedOn'] = format_local_time(scan['created'] + settings['scan_duration'])
+    return scan_json
+
+def get_form_field(body, name):
+    # Value of a small text field of a multipart/form-data body
+    match = re.search(rb'name="' + re.escape(name.encode()) + rb'"[^\r\n]*\r\n(?:[^\r\n]+\r\n)*\r\n([^\r\n]*)\r\n', body)
+    return match.group(1).decode('utf-8', 'replace') if match else None
+
+def sast_projects(server, request):
+    if request['method'] == 'POST':
+        body = json.loads(request['body'] or b'{}')
+        if not body.get('name'):
+            return 400, {'messageDetails': 'name is required'}
+        project = create_sast_project(server.state, body['name'], body.get('owningTeam'))
+        return 201, {'id': project['id'], 'link': {'uri': f"/projects/{project['id']}"}}
+    return 200, list(server.state['sast_projects'].values())
+
+def sast_scans(server, request):
+    project_id = int(request['query'].get('projectId') or 0)
+    scans = sorted((scan for scan in server.state['sast_scans'].values() if not project_id or scan['projectId'] == project_id),
+                   key=lambda scan: scan['created'], reverse=True)
+    if request['query'].get('last'):
+        scans = scans[:int(request['query']['last'])]
+    return 200, [get_sast_scan_json(scan, server.settings) for scan in scans]
+
+def sast_scan_with_settings(server, request):
+    project_id = int(get_form_field(request['body'], 'projectId') or 0)
+    if project_id not in server.state['sast_projects']:
+        return 400, {'messageDetails': 'Unknown project'}
+    is_incremental = (get_form_field(request['body'], 'isIncremental') or '').lower() == 'true'
+    scan = create_sast_scan(server.state, server.settings, project_id, is_incremental, len(request['body']))
+    return 201, {'id': scan['id'], 'link': {'uri': f"/sast/scans/{scan['id']}"}}
+
+def sast_scan(server, request, scan_id):
+    scan = server.state['sast_scans'].get(int(scan_id))
+    if scan is None:
+        return 404, {'messageDetails': 'Scan not found'}
+    return 200, get_sast_scan_json(scan, server.settings)
+
+def get_sast_statistics(settings, scan_id):
+    rng = get_scan_rng(settings, f"sast:{scan_id}")
+    return {
+        'highSeverity': rng.randint(0, 3),
+        'mediumSeverity': rng.randint(0, 10),
+        'lowSeverity': rng.randint(0, 20),
+        'infoSeverity': rng.randint(0, 5)
+    }
+
+def sast_scan_statistics(server, request, scan_id):
+    scan = server.state['sast_scans'].get(int(scan_id))
+    if scan is None or not is_finished(scan, server.settings):
+        return 404, {'messageDetails': 'Scan results not found'}
+    return 200, get_sast_statistics(server.settings, scan_id)
+
+def sast_scan_results(server, request, scan_id):
+    statistics = get_sast_statistics(server.settings, scan_id)
+    results = []
+    for severity, key in [('High', 'highSeverity'), ('Medium', 'mediumSeverity')]:
+        for i in range(statistics[key]):
+            results.append({'id': f"{scan_id}-{severity}-{i}", 'severity': severity, 'queryName': f"{severity}_Query_{i}"})
+    return 200, results
+
+def sast_vulnerability(server, request, result_id):
+    return 200, {'id': result_id, 'description': f"Mock vulnerability {result_id}"}
+
+def sast_post_report(server, request):
+    body = json.loads(request['body'] or b'{}')
+    if int(body.get('scanId') or 0) not in server.state['sast_scans']:
+        return 400, {'messageDetails': 'Unknown scan'}
+    with server.state['lock']:
+        report_id = next_id(server.state)
+        server.state['sast_reports'][report_id] = {'scanId': int(body['scanId']), 'reportType': body.get('reportType', 'XML'), 'created': time.time()}
+    return 202, {'reportId': report_id, 'links': {'report': {'uri': f"/reports/sastScan/{report_id}"}}}
+
+def sast_report_status(server, request, report_id):
+    report = server.state['sast_reports'].get(int(report_id))
+    if report is None:
+        return 404, {'messageDetails': 'Report not found'}
+    ready = time.time() - report['created'] >= server.settings['report_duration']
+    return 200, {'status': {'id': 2, 'value': 'Created'} if ready else {'id': 1, 'value': 'InProcess'}}
+
+def sast_report(server, request, report_id):
+    report = server.state['sast_reports'].get(int(report_id))
+    if report is None:
+        return 404, {'messageDetails': 'Report not found'}
+    scan = server.state['sast_scans'][report['scanId']]
+    project = server.state['sast_projects'].get(scan['projectId'], {})
+    statistics = get_sast_statistics(server.settings, scan['id'])
+    content = (f'<?xml version="1.0" encoding="utf-8"?>\n<CxXMLResults ProjectName="{project.get("name", "")}" '
+               f'ScanId="{scan["id"]}" HighSeverity="{statistics["highSeverity"]}" MediumSeverity="{statistics["mediumSeverity"]}" />\n')
+    return 200, content.encode('utf-8'), {'Content-Type': 'application/octet-stream'}
+
+def sast_teams(server, request):
+    return 200, [{'id': 1, 'name': 'CxServer', 'fullName': '/CxServer', 'parentId': 0},
+                 {'id': 2, 'name': 'Mock', 'fullName': '/CxServer/Mock', 'parentId': 1}]
+
+def sast_team_users(server, request, team_id):
+    return 200, [{'id': 1, 'userName': 'mock', 'email': f"team{team_id}@example.com"}]
+
+#################################################
+# Routing
+#################################################
+def access_token(server, request):
+    with server.state['lock']:
+        token = new_uuid(server.state).replace('-', '')
+    return 200, {'access_token': token, 'token_type': 'Bearer', 'expires_in': server.settings['token_lifetime']}
+
+def stats(server, request):
+    with server.state['lock']:
+        return 200, json.loads(json.dumps(server.state['stats']))
+
+# (method, path regex, handler, name), groups of the regex are passed to the handler
+routes = [
+    ('POST', r'/identity/connect/token', access_token, 'sca token'),
+    ('POST', sast_prefix + r'/auth/identity/connect/token', access_token, 'sast token'),
+    ('GET', r'/mock/stats', stats, 'stats'),
+    ('GET', r'/risk-management/projects', sca_projects, 'sca projects'),
+    ('POST', r'/risk-management/projects', sca_projects, 'sca create project'),
+    ('POST', r'/api/uploads', sca_uploads, 'sca upload link'),
+    ('PUT', r'/uploads/([^/]+)', sca_upload_file, 'sca upload'),
+    ('POST', r'/api/scans/uploaded-zip', sca_scan_uploaded_zip, 'sca scan'),
+    ('GET', r'/api/scans/([^/]+)', sca_scan, 'sca scan status'),
+    ('GET', r'/risk-management/scans/([^/]+)', sca_scan, 'sca scan details'),
+    ('GET', r'/risk-management/risk-reports/([^/]+)/export', sca_export_report, 'sca report export'),
+    ('GET', sast_prefix + r'/projects', sast_projects, 'sast projects'),
+    ('POST', sast_prefix + r'/projects', sast_projects, 'sast create project'),
+    ('GET', sast_prefix + r'/sast/scans', sast_scans, 'sast scans'),
+    ('POST', sast_prefix + r'/sast/scanWithSettings', sast_scan_with_settings, 'sast scan'),
+    ('GET', sast_prefix + r'/sast/scans/(\d+)', sast_scan, 'sast scan status'),
+    ('GET', sast_prefix + r'/sast/scans/(\d+)/resultsStatistics', sast_scan_statistics, 'sast statistics'),
+    ('GET', sast_prefix + r'/sast/scans/(\d+)/results', sast_scan_results, 'sast results'),
+    ('GET', sast_prefix + r'/sast/vulnerabilities/([^/]+)', sast_vulnerability, 'sast vulnerability'),
+    ('POST', sast_prefix + r'/reports/sastScan', sast_post_report, 'sast report request'),
+    ('GET', sast_prefix + r'/reports/sastScan/(\d+)/status', sast_report_status, 'sast report status'),
+    ('GET', sast_prefix + r'/reports/sastScan/(\d+)', sast_report, 'sast report'),
+    ('GET', sast_prefix + r'/auth/teams', sast_teams, 'sast teams'),
+    ('GET', sast_prefix + r'/auth/teams/(\d+)/Users', sast_team_users, 'sast team users')
+]
+compiled_routes = [(method, re.compile(pattern + r'/?'), handler, name) for method, pattern, handler, name in routes]
+
+def find_route(method, path):
+    for route_method, pattern, handler, name in compiled_routes:
+        if route_method == method:
+            match = pattern.fullmatch(path)
+            if match:
+                return handler, name, [unquote(group) for group in match.groups()]
+    return None, None, None
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the pooled sessions of the clients are exercised as against the real servers
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = b''
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def send(self, status, payload, headers=None):
+        if isinstance(payload, (bytes, bytearray)):
+            body = bytes(payload)
+            content_type = 'application/octet-stream'
+        else:
+            body = json.dumps(payload).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        self.send_response(status)
+        headers = dict(headers or {})
+        self.send_header('Content-Type', headers.pop('Content-Type', content_type))
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+        with self.server.state['lock']:
+            self.server.state['stats']['bytes_out'] += len(body)
+
+    def handle_request(self):
+        body = self.read_body()
+        url = urlsplit(self.path)
+        settings = self.server.settings
+        handler, name, args = find_route(self.command, url.path)
+
+        with self.server.state['lock']:
+            stats = self.server.state['stats']
+            stats['requests'] += 1
+            stats['bytes_in'] += len(body)
+            stats['routes'][name or 'unknown'] = stats['routes'].get(name or 'unknown', 0) + 1
+
+        with self.server.state['lock']:
+            jitter = self.server.state['request_rng'].random()
+            failure = self.server.state['request_rng'].random()
+        if settings['latency'] or settings['latency_jitter']:
+            time.sleep(settings['latency'] + jitter * settings['latency_jitter'])
+
+        if handler is None:
+            self.send(404, {'message': f"No mock route for {self.command} {url.path}"})
+            return
+        if name != 'stats' and settings['failure_rate'] and failure < settings['failure_rate']:
+            with self.server.state['lock']:
+                self.server.state['stats']['failures'] += 1
+            self.send(503, {'message': 'Injected failure'}, {'Retry-After': '1'})
+            return
+
+        request = {
+            'method': self.command,
+            'path': url.path,
+            'query': {key: values[0] for key, values in parse_qs(url.query).items()},
+            'headers': self.headers,
+            'host': self.headers.get('Host') or f"{self.server.server_address[0]}:{self.server.server_address[1]}",
+            'body': body
+        }
+        try:
+            result = handler(self.server, request, *args)
+        except Exception as e:
+            result = (500, {'message': f"{type(e).__name__}: {e}"})
+        self.send(*result)
+
+    do_GET = handle_request
+    do_POST = handle_request
+    do_PUT = handle_request
+    do_DELETE = handle_request
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients close streamed reports early, e.g. after RiskReportSummary
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def seed_projects(server, count):
+    # Projects with a scan that finished an hour ago, e.g. for the bulk report export
+    created = time.time() - 3600
+    for i in range(count):
+        name = f"mock-project-{i:04d}"
+        create_sca_scan(server.state, server.settings, create_sca_project(server.state, name), created)
+        create_sast_scan(server.state, server.settings, create_sast_project(server.state, name)['id'], created=created)
+
+def start_server(settings=None, host='127.0.0.1', port=0, verbose=False):
+    """
+    Start the mock server in a background thread.
+
+    Args:
+        settings (dict, optional): Overrides of default_settings. Defaults to None.
+        host (str, optional): Interface to listen on. Defaults to '127.0.0.1'.
+        port (int, optional): Port, 0 picks a free one. Defaults to 0.
+        verbose (bool, optional): Log every request. Defaults to False.
+
+    Returns:
+        MockServer: Running server, stop it with server.shutdown() and server.server_close()
+    """
+    server = MockServer((host, port), MockRequestHandler)
+    server.settings = dict(default_settings, **(settings or {}))
+    server.state = new_state(server.settings['seed'])
+    server.verbose = verbose
+    seed_projects(server, server.settings['projects'])
+    threading.Thread(target=server.serve_forever, name='mock-checkmarx-server', daemon=True).start()
+    return server
+
+def get_urls(server):
+    """Return the config_sca.yaml / config_sast.yaml url settings pointing at the server."""
+    host, port = server.server_address[:2]
+    base_url = f"http://{host}:{port}"
+    return {
+        'SCA_url': base_url,
+        'SCA_api_url': base_url,
+        'SCA_auth_url': base_url + '/identity/connect/token',
+        'SAST_api_url': base_url + sast_prefix,
+        'SAST_auth_url': base_url + sast_prefix + '/auth/identity/connect/token',
+        'SAST_web_url': base_url
+    }
+
+#################################################
+# main code
+#################################################
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Checkmarx SCA and SAST APIs")
+    parser.add_argument("--host", default="127.0.0.1", help="Optional: Interface to listen on.")
+    parser.add_argument("--port", type=int, default=8899, help="Optional: Port to listen on.")
+    parser.add_argument("--verbose", action="store_true", help="Optional: Log every request.")
+    for name, value in default_settings.items():
+        parser.add_argument(f"--{name}", type=type(value), default=value, help=f"Optional: Defaults to {value}.")
+    args = parser.parse_args()
+
+    settings = {name: getattr(args, name) for name in default_settings}
+    server = start_server(settings, args.host, args.port, args.verbose)
+    print("Mock Checkmarx server running, point the configuration at:")
+    for name, url in get_urls(server).items():
+        print(f"  {name}: {url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
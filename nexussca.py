@@ -1,21 +1,48 @@
 import parse_json_store
+import archive_utils
 import SCA_api
+import http_session
 from SCA_api import nexus_server_url
 import requests
 import os
-import zipfile
 import argparse
-from packaging.version import parse as version_parse
+import threading
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from packaging.version import parse as version_parse, InvalidVersion
 
 # Path to the executable file
 nexus_repository_suffix = "/service/rest/v1/components?repository="
 code_folder = 'manifest'
 SCA_project_name = 'nexus_sca'
 
+# Maximum number of concurrent requests sent to a single Nexus host
+max_requests_per_host = 4
+host_semaphores = {}
+host_semaphores_lock = threading.Lock()
+# (connect, read) timeout of Nexus requests in seconds, a stalled page must not hold its host slot forever
+nexus_timeout = (10, 120)
+# Shared session, the pages of all repositories reuse its pooled connections
+nexus_session = http_session.create_session(pool_size=max_requests_per_host, verify=False)
+
+def get_host_semaphore(url):
+    host = urlparse(url).netloc
+    with host_semaphores_lock:
+        if host not in host_semaphores:
+            host_semaphores[host] = threading.BoundedSemaphore(max_requests_per_host)
+        return host_semaphores[host]
+
+def nexus_get(url):
+    # Cap the number of in-flight requests per host so that Nexus is not overloaded
+    with get_host_semaphore(url):
+        return nexus_session.get(url, timeout=nexus_timeout)
+
 def get_nexus_proxy_repositories(nexus_url):
     url = f"{nexus_url}/service/rest/v1/repositories"
     try:
-        response = requests.get(url, verify=False)
+        response = nexus_get(url)
         response.raise_for_status()
         data = response.json()
         proxy_repositories = [repo["name"] for repo in data if repo["type"] == "proxy"]
@@ -25,8 +52,8 @@ def get_nexus_proxy_repositories(nexus_url):
         return ""
 
 def zip_file(source_file, zip_file_name):
-    with zipfile.ZipFile(zip_file_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        zipf.write(source_file, arcname=source_file)
+    with archive_utils.open_zip(zip_file_name) as zipf:
+        archive_utils.add_file(zipf, source_file, source_file)
 
 def treat_package_list(packages, format):
     try:
@@ -41,58 +68,76 @@ def treat_package_list(packages, format):
     else:
         return zip_file_name
 
-def get_packages_list(repository_name):
+def iter_component_pages(repository_name):
+    # Yield the components of a repository page by page as they arrive from the continuation-token loop
+    url = nexus_server_url + nexus_repository_suffix + repository_name
+    continuation_token = ''
+
+    while continuation_token is not None:
+        if continuation_token == '':
+            response = nexus_get(url)
+        else:
+            response = nexus_get(url + '&continuationToken=' + continuation_token)
+        response.raise_for_status()
+
+        data = response.json()
+        packages = data.get('items', [])
+        if not packages:
+            break
+
+        continuation_token = data.get('continuationToken')
+        yield packages
+
+def is_older_version(version, existing_version):
     try:
-        url = nexus_server_url + nexus_repository_suffix
-        continuation_token = ''
+        return version_parse(version) < version_parse(existing_version)
+    except InvalidVersion:
+        return False
+
+def get_packages_list(repository_name, verbose=True):
+    try:
+        # Only the name -> version (or version|group for maven2) strings are kept, the raw pages are dropped as soon as they are processed
         dependencies = {}
+        file_format = None
+        components_count = 0
 
-        print("\n")
-        print(repository_name + " packages:")
+        if verbose:
+            print("\n")
+            print(repository_name + " packages:")
 
-        while continuation_token is not None:
-            if continuation_token == '':
-                response = requests.get(url + repository_name, verify=False)
-            else:
-                response = requests.get(url + repository_name + '&continuationToken=' + continuation_token, verify=False)
-            
-            # Check if the request was successful (status code 200)
-            if response.status_code == 200:
-                # Parse the JSON data from the response
-                data = response.json()
-                packages = data.get('items', [])
-                if not packages:
-                    break
-                
+        for packages in iter_component_pages(repository_name):
+            if file_format is None:
                 file_format = packages[0].get('format', '')
-                continuation_token = data.get('continuationToken')
+            components_count += len(packages)
 
-                for package in packages:
+            for package in packages:
+                if verbose:
                     print(package['name'] + ' ' + package['version'])
-                    package_name = package['name']
-                    package_version = package['version']
-                    
-                    if(file_format == 'maven2'):
-                        dependencies[package['name']] = package['version'] + '|' + package['group']
-                    elif file_format == 'npm':
-                        if package['group'] is not None:
-                            dependency_key = '@' + package['group'] + '/' + package_name
-                        else:
-                            dependency_key = package_name
-                        dependency_value = package_version
+                package_name = package['name']
+                package_version = package['version']
+                
+                if(file_format == 'maven2'):
+                    dependency_key = package_name
+                    dependency_value = package_version + '|' + package['group']
+                elif file_format == 'npm':
+                    if package['group'] is not None:
+                        dependency_key = '@' + package['group'] + '/' + package_name
                     else:
                         dependency_key = package_name
-                        dependency_value = package_version
-                    
-                    # Check if the package already exists in the dependencies dictionary
-                    if dependency_key in dependencies:
-                        existing_version = dependencies[dependency_key].split('|')[0] if '|' in dependencies[dependency_key] else dependencies[dependency_key]
-                        # Update only if the new version is older
-                        if version_parse(package_version) < version_parse(existing_version):
-                            dependencies[dependency_key] = dependency_value
-                    else:
-                        dependencies[dependency_key] = dependency_value
+                    dependency_value = package_version
+                else:
+                    dependency_key = package_name
+                    dependency_value = package_version
+                
+                # Check if the package already exists in the dependencies dictionary
+                existing_value = dependencies.get(dependency_key)
+                if existing_value is None:
+                    dependencies[dependency_key] = dependency_value
+                # Update only if the new version is older
+                elif is_older_version(package_version, existing_value.split('|')[0]):
+                    dependencies[dependency_key] = dependency_value
 
+        print(f"{repository_name}: {components_count} components, {len(dependencies)} unique packages")
         return dependencies, file_format
 
     except requests.RequestException as e:
@@ -107,6 +152,27 @@ def get_packages_list(repository_name):
         print("Exception:", e)
         return None, None
 
+def crawl_repositories(repositories, workers=1):
+    if workers <= 1:
+        for repository in repositories:
+            packages_list, format = get_packages_list(repository)
+            yield repository, packages_list, format
+        return
+
+    # Crawl repositories concurrently, results are returned in the order of the repositories list. At most
+    # 'workers' repositories are in flight, so finished package lists do not pile up behind a slow repository
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        repository_iter = iter(repositories)
+        pending = deque((repository, executor.submit(get_packages_list, repository, False))
+                        for repository in islice(repository_iter, workers))
+        while pending:
+            repository, future = pending.popleft()
+            packages_list, format = future.result()
+            yield repository, packages_list, format
+            # The next repository starts once the earliest one has been handed over
+            for next_repository in islice(repository_iter, 1):
+                pending.append((next_repository, executor.submit(get_packages_list, next_repository, False)))
+
 def upload_offline_files():
     try:
         # Define the directory containing the zip files
@@ -148,6 +214,8 @@ def upload_offline_files():
 # main code
 #################################################
 def main():
+    global max_requests_per_host
+
     # Create the parser
     parser = argparse.ArgumentParser(description="Process some parameters.")
     
@@ -169,6 +237,34 @@ def main():
         action='store_true', 
         help='upload manifest zip files from current manifest folder'
     )
+
+    parser.add_argument(
+        '--workers', 
+        type=int, 
+        default=1, 
+        help='number of repositories to crawl concurrently'
+    )
+
+    parser.add_argument(
+        '--max-per-host', 
+        type=int, 
+        default=max_requests_per_host, 
+        help='maximum number of concurrent requests to the Nexus host'
+    )
+
+    parser.add_argument(
+        '--compression', 
+        choices=sorted(archive_utils.compression_methods), 
+        default=archive_utils.default_compression, 
+        help='compression of the manifest zip files'
+    )
+
+    parser.add_argument(
+        '--compression-level', 
+        type=int, 
+        default=None, 
+        help='compression level of the manifest zip files (0-9 for deflated, 1-9 for bzip2)'
+    )
     
     # Parse the arguments
     args = parser.parse_args()
@@ -177,9 +273,14 @@ def main():
     limit_repo = args.repo if args.repo else ""
     offline = args.offline
     upload = args.upload
+    workers = max(1, args.workers)
     print('limit repo =', limit_repo)
     print('offline =', offline)
     print('upload =', upload)
+    print('workers =', workers)
+    max_requests_per_host = max(1, args.max_per_host)
+    archive_utils.default_compression = args.compression
+    archive_utils.default_compresslevel = args.compression_level
 
     if(upload):
         upload_offline_files()
@@ -192,20 +293,18 @@ def main():
         for repository in proxy_repositories:
             print(repository)
 
-        # Iterate through each repository
-        for repository in proxy_repositories:
-            # Check if limit_packages is empty or matches the current repository
-            if not limit_repo or repository == limit_repo:
-                # Get the list of packages for the current repository
-                packages_list, format = get_packages_list(repository)
-                
-                # Treat the package list to create a zip file
-                zip_file_name = treat_package_list(packages_list, format)
-                print('\nzip file name:', zip_file_name)
-                
-                # If zip file is generated, proceed with scanning
-                if zip_file_name and not offline:
-                    SCA_api.SCA_scan_packages(SCA_project_name + '_' + repository, zip_file_name)
+        # Check if limit_packages is empty or matches the current repository
+        repositories = [repository for repository in proxy_repositories if not limit_repo or repository == limit_repo]
+
+        # Iterate through each repository, crawling up to 'workers' repositories concurrently
+        for repository, packages_list, format in crawl_repositories(repositories, workers):
+            # Treat the package list to create a zip file
+            zip_file_name = treat_package_list(packages_list, format)
+            print('\nzip file name:', zip_file_name)
+            
+            # If zip file is generated, proceed with scanning
+            if zip_file_name and not offline:
+                SCA_api.SCA_scan_packages(SCA_project_name + '_' + repository, zip_file_name)
  
 if __name__ == '__main__':
    main()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import re
+import manifest_walk
+from packaging.specifiers import SpecifierSet, InvalidSpecifier
+from packaging.version import Version, InvalidVersion
+
+# Characters the old exclusion matching stripped from both versions before comparing them
+version_prefix_chars = '^~>=<'
+
+def new_rule(entry):
+    # Normalize one exclude entry: {"package": ..., "version": ..., "versions": [...], "range": ..., "ecosystem": ...}
+    version = (entry.get('version') or '').strip()
+    versions = [str(v).strip() for v in entry.get('versions', [])]
+    if version:
+        versions.append(version)
+
+    version_range = None
+    if entry.get('range'):
+        try:
+            version_range = SpecifierSet(entry['range'])
+        except InvalidSpecifier as e:
+            print(f"Invalid version range '{entry['range']}' for {entry['package']}: {e}")
+
+    # Exact values and their stripped form, e.g. '^1.2.0' also matches '1.2.0' and '~1.2.0'
+    version_set = set(versions) | {v.strip(version_prefix_chars) for v in versions}
+    label = f"{entry['package']}@{entry.get('range') or ','.join(versions) or 'all versions'}"
+    return {
+        'package': entry['package'],
+        'all_versions': not versions and version_range is None,
+        'versions': version_set,
+        'range': version_range,
+        'label': label
+    }
+
+def build_exclude_index(entries):
+    """
+    Build the lookup structure for a list of exclude entries, once per run.
+
+    Each entry is {"package": name, "version": version} as before, where an empty version excludes
+    all versions. Optional keys: "versions" (list of versions), "range" (PEP 440 specifier such as
+    ">=1.0,<2.0") and "ecosystem" (npm, nuget, pypi, maven or composer, all ecosystems when missing).
+    Package names with '*', '?' or '[' are glob patterns, a trailing '*' only is a prefix match.
+
+    Args:
+        entries (list): Exclude entries as loaded from the exclude packages JSON file
+
+    Returns:
+        dict: Index for find_exclusion
+    """
+    index = {'exact': {}, 'prefixes': {}, 'prefix_lengths': set(), 'globs': [], 'size': 0}
+    for entry in entries or []:
+        try:
+            name = entry['package']
+            ecosystem = entry.get('ecosystem') or None
+            rule = new_rule(entry)
+        except (KeyError, TypeError, AttributeError) as e:
+            print(f"Skipping invalid exclude entry {entry}: {e}")
+            continue
+
+        wildcard = re.search(r'[*?\[]', name)
+        if wildcard is None:
+            index['exact'].setdefault((ecosystem, name), []).append(rule)
+        elif wildcard.start() == len(name) - 1 and name.endswith('*'):
+            prefix = name[:-1]
+            index['prefixes'].setdefault((ecosystem, prefix), []).append(rule)
+            index['prefix_lengths'].add(len(prefix))
+        else:
+            index['globs'].append((ecosystem, re.compile(manifest_walk.glob_to_regex(name) + r'\Z'), rule))
+        index['size'] += 1
+    return index
+
+def version_matches(rule, version):
+    if rule['all_versions']:
+        return True
+    version = (version or '').strip()
+    stripped = version.strip(version_prefix_chars)
+    if version in rule['versions'] or stripped in rule['versions']:
+        return True
+    if rule['range'] is not None and stripped:
+        try:
+            return Version(stripped) in rule['range']
+        except InvalidVersion:
+            return False
+    return False
+
+def find_exclusion(index, ecosystem, name, version=''):
+    """
+    Return the rule excluding a dependency, or None when it is kept.
+
+    Args:
+        index (dict): Index from build_exclude_index
+        ecosystem (str): Ecosystem of the manifest, e.g. 'npm'
+        name (str): Package name
+        version (str, optional): Version or version requirement of the dependency. Defaults to ''.
+
+    Returns:
+        dict: Matching rule, its 'label' describes the exclusion
+    """
+    if not index or not index['size'] or not name:
+        return None
+
+    for key in ((ecosystem, name), (None, name)):
+        for rule in index['exact'].get(key, []):
+            if version_matches(rule, version):
+                return rule
+
+    # Prefix patterns: one dictionary lookup per distinct prefix length
+    for length in index['prefix_lengths']:
+        if length <= len(name):
+            prefix = name[:length]
+            for key in ((ecosystem, prefix), (None, prefix)):
+                for rule in index['prefixes'].get(key, []):
+                    if version_matches(rule, version):
+                        return rule
+
+    for rule_ecosystem, regex, rule in index['globs']:
+        if rule_ecosystem in (None, ecosystem) and regex.match(name) and version_matches(rule, version):
+            return rule
+    return None
+
+def remove_excluded(index, ecosystem, dependencies, source):
+    """
+    Remove the excluded packages of a {name: version} section, e.g. package.json dependencies, in place.
+
+    Returns:
+        bool: True when at least one package was removed
+    """
+    excluded = [(name, rule) for name, version in dependencies.items()
+                for rule in [find_exclusion(index, ecosystem, name, version if isinstance(version, str) else '')] if rule]
+    for name, rule in excluded:
+        del dependencies[name]
+        print(f"Excluded {name} ({rule['label']}) from {source}")
+    return bool(excluded)
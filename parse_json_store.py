@@ -1,7 +1,10 @@
 import json
 import os
 import sys
-import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+
+# Number of manifest entries written to disk at a time
+chunk_size = 1000
 
 def create_package(dependencies, file_path, manifest):
     manifest_functions = {
@@ -33,16 +36,36 @@ def create_package(dependencies, file_path, manifest):
         raise ValueError(f"Unsupported manifest type: {manifest}")
     return output_file_path
 
+def iter_dependencies(dependencies):
+    # Accept either a dictionary or an iterable of (name, version) pairs
+    if isinstance(dependencies, dict):
+        return iter(dependencies.items())
+    return iter(dependencies)
+
+def write_in_chunks(output_file, lines):
+    # Flush the generated lines to the file every chunk_size entries
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            output_file.writelines(chunk)
+            chunk = []
+    if chunk:
+        output_file.writelines(chunk)
+
 def create_npm_package_json(dependencies, output_file_path):
     try:
-        # Create a JSON object representing package.json dependencies
-        package_json = {
-            "dependencies": dependencies
-        }
+        def package_json_lines():
+            separator = '\n'
+            for name, version in iter_dependencies(dependencies):
+                yield f"{separator}    {json.dumps(name)}: {json.dumps(version)}"
+                separator = ',\n'
 
         # Save the resulting package.json-style dependencies to a file
         with open(output_file_path, 'w') as output_file:
-            json.dump(package_json, output_file, indent=2)
+            output_file.write('{\n  "dependencies": {')
+            write_in_chunks(output_file, package_json_lines())
+            output_file.write('\n  }\n}')
 
         print(f"Data saved to {output_file_path}")
     except Exception as e:
@@ -50,28 +73,18 @@ def create_npm_package_json(dependencies, output_file_path):
 
 def create_nuget_csproj(dependencies, output_file_path):
     try:
-        # Create the root element for the csproj XML
-        root = ET.Element("Project", attrib={"Sdk": "Microsoft.NET.Sdk"})
-        
-        # Add PropertyGroup with specified content
-        property_group = ET.SubElement(root, "PropertyGroup")
-        output_type = ET.SubElement(property_group, "OutputType")
-        output_type.text = "Exe"
-        target_framework = ET.SubElement(property_group, "TargetFramework")
-        target_framework.text = "net5.0"
-        
-        item_group = ET.SubElement(root, "ItemGroup")
-
-        # Add PackageReference elements for each dependency
-        for nuget_title, nuget_version in dependencies.items():
-            package_reference = ET.SubElement(
-                item_group, "PackageReference", 
-                attrib={"Include": nuget_title, "Version": nuget_version}
-                )
-
-        # Create the ElementTree and write to the csproj file
-        tree = ET.ElementTree(root)
-        tree.write(output_file_path)
+        def package_reference_lines():
+            # Add PackageReference elements for each dependency
+            for nuget_title, nuget_version in iter_dependencies(dependencies):
+                yield f'<PackageReference Include={quoteattr(nuget_title)} Version={quoteattr(nuget_version)} />'
+
+        # Write the csproj XML with the PropertyGroup and an ItemGroup holding the dependencies
+        with open(output_file_path, 'w', encoding='us-ascii', errors='xmlcharrefreplace') as csproj_file:
+            csproj_file.write('<Project Sdk="Microsoft.NET.Sdk">'
+                              '<PropertyGroup><OutputType>Exe</OutputType><TargetFramework>net5.0</TargetFramework></PropertyGroup>'
+                              '<ItemGroup>')
+            write_in_chunks(csproj_file, package_reference_lines())
+            csproj_file.write('</ItemGroup></Project>')
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
     else:
@@ -80,8 +93,7 @@ def create_nuget_csproj(dependencies, output_file_path):
 def create_pypi_requirements_txt(dependencies, output_file_path):
     try:
         with open(output_file_path, 'w') as requirements_file:
-            for dependency in dependencies:
-                requirements_file.write(f"{dependency}=={dependencies[dependency]}\n")
+            write_in_chunks(requirements_file, (f"{dependency}=={version}\n" for dependency, version in iter_dependencies(dependencies)))
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
     else:
@@ -89,50 +101,32 @@ def create_pypi_requirements_txt(dependencies, output_file_path):
 
 def create_maven_pom_xml(dependencies, output_file_path):
     try:
-        # Create the root element for the pom.xml file
-        root = ET.Element('project')
-        root.set('xmlns', 'http://maven.apache.org/POM/4.0.0')
-
-        # Add the modelVersion and groupId elements
-        model_version = ET.SubElement(root, 'modelVersion')
-        model_version.text = '4.0.0'
-
-        group_id = ET.SubElement(root, 'groupId')
-        group_id.text = 'org.openjfx'  
-
-        artifact_id = ET.SubElement(root, 'artifactId')
-        artifact_id.text = 'hellofx'
-
-        packaging_id = ET.SubElement(root, 'packaging')
-        packaging_id.text = 'jar'
-
-        version_id = ET.SubElement(root, 'version')
-        version_id.text = '1.0-SNAPSHOT'
-
-        name_id = ET.SubElement(root, 'name')
-        name_id.text = 'demo'
-
-        url_id = ET.SubElement(root, 'url')
-        url_id.text = 'http://maven.apache.org'
-
-        # Add the dependencies element
-        dependencies_element = ET.SubElement(root, 'dependencies')
-
-        # Add each dependency to the XML tree
-        for artifact_id, version in dependencies.items():
-            split_result = version.split('|')
-            if(split_result[0].count('.') == 2):
-                new_dependency = ET.SubElement(dependencies_element, 'dependency')
-                ET.SubElement(new_dependency, 'groupId').text = split_result[1]
-                ET.SubElement(new_dependency, 'artifactId').text = artifact_id
-                ET.SubElement(new_dependency, 'version').text = split_result[0]
-
-        # Create an ElementTree object
-        tree = ET.ElementTree(root)
-
-        # Write the XML tree to the pom.xml file
-        tree.write(output_file_path, encoding='utf-8', xml_declaration=True)
+        def dependency_lines():
+            # Add each dependency to the pom, the value holds 'version|groupId'
+            for artifact_id, version in iter_dependencies(dependencies):
+                split_result = version.split('|')
+                if(split_result[0].count('.') == 2):
+                    yield ('<dependency>'
+                           f'<groupId>{escape(split_result[1])}</groupId>'
+                           f'<artifactId>{escape(artifact_id)}</artifactId>'
+                           f'<version>{escape(split_result[0])}</version>'
+                           '</dependency>')
+
+        # Write the pom.xml with the project header and the dependencies element
+        with open(output_file_path, 'w', encoding='utf-8') as pom_file:
+            pom_file.write("<?xml version='1.0' encoding='utf-8'?>\n"
+                           '<project xmlns="http://maven.apache.org/POM/4.0.0">'
+                           '<modelVersion>4.0.0</modelVersion>'
+                           '<groupId>org.openjfx</groupId>'
+                           '<artifactId>hellofx</artifactId>'
+                           '<packaging>jar</packaging>'
+                           '<version>1.0-SNAPSHOT</version>'
+                           '<name>demo</name>'
+                           '<url>http://maven.apache.org</url>'
+                           '<dependencies>')
+            write_in_chunks(pom_file, dependency_lines())
+            pom_file.write('</dependencies></project>')
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
     else:
-        print(f"Created new pom.xml file with maven dependencies: {output_file_path}")
+        print(f"Created new pom.xml file with maven dependencies: {output_file_path}")
\ No newline at end of file
@@ -0,0 +1,117 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+def get_retry_after(response):
+    """Return the Retry-After hint of a response in seconds, or None."""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def poll_until(check_status, is_done, initial_delay=2, backoff_factor=1.5, max_interval=30, jitter=0.1, deadline=600, name='status'):
+    """
+    Poll check_status until is_done(status) is true, waiting longer between polls each time.
+
+    Args:
+        check_status (callable): Returns the current status, or a (status, retry_after) tuple.
+            A retry_after in seconds from the server replaces the computed delay.
+        is_done (callable): Returns True when polling can stop for the given status
+        initial_delay (float, optional): Delay before the first poll in seconds. Defaults to 2.
+        backoff_factor (float, optional): Multiplier applied to the delay after each poll. Defaults to 1.5.
+        max_interval (float, optional): Upper bound of the computed delay in seconds. Defaults to 30.
+        jitter (float, optional): Random +/- fraction applied to each delay. Defaults to 0.1.
+        deadline (float, optional): Overall time limit in seconds, None for no limit. Defaults to 600.
+        name (str, optional): Label used in the log lines. Defaults to 'status'.
+
+    Returns:
+        tuple: (status, stats) - last status and a dict with 'polls', 'waited' (seconds) and 'timed_out'
+    """
+    start_time = time.monotonic()
+    delay = initial_delay
+    retry_after = None
+    status = None
+    polls = 0
+    waited = 0.0
+
+    while True:
+        wait = get_wait(start_time, delay, retry_after, jitter, deadline)
+        if wait is None:
+            break
+
+        time.sleep(wait)
+        waited += wait
+
+        status, retry_after = split_result(check_status())
+        polls += 1
+        print(f'{name}: {status} (poll {polls}, waited {waited:.1f}s)')
+
+        if is_done(status):
+            return status, get_stats(name, polls, waited, False)
+
+        delay = min(delay * backoff_factor, max_interval)
+
+    return status, get_stats(name, polls, waited, True)
+
+async def async_poll_until(check_status, is_done, initial_delay=2, backoff_factor=1.5, max_interval=30, jitter=0.1, deadline=600, name='status'):
+    """
+    Asyncio version of poll_until, check_status is a coroutine function.
+
+    Returns:
+        tuple: (status, stats) - see poll_until
+    """
+    start_time = time.monotonic()
+    delay = initial_delay
+    retry_after = None
+    status = None
+    polls = 0
+    waited = 0.0
+
+    while True:
+        wait = get_wait(start_time, delay, retry_after, jitter, deadline)
+        if wait is None:
+            break
+
+        await asyncio.sleep(wait)
+        waited += wait
+
+        status, retry_after = split_result(await check_status())
+        polls += 1
+        print(f'{name}: {status} (poll {polls}, waited {waited:.1f}s)')
+
+        if is_done(status):
+            return status, get_stats(name, polls, waited, False)
+
+        delay = min(delay * backoff_factor, max_interval)
+
+    return status, get_stats(name, polls, waited, True)
+
+def get_wait(start_time, delay, retry_after, jitter, deadline):
+    # Seconds to wait before the next poll, None once the deadline has passed
+    wait = retry_after if retry_after is not None else delay * random.uniform(1 - jitter, 1 + jitter)
+    if deadline is not None:
+        remaining = deadline - (time.monotonic() - start_time)
+        if remaining <= 0:
+            return None
+        wait = min(wait, remaining)
+    return wait
+
+def split_result(result):
+    return result if isinstance(result, tuple) else (result, None)
+
+def get_stats(name, polls, waited, timed_out):
+    if timed_out:
+        print(f'{name} timed out after {polls} polls, {waited:.1f}s waiting')
+    else:
+        print(f'{name} done after {polls} polls, {waited:.1f}s waiting')
+    return {'polls': polls, 'waited': waited, 'timed_out': timed_out}
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+def get_user_cache_dir():
+    # Per-user cache directory, $XDG_CACHE_HOME/nexus-sca or ~/.cache/nexus-sca
+    base_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base_dir, 'nexus-sca')
+
+# Default store, shared by the SCA and SAST clients under namespaces scoped by API url and account
+default_cache_file = os.path.join(get_user_cache_dir(), 'project_cache.json')
+
+cache_lock = threading.Lock()
+
+def load_store(cache_file):
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_store(cache_file, store):
+    # A unique temp file next to the store, concurrent writers never share it and the rename is atomic
+    cache_dir = os.path.dirname(os.path.abspath(cache_file))
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    fd, temp_file = tempfile.mkstemp(prefix=os.path.basename(cache_file) + '.', suffix='.tmp', dir=cache_dir)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(store, f, indent=2)
+        os.replace(temp_file, cache_file)
+    except BaseException:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        raise
+
+def get_cached(namespace, name, field, ttl, cache_file=default_cache_file):
+    """
+    Return a cached value for a project, or None when missing or older than ttl seconds.
+
+    Args:
+        namespace (str): Client and server, e.g. 'sca:<api url>:<account>'
+        name (str): Project name
+        field (str): Cached field, e.g. 'id' or 'latest_scan_id'
+        ttl (float): Maximum age in seconds, 0 or None disables the cache
+        cache_file (str, optional): Store file. Defaults to default_cache_file.
+    """
+    if not ttl or not cache_file:
+        return None
+    with cache_lock:
+        entry = load_store(cache_file).get(namespace, {}).get(name, {})
+    cached = entry.get(field)
+    if cached is None or time.time() - cached.get('time', 0) > ttl:
+        return None
+    return cached.get('value')
+
+def set_cached(namespace, name, field, value, cache_file=default_cache_file):
+    if not cache_file:
+        return
+    with cache_lock:
+        try:
+            store = load_store(cache_file)
+            store.setdefault(namespace, {}).setdefault(name, {})[field] = {'value': value, 'time': time.time()}
+            save_store(cache_file, store)
+        except OSError as e:
+            print(f"Warning: Could not write project cache '{cache_file}': {e}")
+
+def invalidate(namespace, name=None, field=None, cache_file=default_cache_file):
+    """
+    Drop cached values: a single field, all fields of a project, or the whole namespace when name is None.
+    """
+    if not cache_file:
+        return
+    with cache_lock:
+        store = load_store(cache_file)
+        projects = store.get(namespace, {})
+        if name is None:
+            projects.clear()
+        elif field is None:
+            projects.pop(name, None)
+        else:
+            projects.get(name, {}).pop(field, None)
+        try:
+            save_store(cache_file, store)
+        except OSError as e:
+            print(f"Warning: Could not write project cache '{cache_file}': {e}")
@@ -0,0 +1,103 @@
+import io
+import re
+import zipfile
+import pandas as pd
+import archive_utils
+
+# Types of the Packages.csv columns read from csv exports, versions stay text so that '1.10' is not read as 1.1
+packages_csv_dtypes = {
+    'Name': 'string',
+    'Version': 'string',
+    'ReleaseDate': 'string',
+    'Licenses': 'string',
+    'NewestVersion': 'string',
+    'NewestVersionReleaseDate': 'string',
+    'Severity': 'string',
+    'PackageRepository': 'string',
+    'IsDirectDependency': 'boolean',
+    'IsDevelopmentDependency': 'boolean',
+    'IsTestDependency': 'boolean'
+}
+# Rows per chunk, the memory of a parse stays flat however large the report is
+packages_csv_chunksize = 50000
+
+def compile_license_regex(restricted_licenses):
+    """
+    Compile the restricted licenses into one regular expression that matches any of them as a substring.
+
+    Returns:
+        re.Pattern: Pattern for Series.str.contains, or None when the list is empty
+    """
+    if not restricted_licenses:
+        return None
+    # Longest first, so that e.g. 'AGPL' is not cut short by a 'GPL' alternative
+    licenses = sorted(set(restricted_licenses), key=len, reverse=True)
+    return re.compile('|'.join(re.escape(license) for license in licenses))
+
+def classify_packages(packages_df, restricted_licenses, license_regex=None):
+    """
+    Select the high severity and the restricted license packages of a Packages.csv report.
+
+    Each column is classified at once instead of row by row. Only the rows the license pattern matched
+    are looked at individually, to name their licenses in the order of restricted_licenses.
+
+    Args:
+        packages_df (pandas.DataFrame): Packages.csv with the Name, Version, Severity, IsDirectDependency and Licenses columns
+        restricted_licenses (list): License names reported when they appear in the Licenses column
+        license_regex (re.Pattern, optional): Pattern from compile_license_regex. Defaults to compiling restricted_licenses.
+
+    Returns:
+        tuple: (vulnerabilities, license_issues) lists of (name, version, dependency type) tuples, in report order
+    """
+    severity = packages_df['Severity'].astype(str).str.lower()
+    licenses = packages_df['Licenses'].astype(str)
+    # Python truthiness, as the former per-row 'if row['IsDirectDependency']', a missing value counts as direct
+    dependency_types = packages_df['IsDirectDependency'].astype(object).fillna(True).astype(bool).map({True: '(direct)', False: '(transitive)'})
+    names = packages_df['Name']
+    versions = packages_df['Version']
+
+    is_high = (severity == 'high').to_numpy()
+    vulnerabilities = list(zip(names[is_high].tolist(), versions[is_high].tolist(), dependency_types[is_high].tolist()))
+
+    license_issues = []
+    if license_regex is None:
+        license_regex = compile_license_regex(restricted_licenses)
+    if license_regex is not None:
+        has_license = licenses.str.contains(license_regex, regex=True, na=False).to_numpy(dtype=bool)
+        for name, version, dependency_type, license_text in zip(names[has_license].tolist(), versions[has_license].tolist(),
+                                                                dependency_types[has_license].tolist(), licenses[has_license].tolist()):
+            found_due_to_license = [license for license in restricted_licenses if license in license_text]
+            license_issues.append((name, version, dependency_type + f" - Found due to {', '.join(found_due_to_license)} license"))
+
+    return vulnerabilities, license_issues
+
+def iter_packages_csv(report, columns, chunksize=None):
+    """
+    Read Packages.csv of a csv export zip in chunks, without extracting it.
+
+    Args:
+        report (bytes, str or file): Export zip as bytes, a path or a seekable file object, e.g. a spooled buffer
+        columns (list): Columns to read, the other columns are not parsed. Missing columns are left out.
+        chunksize (int, optional): Rows per chunk. Defaults to packages_csv_chunksize.
+
+    Yields:
+        pandas.DataFrame: Chunks typed with packages_csv_dtypes
+
+    Raises:
+        KeyError: The zip has no Packages.csv
+    """
+    if isinstance(report, bytes):
+        report = io.BytesIO(report)
+    report = archive_utils.get_seekable(report)
+    wanted_columns = set(columns)
+    with zipfile.ZipFile(report, 'r') as zip_ref:
+        with zip_ref.open('Packages.csv') as csv_file:
+            chunks = pd.read_csv(
+                csv_file,
+                usecols=lambda column: column in wanted_columns,
+                dtype={column: dtype for column, dtype in packages_csv_dtypes.items() if column in wanted_columns},
+                chunksize=chunksize or packages_csv_chunksize
+            )
+            with chunks:
+                for chunk in chunks:
+                    yield chunk
@@ -0,0 +1,136 @@
+import os
+import shutil
+import uuid
+from datetime import date
+from urllib.parse import quote
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    ds = None
+    pq = None
+
+# Partition columns, the store holds <store_dir>/Project=<name>/ExportDate=<yyyy-mm-dd>/part-0.parquet
+project_column = 'Project'
+export_date_column = 'ExportDate'
+
+date_columns = ['ReleaseDate', 'NewestVersionReleaseDate']
+boolean_columns = ['IsDirectDependency']
+# Ordered severity categories, values outside this list are kept as extra categories
+severity_levels = ['None', 'Low', 'Medium', 'High', 'Critical']
+
+def is_available():
+    return pq is not None
+
+def get_column_type(column):
+    # Stored type of a column, every project file gets the same types so the partitions read as one table
+    if column in date_columns:
+        return pa.date32()
+    if column in boolean_columns:
+        return pa.bool_()
+    if column == 'Severity':
+        return pa.dictionary(pa.int8(), pa.string(), ordered=True)
+    return pa.string()
+
+def to_typed_frame(packages_df):
+    """
+    Convert export rows to typed columns: dates, nullable booleans and an ordered categorical Severity.
+
+    Args:
+        packages_df (pandas.DataFrame): Rows as written to sca_results.csv, with or without the Project column
+
+    Returns:
+        pandas.DataFrame: Typed copy without the Project column, which is stored in the partition path
+    """
+    typed_df = packages_df.drop(columns=[project_column], errors='ignore').copy()
+    for column in typed_df.columns:
+        if column not in date_columns + boolean_columns + ['Severity']:
+            typed_df[column] = typed_df[column].astype('string')
+    for column in date_columns:
+        if column in typed_df:
+            typed_df[column] = pd.to_datetime(typed_df[column], errors='coerce').dt.normalize()
+    for column in boolean_columns:
+        if column in typed_df:
+            typed_df[column] = typed_df[column].map(
+                lambda value: value if isinstance(value, bool) else {'true': True, 'false': False}.get(str(value).lower())
+            ).astype('boolean')
+    if 'Severity' in typed_df:
+        severity = typed_df['Severity'].astype('string')
+        extra_levels = sorted(set(severity.dropna()) - set(severity_levels))
+        typed_df['Severity'] = pd.Categorical(severity, categories=severity_levels + extra_levels, ordered=True)
+    return typed_df
+
+def get_project_dir(store_dir, project_name):
+    # Partition values are URI encoded, as pyarrow decodes them when reading a hive partitioned dataset
+    return os.path.join(store_dir, f"{project_column}={quote(project_name, safe='')}")
+
+def upsert_project(store_dir, project_name, packages_df, export_date=None):
+    """
+    Replace the rows of a project with packages_df.
+
+    The new partition is written next to the store and moved in place before the previous export
+    dates of the project are removed, readers never see a partly written file.
+
+    Args:
+        store_dir (str): Store directory
+        project_name (str): Project of the rows
+        packages_df (pandas.DataFrame): Rows of the project, see to_typed_frame
+        export_date (datetime.date, optional): Export date partition. Defaults to today.
+
+    Returns:
+        str: Path of the written parquet file
+    """
+    if not is_available():
+        raise RuntimeError("The results store requires pyarrow")
+    export_date = (export_date or date.today()).isoformat()
+    project_dir = get_project_dir(store_dir, project_name)
+    partition_dir = os.path.join(project_dir, f"{export_date_column}={export_date}")
+
+    # Directories starting with '_' are ignored by parquet readers
+    staging_dir = os.path.join(store_dir, f"_staging-{uuid.uuid4().hex}")
+    os.makedirs(staging_dir)
+    try:
+        table = pa.Table.from_pandas(to_typed_frame(packages_df), preserve_index=False)
+        table = table.cast(pa.schema([pa.field(name, get_column_type(name)) for name in table.column_names]))
+        pq.write_table(table, os.path.join(staging_dir, 'part-0.parquet'))
+
+        os.makedirs(project_dir, exist_ok=True)
+        replaced_dir = None
+        if os.path.exists(partition_dir):
+            replaced_dir = os.path.join(store_dir, f"_replaced-{uuid.uuid4().hex}")
+            os.rename(partition_dir, replaced_dir)
+        os.rename(staging_dir, partition_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    if replaced_dir:
+        shutil.rmtree(replaced_dir, ignore_errors=True)
+    for name in os.listdir(project_dir):
+        if name != os.path.basename(partition_dir):
+            shutil.rmtree(os.path.join(project_dir, name), ignore_errors=True)
+    return os.path.join(partition_dir, 'part-0.parquet')
+
+def read_results(store_dir, columns=None, projects=None):
+    """
+    Read the store, only the requested columns and project partitions are loaded.
+
+    Args:
+        store_dir (str): Store directory
+        columns (list, optional): Columns to read, partition columns included. Defaults to all columns.
+        projects (list, optional): Projects to read. Defaults to all projects.
+
+    Returns:
+        pandas.DataFrame: Rows of the store, empty when the store does not exist
+    """
+    if not is_available():
+        raise RuntimeError("The results store requires pyarrow")
+    if not os.path.isdir(store_dir) or not any(name.startswith(project_column + '=') for name in os.listdir(store_dir)):
+        return pd.DataFrame(columns=columns or [])
+    filters = [(project_column, 'in', list(projects))] if projects else None
+    # Partition values stay text, inferring their types would read numeric project names as integers
+    partitioning = ds.partitioning(pa.schema([(project_column, pa.string()), (export_date_column, pa.string())]), flavor='hive')
+    return pq.read_table(store_dir, columns=columns, filters=filters, partitioning=partitioning).to_pandas()
@@ -0,0 +1,45 @@
+import json_stream
+
+def get_report_details(request, api_url, web_url, scan_id, access_token, on_not_found=None, **request_args):
+    """
+    Return (result url, high, medium) of a scan from the RiskReportSummary of its json report.
+
+    The report is streamed and only read up to the end of RiskReportSummary, nothing is written to disk.
+
+    Args:
+        request (callable): requests.request, or the request method of a session
+        api_url (str): SCA API url
+        web_url (str): SCA web url, base of the result url
+        scan_id (str): Scan of the report
+        access_token (str): SCA access token
+        on_not_found (callable, optional): Called when the scan has no report, e.g. to drop a cached scan id. Defaults to None.
+        request_args: Other arguments of request, e.g. proxies and verify
+
+    Returns:
+        tuple: (resultUrl, high_vulnerability_count, medium_vulnerability_count), 0 on failure
+    """
+    try:
+        url = api_url + "/risk-management/risk-reports/" + scan_id + '/export?format=json&dataType[]=All'
+        headers = {
+        'Authorization': 'Bearer ' + access_token
+        }
+
+        # Closing the response once the summary is read drops the rest of the report
+        with request("GET", url, headers=headers, stream=True, **request_args) as response:
+            if response.status_code == 404:
+                if on_not_found:
+                    on_not_found()
+                print("Exception: SCA_get_report_details scan " + scan_id + " not found")
+                return 0
+            response.raise_for_status()
+            summary = json_stream.read_member(response.iter_content(chunk_size=64 * 1024), 'RiskReportSummary')
+
+        high_vulnerability_count = summary['HighVulnerabilityCount']
+        medium_vulnerability_count = summary['MediumVulnerabilityCount']
+        resultUrl = web_url + '/#/projects/' + summary['ProjectId']
+
+    except Exception as e:
+        print("Exception: SCA_get_report_details", str(e))
+        return 0
+    else:
+        return resultUrl, high_vulnerability_count, medium_vulnerability_count
@@ -28,6 +28,37 @@ def main():
             default="False", 
             help="Optional: perform incremental scan (True/False)."
         )
+        parser.add_argument(
+            "--incremental", 
+            action="store_true", 
+            help="Optional: Upload only the files changed since the last completed scan, same as --incremental_scan True."
+        )
+        parser.add_argument(
+            "--in_memory", 
+            action="store_true", 
+            help="Optional: Build the source zip in memory instead of next to the source folder."
+        )
+        parser.add_argument(
+            "--languages", 
+            default="", 
+            help="Optional: Comma separated languages whose sources are zipped, e.g. 'java,javascript'. Overrides SAST_source_languages, implies --source_filter."
+        )
+        parser.add_argument(
+            "--max_file_size_mb", 
+            type=float, 
+            default=None, 
+            help="Optional: Skip source files larger than this size in MB. Overrides SAST_source_max_file_size_mb, implies --source_filter."
+        )
+        parser.add_argument(
+            "--source_filter", 
+            action="store_true", 
+            help="Optional: Leave binaries and dependency folders out of the source zip, same as SAST_source_filter true."
+        )
+        parser.add_argument(
+            "--no_source_filter", 
+            action="store_true", 
+            help="Optional: Zip every file of the source folder, including binaries and dependency folders."
+        )
 
         args = parser.parse_args()
 
@@ -36,7 +67,16 @@ def main():
         team_name = args.team_name
         
         # Convert string to boolean
-        incremental = args.incremental_scan.lower() in ('true', 'yes', '1', 'y')
+        incremental = args.incremental or args.incremental_scan.lower() in ('true', 'yes', '1', 'y')
+
+        if args.source_filter or args.languages or args.max_file_size_mb is not None:
+            SAST_api.SAST_source_filter = True
+        if args.languages:
+            SAST_api.SAST_source_languages = [language.strip() for language in args.languages.split(',') if language.strip()]
+        if args.max_file_size_mb is not None:
+            SAST_api.SAST_source_max_file_size_mb = args.max_file_size_mb
+        if args.no_source_filter:
+            SAST_api.SAST_source_filter = False
 
         print(f"source folder = {source_folder}")
         print(f"project name = {project_name}")
@@ -44,7 +84,7 @@ def main():
         print(f"incremental_scan = {incremental}")
 
         # Call with proper boolean parameter
-        scan_status = SAST_api.scan_source_folder(project_name, source_folder, team_name, incremental)
+        scan_status = SAST_api.scan_source_folder(project_name, source_folder, team_name, incremental, args.in_memory or None)
 
     except SystemExit as e:
         print(f"SystemExit: {e}. Check if required arguments are provided.")
@@ -1,17 +1,25 @@
+# Standalone script with its settings inline. It needs these local modules copied next to it:
+# archive_utils, json_stream, manifest_cache, manifest_walk, package_exclusions,
+# polling, project_cache, report_analysis and risk_reports. report_analysis also needs pandas.
 import requests
 import os
 import sys
 import json
-import zipfile
-import fnmatch
 import xml.etree.ElementTree as ET
-import time
 import shutil
 import tempfile
 import argparse
 import traceback
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 import urllib3
+import polling
+import project_cache
+import manifest_walk
+import package_exclusions
+import manifest_cache
+import archive_utils
+import risk_reports
+import report_analysis
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 SCA_account = 'moj'
@@ -27,6 +35,20 @@ proxy_servers = {
    'https': SCA_proxy
 }
 
+# Scan status polling, see polling.poll_until
+SCA_poll_settings = {
+    'initial_delay': 2,
+    'backoff_factor': 1.5,
+    'max_interval': 30,
+    'jitter': 0.1,
+    'deadline': 600
+}
+
+# Manifest fingerprint, scan id and summary of the last scan of each project, used by --reuse_results.
+# Kept in the per-user cache directory, so runs from any directory share it
+scan_state_file = os.path.join(project_cache.get_user_cache_dir(), 'sca_scan_state.json')
+last_scan_ttl = 7 * 86400
+
 # Global exclude package list
 EXCLUDE_PACKAGES = [
     # Format: {"package": "package-name", "version": "version-to-exclude"}
@@ -35,23 +57,31 @@ EXCLUDE_PACKAGES = [
      {"package": "local3", "version": ""}
 ]
 
+# Lookup index of EXCLUDE_PACKAGES, rebuilt by load_exclude_packages, see package_exclusions
+EXCLUDE_INDEX = package_exclusions.build_exclude_index(EXCLUDE_PACKAGES)
+
 # Global setting for removing dev dependencies
 REMOVE_DEV_DEPENDENCIES = True
 
 # Define a global list of restricted licenses
 RESTRICTED_LICENSES = ["AGPL"]  # You can extend this list as needed
 
-# Define the patterns to include in the zip file
-manifest_patterns = ['package.json', 'packages.config', '*.csproj', 'requirements.txt', 'pom.xml', 'composer.json', 'Directory.Packages.props']
+# Directories never entered while looking for manifests, and whether .gitignore / .scaignore files are honored
+prune_directories = manifest_walk.default_prune_dirs
+use_ignore_files = True
+
+# Processed manifests are cached by content hash in this folder, None disables the cache
+manifest_cache_dir = manifest_cache.default_cache_dir
 
 # Load exclude packages from JSON file if it exists
 def load_exclude_packages(exclude_file):
-    global EXCLUDE_PACKAGES
+    global EXCLUDE_PACKAGES, EXCLUDE_INDEX
     try:
         if os.path.exists(exclude_file):
             with open(exclude_file, 'r') as f:
                 EXCLUDE_PACKAGES = json.load(f)
                 print(f"Loaded {len(EXCLUDE_PACKAGES)} packages to exclude")
+        EXCLUDE_INDEX = package_exclusions.build_exclude_index(EXCLUDE_PACKAGES)
     except Exception as e:
         print(f"Error loading exclude packages: {e}")
 
@@ -231,10 +261,16 @@ def SCA_scan_zip(project_id, upload_file_url, access_token=""):
         return None
     
 def SCA_get_scan_status(scan_id, access_token=""):
+    current_status, retry_after = SCA_poll_scan_status(scan_id, access_token)
+    return current_status
+
+def SCA_poll_scan_status(scan_id, access_token=""):
+    # Same as SCA_get_scan_status, also returns the server Retry-After hint (or None)
     if(not access_token):
         access_token = SCA_get_access_token()
 
     url = SCA_api_url + "/api/scans/" + scan_id
+    retry_after = None
 
     try:
         payload = {}
@@ -243,6 +279,7 @@ def SCA_get_scan_status(scan_id, access_token=""):
         }
 
         response = requests.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
+        retry_after = polling.get_retry_after(response)
         status = response.content
 
         # Convert binary to string and parse JSON
@@ -254,145 +291,154 @@ def SCA_get_scan_status(scan_id, access_token=""):
    
     except Exception as e:
         print("Exception: SCA_get_scan_status", str(e))
-        return ""
+        return "", retry_after
     else:
-        print('SCA_get_scan_status')
-        return current_status
+        return current_status, retry_after
 
-def SCA_get_report(project_name, report_type, access_token=""):
-    if(not access_token):
-        access_token = SCA_get_access_token()
+def SCA_get_report_buffer(project_name, report_type, access_token="", scan_id=None):
+    """
+    Stream a report export into a spooled buffer instead of a file next to the script.
 
-    scan_id = SCA_get_project_latest_scan_id(project_name, access_token)
-    if scan_id:
-        try:
-            url = SCA_api_url + "/risk-management/risk-reports/" + scan_id + '/' + 'export?format=' + report_type + '&dataType[]=All'
-        
-            payload = {}
-            headers = {
-            'Authorization': 'Bearer ' + access_token
-            }
+    The buffer stays in memory up to archive_utils.spool_max_size and only spills to an anonymous
+    temporary file for larger reports.
 
-            response = requests.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
-            pdf_content = response.content
-            if report_type.lower() == 'csv':
-                report_path = os.getcwd() + '\\' + project_name + '_SCA_report.zip'
-            else:    
-                report_path = os.getcwd() + '\\' + project_name + '_SCA_report.' + report_type
-            with open(report_path, 'wb') as f:
-                f.write(pdf_content)
-        except Exception as e:
-            print("Exception: SCA_get_report", str(e))
-            return ""
-        else:
-            # print('SCA_get_report')
-            return report_path
-    else:
-        return ""
+    Returns:
+        SpooledTemporaryFile: Report positioned at its start, the caller closes it. None on failure
+    """
+    if(not access_token):
+        access_token = SCA_get_access_token()
 
+    if not scan_id:
+        scan_id = SCA_get_project_latest_scan_id(project_name, access_token)
+    if not scan_id:
+        return None
 
-def SCA_report_get_details_from_json(file_path):
+    buffer = archive_utils.new_spooled_buffer()
     try:
-        # Load JSON data from the file with explicit encoding
-        with open(file_path, encoding='utf-8') as file:
-            json_data = json.load(file)
-
-        high_vulnerability_count = json_data['RiskReportSummary']['HighVulnerabilityCount']
-        medium_vulnerability_count = json_data['RiskReportSummary']['MediumVulnerabilityCount']
-        resultUrl = SCA_url + '/#/projects/' + json_data['RiskReportSummary']['ProjectId']
+        url = SCA_api_url + "/risk-management/risk-reports/" + scan_id + '/' + 'export?format=' + report_type + '&dataType[]=All'
+        headers = {
+        'Authorization': 'Bearer ' + access_token
+        }
 
+        with requests.request("GET", url, headers=headers, proxies=proxy_servers, verify=False, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                buffer.write(chunk)
+        buffer.seek(0)
+        return buffer
     except Exception as e:
-        print("Exception: SCA_report_get_high_vulnerabilities_count failed:", str(e))
-        return 0
-    else:
-        return resultUrl, high_vulnerability_count, medium_vulnerability_count
+        print("Exception: SCA_get_report_buffer", str(e))
+        buffer.close()
+        return None
 
 def get_vulnerable_packages_from_report(project_name, access_token=""):
     try:
         if not access_token:
             access_token = SCA_get_access_token()
 
-        SCA_report_path = SCA_get_report(project_name, 'csv', access_token)
-        if not SCA_report_path:
+        SCA_report = SCA_get_report_buffer(project_name, 'csv', access_token)
+        if not SCA_report:
             print(f"No SCA report found for project: {project_name}")
             return [], []
 
-        # Step 4: Extract and process the CSV files from the zip
-        csv_filename = 'Packages.csv'
-        extracted_data = {}
-
         try:
-            with zipfile.ZipFile(SCA_report_path, 'r') as zip_ref:
-                with zip_ref.open(csv_filename) as csv_file:
-                    extracted_data[csv_filename] = pd.read_csv(csv_file)
-
-            # Process Packages.csv if it was successfully extracted
-            if csv_filename in extracted_data:
-                packages_df = extracted_data[csv_filename]
-
+            # Read only the classified columns of Packages.csv, chunk by chunk, straight from the zip
+            license_regex = report_analysis.compile_license_regex(RESTRICTED_LICENSES)
+            vulnerabilities = []
+            license_issues = []
+            columns = ['Name', 'Version', 'Severity', 'IsDirectDependency', 'Licenses']
+            for packages_df in report_analysis.iter_packages_csv(SCA_report, columns):
                 # Ensure necessary columns exist before filtering
-                required_columns = {'Severity', 'IsDirectDependency', 'Licenses'}
-                if not required_columns.issubset(packages_df.columns):
+                if not set(columns).issubset(packages_df.columns):
                     print("Warning: Required columns not found in CSV")
                     return [], []
 
-                # Convert columns to strings (avoid NaN type issues)
-                packages_df['Severity'] = packages_df['Severity'].astype(str).str.lower()
-                packages_df['Licenses'] = packages_df['Licenses'].astype(str)
-
                 # Separate high-severity vulnerabilities and license issues
-                vulnerabilities = []
-                license_issues = []
-
-                for _, row in packages_df.iterrows():
-                    package_name = row['Name']
-                    package_version = row['Version']
-                    dependency_type = "(direct)" if row['IsDirectDependency'] else "(transitive)"
-                    
-                    # Check if package is listed due to a restricted license
-                    found_due_to_license = [
-                        license for license in RESTRICTED_LICENSES if license in row['Licenses']
-                    ]
-
-                    # Classify package into the correct list
-                    if row['Severity'] == 'high':
-                        vulnerabilities.append((package_name, package_version, dependency_type))
-                    if found_due_to_license:
-                        license_text = f" - Found due to {', '.join(found_due_to_license)} license"
-                        license_issues.append((package_name, package_version, dependency_type + license_text))
-
-                # Print vulnerabilities
-                if vulnerabilities:
-                    print(f"\nHigh Severity Vulnerable Packages in '{project_name}':")
-                    for package, version, dep_type in vulnerabilities:
-                        print(f"- {package} {version} {dep_type}")
-                else:
-                    print(f"No high severity packages found for project '{project_name}'.")
+                chunk_vulnerabilities, chunk_license_issues = report_analysis.classify_packages(packages_df, RESTRICTED_LICENSES, license_regex)
+                vulnerabilities.extend(chunk_vulnerabilities)
+                license_issues.extend(chunk_license_issues)
+
+            # Print vulnerabilities
+            if vulnerabilities:
+                print(f"\nHigh Severity Vulnerable Packages in '{project_name}':")
+                for package, version, dep_type in vulnerabilities:
+                    print(f"- {package} {version} {dep_type}")
+            else:
+                print(f"No high severity packages found for project '{project_name}'.")
 
-                # Print license issues
-                if license_issues:
-                    print(f"\nRestricted License Packages in '{project_name}':")
-                    for package, version, dep_type in license_issues:
-                        print(f"- {package} {version} {dep_type}")
-                else:
-                    print(f"No restricted license packages found for project '{project_name}'.")
+            # Print license issues
+            if license_issues:
+                print(f"\nRestricted License Packages in '{project_name}':")
+                for package, version, dep_type in license_issues:
+                    print(f"- {package} {version} {dep_type}")
+            else:
+                print(f"No restricted license packages found for project '{project_name}'.")
 
-                return vulnerabilities, license_issues
+            return vulnerabilities, license_issues
 
         except Exception as project_error:
             print(f"Error processing project '{project_name}': {project_error}")
             return [], []
 
         finally:
-            # Delete the zip file after processing
-            if os.path.exists(SCA_report_path):
-                os.remove(SCA_report_path)
+            SCA_report.close()
 
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         return [], []
 
-def SCA_scan_packages(project_name, zip_manifest_file, team_name=None):
+def SCA_get_report_summary(project_name, access_token, scan_id=None):
+    # Read the RiskReportSummary of a scan (default: the latest one) and return its summary dict, or None
+    if not scan_id:
+        scan_id = SCA_get_project_latest_scan_id(project_name, access_token)
+    details = risk_reports.get_report_details(requests.request, SCA_api_url, SCA_url, scan_id, access_token,
+                                              proxies=proxy_servers, verify=False) if scan_id else 0
+    if not details:
+        print("Failed to generate or retrieve report")
+        return None
+    resultUrl, high_vulnerability_count, medium_vulnerability_count = details
+    print(f'High vulnerabilities: {high_vulnerability_count}, Medium vulnerabilities: {medium_vulnerability_count}')
+    return {'high': high_vulnerability_count, 'medium': medium_vulnerability_count, 'result_url': resultUrl}
+
+def check_threshold(project_name, summary, access_token):
+    # Return 1 when the high vulnerability count of the summary exceeds the threshold
+    if summary['high'] > SCA_high_threshold:
+        print(f"High vulnerability threshold exceeded: {summary['high']} > {SCA_high_threshold}")
+        get_vulnerable_packages_from_report(project_name, access_token)
+        return 1
+    return None
+
+def get_cache_namespace():
+    # Entries of the scan state file are scoped by API url and account
+    return 'sca:' + SCA_api_url + ':' + SCA_account
+
+def reuse_last_scan(project_name, fingerprint, access_token):
+    """
+    Return the verdict of the last scan of the project when its manifests had the same fingerprint.
+
+    The cached summary is used as is, a scan without a cached summary only has its report fetched again.
+
+    Returns:
+        tuple: (reused, scan status) where reused is False when the project has to be scanned
+    """
+    last_scan = project_cache.get_cached(get_cache_namespace(), project_name, 'last_scan', last_scan_ttl, scan_state_file)
+    if not fingerprint or not last_scan or last_scan.get('fingerprint') != fingerprint:
+        return False, None
+
+    print(f"Manifests unchanged since scan {last_scan['scan_id']}, reusing its results")
+    if SCA_high_threshold is None or SCA_high_threshold < 0:
+        return True, None
+
+    if last_scan.get('summary') is None:
+        last_scan['summary'] = SCA_get_report_summary(project_name, access_token, last_scan['scan_id'])
+        if last_scan['summary'] is None:
+            return False, None
+        project_cache.set_cached(get_cache_namespace(), project_name, 'last_scan', last_scan, scan_state_file)
+    else:
+        print(f"High vulnerabilities: {last_scan['summary']['high']}, Medium vulnerabilities: {last_scan['summary']['medium']}")
+    return True, check_threshold(project_name, last_scan['summary'], access_token)
+
+def SCA_scan_packages(project_name, zip_manifest_file, team_name=None, reuse_results=False):
     access_token = SCA_get_access_token()
     global SCA_high_threshold
     
@@ -405,6 +451,13 @@ def SCA_scan_packages(project_name, zip_manifest_file, team_name=None):
         SCA_high_threshold = -1
         
     if access_token:
+        # Same manifests as the last scan of the project: return its verdict without uploading
+        fingerprint = manifest_cache.manifest_fingerprint(zip_manifest_file)
+        if reuse_results:
+            reused, scan_status = reuse_last_scan(project_name, fingerprint, access_token)
+            if reused:
+                return scan_status
+
         project_id = SCA_get_project_id(project_name, access_token)
         if (project_id == ''):
             project_id = SCA_create_project(project_name, access_token, team_name)
@@ -417,35 +470,26 @@ def SCA_scan_packages(project_name, zip_manifest_file, team_name=None):
                 print(f"Starting scan with high vulnerability threshold: {SCA_high_threshold}")
                 if SCA_high_threshold is not None and SCA_high_threshold >= 0:
                     print(f"Will check vulnerabilities against threshold: {SCA_high_threshold}")
-                    status = 'Running'
-                    max_retries = 120  # 10 minutes with 5-second intervals
-                    retries = 0
-
-                    while status == 'Running' and retries < max_retries:
-                        time.sleep(5)
-                        retries += 1
-                        status = SCA_get_scan_status(scan_id, access_token)
-                        print(f'Scan status: {status} (attempt {retries}/{max_retries})')
-
-                    if retries >= max_retries and status == 'Running':
-                        print("Scan timed out after 10 minutes")
+                    status, poll_stats = polling.poll_until(
+                        lambda: SCA_poll_scan_status(scan_id, access_token),
+                        lambda status: status != 'Running',
+                        name='Scan status',
+                        **SCA_poll_settings
+                    )
+
+                    if poll_stats['timed_out']:
+                        print(f"Scan timed out after {SCA_poll_settings['deadline']} seconds")
                         return None
 
-                    report_path = SCA_get_report(project_name, 'json', access_token)
-                    if report_path and os.path.exists(report_path):
-                        try:
-                            resultUrl, high_vulnerability_count, medium_vulnerability_count = SCA_report_get_details_from_json(report_path)
-                            print(f'High vulnerabilities: {high_vulnerability_count}, Medium vulnerabilities: {medium_vulnerability_count}')
-                            os.remove(report_path)
-
-                            if high_vulnerability_count > SCA_high_threshold:
-                                print(f"High vulnerability threshold exceeded: {high_vulnerability_count} > {SCA_high_threshold}")
-                                get_vulnerable_packages_from_report(project_name, access_token)
-                                return 1
-                        except Exception as e:
-                            print(f"Error analyzing report: {str(e)}")
-                    else:
-                        print("Failed to generate or retrieve report")
+                    summary = SCA_get_report_summary(project_name, access_token, scan_id)
+                    if summary is not None:
+                        if scan_id and fingerprint and status == 'Done':
+                            project_cache.set_cached(get_cache_namespace(), project_name, 'last_scan', {'fingerprint': fingerprint, 'scan_id': scan_id, 'summary': summary}, scan_state_file)
+                        return check_threshold(project_name, summary, access_token)
+
+                elif scan_id and fingerprint:
+                    # Scan not awaited, its report is fetched the first time the results are reused
+                    project_cache.set_cached(get_cache_namespace(), project_name, 'last_scan', {'fingerprint': fingerprint, 'scan_id': scan_id, 'summary': None}, scan_state_file)
 
                 return None
     return None
@@ -460,17 +504,7 @@ def process_package_json(file_path, temp_dir):
         
         # Process dependencies
         if 'dependencies' in data:
-            orig_deps = data['dependencies'].copy()
-            for exclude in EXCLUDE_PACKAGES:
-                pkg_name = exclude['package']
-                version = exclude['version']
-                
-                if pkg_name in data['dependencies']:
-                    # If version is empty or matches the dependency version
-                    if not version or data['dependencies'][pkg_name] == version or data['dependencies'][pkg_name].strip('^~>=<') == version.strip('^~>=<'):
-                        del data['dependencies'][pkg_name]
-                        print(f"Excluded {pkg_name}@{version if version else 'all versions'} from dependencies")
-                        modified = True
+            modified = package_exclusions.remove_excluded(EXCLUDE_INDEX, 'npm', data['dependencies'], 'dependencies')
         
         # Process devDependencies - remove them if REMOVE_DEV_DEPENDENCIES is True
         if 'devDependencies' in data:
@@ -481,17 +515,7 @@ def process_package_json(file_path, temp_dir):
                 modified = True
             else:
                 # Otherwise just remove excluded packages from devDependencies
-                orig_dev_deps = data['devDependencies'].copy()
-                for exclude in EXCLUDE_PACKAGES:
-                    pkg_name = exclude['package']
-                    version = exclude['version']
-                    
-                    if pkg_name in data['devDependencies']:
-                        # If version is empty or matches the dependency version
-                        if not version or data['devDependencies'][pkg_name] == version or data['devDependencies'][pkg_name].strip('^~>=<') == version.strip('^~>=<'):
-                            del data['devDependencies'][pkg_name]
-                            print(f"Excluded {pkg_name}@{version if version else 'all versions'} from devDependencies")
-                            modified = True
+                modified = package_exclusions.remove_excluded(EXCLUDE_INDEX, 'npm', data['devDependencies'], 'devDependencies') or modified
         
         if modified:
             # Create a filename based on the original filename without the full path
@@ -515,24 +539,19 @@ def process_packages_config(file_path, temp_dir):
         root = tree.getroot()
         modified = False
         
-        # Find and remove excluded packages
-        for exclude in EXCLUDE_PACKAGES:
-            pkg_name = exclude['package']
-            version = exclude['version']
-            
-            for package in root.findall(".//package"):
-                if package.get('id') == pkg_name:
-                    # If version is empty or matches
-                    if not version or package.get('version') == version:
-                        root.remove(package)
-                        print(f"Excluded {pkg_name}@{version if version else 'all versions'} from packages.config")
-                        modified = True
-                        
-                # Check for developmentDependency attribute if REMOVE_DEV_DEPENDENCIES is True
-                if REMOVE_DEV_DEPENDENCIES and package.get('developmentDependency') == 'true':
-                    root.remove(package)
-                    print(f"Removed development dependency: {package.get('id')}")
-                    modified = True
+        # Find and remove excluded packages in a single pass
+        for package in root.findall("package"):
+            rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'nuget', package.get('id'), package.get('version'))
+            if rule:
+                root.remove(package)
+                print(f"Excluded {package.get('id')} ({rule['label']}) from packages.config")
+                modified = True
+                
+            # Check for developmentDependency attribute if REMOVE_DEV_DEPENDENCIES is True
+            elif REMOVE_DEV_DEPENDENCIES and package.get('developmentDependency') == 'true':
+                root.remove(package)
+                print(f"Removed development dependency: {package.get('id')}")
+                modified = True
         
         if modified:
             # Create a filename based on the original filename without the full path
@@ -554,29 +573,20 @@ def process_csproj(file_path, temp_dir):
         root = tree.getroot()
         modified = False
         
-        # Find and remove excluded packages
-        for exclude in EXCLUDE_PACKAGES:
-            pkg_name = exclude['package']
-            version = exclude['version']
-            
-            print('pkg_name '+ pkg_name)
-            
-            # Find all ItemGroup elements first
-            for item_group in root.findall(".//ItemGroup"):
-                # Then check each PackageReference within each ItemGroup
-                for package_ref in item_group.findall("PackageReference"):
-                    if package_ref.get('Include') == pkg_name:
-                        # If version is empty or matches
-                        if not version or package_ref.get('Version') == version:
-                            item_group.remove(package_ref)
-                            print(f"Excluded {pkg_name}@{version if version else 'all versions'} from csproj")
-                            modified = True
-                    
-                    # Check for DevelopmentDependency attribute if REMOVE_DEV_DEPENDENCIES is True
-                    if REMOVE_DEV_DEPENDENCIES and package_ref.get('DevelopmentDependency') == 'true':
-                        item_group.remove(package_ref)
-                        print(f"Removed development dependency: {package_ref.get('Include')}")
-                        modified = True
+        # Find and remove excluded packages in a single pass over the ItemGroup elements
+        for item_group in root.findall(".//ItemGroup"):
+            for package_ref in item_group.findall("PackageReference"):
+                rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'nuget', package_ref.get('Include'), package_ref.get('Version'))
+                if rule:
+                    item_group.remove(package_ref)
+                    print(f"Excluded {package_ref.get('Include')} ({rule['label']}) from csproj")
+                    modified = True
+                
+                # Check for DevelopmentDependency attribute if REMOVE_DEV_DEPENDENCIES is True
+                elif REMOVE_DEV_DEPENDENCIES and package_ref.get('DevelopmentDependency') == 'true':
+                    item_group.remove(package_ref)
+                    print(f"Removed development dependency: {package_ref.get('Include')}")
+                    modified = True
         
         if modified:
             # Create a filename based on the original filename without the full path
@@ -602,20 +612,14 @@ def process_directory_packages(file_path, temp_dir):
         for item_group in root.findall(".//ItemGroup"):
             # Find and remove excluded packages
             for package_version in item_group.findall("PackageVersion"):
-                # Check if this package is in our exclude list
-                for exclude in EXCLUDE_PACKAGES:
-                    pkg_name = exclude['package']
-                    version = exclude['version']
-                    
-                    if package_version.get('Include') == pkg_name:
-                        # If version is empty or matches
-                        if not version or package_version.get('Version') == version:
-                            item_group.remove(package_version)
-                            print(f"Excluded {pkg_name}@{version if version else 'all versions'} from Directory.Packages.props")
-                            modified = True
+                rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'nuget', package_version.get('Include'), package_version.get('Version'))
+                if rule:
+                    item_group.remove(package_version)
+                    print(f"Excluded {package_version.get('Include')} ({rule['label']}) from Directory.Packages.props")
+                    modified = True
                 
                 # Check for DevelopmentDependency attribute if REMOVE_DEV_DEPENDENCIES is True
-                if REMOVE_DEV_DEPENDENCIES and package_version.get('DevelopmentDependency') == 'true':
+                elif REMOVE_DEV_DEPENDENCIES and package_version.get('DevelopmentDependency') == 'true':
                     item_group.remove(package_version)
                     print(f"Removed development dependency: {package_version.get('Include')}")
                     modified = True
@@ -668,16 +672,14 @@ def process_requirements_txt(file_path, temp_dir):
             
             # Check if package should be excluded
             exclude_this = False
-            for exclude in EXCLUDE_PACKAGES:
-                if exclude['package'] == pkg_name:
-                    if not exclude['version'] or exclude['version'] == pkg_version:
-                        print(f"Excluded {pkg_name}@{pkg_version if pkg_version else 'all versions'} from requirements.txt")
-                        exclude_this = True
-                        modified = True
-                        break
+            rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'pypi', pkg_name, pkg_version)
+            if rule:
+                print(f"Excluded {pkg_name}@{pkg_version if pkg_version else 'all versions'} ({rule['label']}) from requirements.txt")
+                exclude_this = True
+                modified = True
             
             # Check for dev packages (typically indicated by a comment)
-            if REMOVE_DEV_DEPENDENCIES and ('#' in line and any(dev_marker in line.lower() for dev_marker in ['dev ', 'development', 'test'])):
+            elif REMOVE_DEV_DEPENDENCIES and ('#' in line and any(dev_marker in line.lower() for dev_marker in ['dev ', 'development', 'test'])):
                 print(f"Excluded development dependency: {pkg_name}")
                 exclude_this = True
                 modified = True
@@ -707,38 +709,35 @@ def process_pom_xml(file_path, temp_dir):
         root = tree.getroot()
         # Handle default namespace in pom.xml
         namespaces = {'m': 'http://maven.apache.org/POM/4.0.0'}
+        ET.register_namespace('', namespaces['m'])
         modified = False
         
-        # Find and remove excluded dependencies
-        for exclude in EXCLUDE_PACKAGES:
-            pkg_name = exclude['package']
-            version = exclude['version']
-            
-            # Find dependencies with matching artifactId
-            for dependency in root.findall(".//m:dependencies/m:dependency", namespaces):
+        # Find and remove excluded dependencies in a single pass, each dependencies element is the parent of its entries
+        for dependencies in root.findall(".//m:dependencies", namespaces):
+            for dependency in dependencies.findall("m:dependency", namespaces):
                 artifact_id = dependency.find("m:artifactId", namespaces)
+                artifact_id_text = artifact_id.text if artifact_id is not None else "unknown"
                 
-                if artifact_id is not None and artifact_id.text == pkg_name:
-                    # If version is empty or matches
-                    dep_version = dependency.find("m:version", namespaces)
-                    if not version or (dep_version is not None and dep_version.text == version):
-                        # Remove from parent
-                        parent = dependency.getparent()
-                        if parent is not None:
-                            parent.remove(dependency)
-                            print(f"Excluded {pkg_name}@{version if version else 'all versions'} from pom.xml")
-                            modified = True
+                # Exclude entries match either the artifactId or groupId:artifactId
+                group_id = dependency.find("m:groupId", namespaces)
+                dep_version = dependency.find("m:version", namespaces)
+                dep_version_text = dep_version.text if dep_version is not None else ''
+                rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'maven', artifact_id_text, dep_version_text)
+                if rule is None and group_id is not None:
+                    rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'maven', f"{group_id.text}:{artifact_id_text}", dep_version_text)
+                if rule:
+                    dependencies.remove(dependency)
+                    print(f"Excluded {artifact_id_text} ({rule['label']}) from pom.xml")
+                    modified = True
+                    continue
                 
                 # Check for scope element (test, provided) if REMOVE_DEV_DEPENDENCIES is True
                 if REMOVE_DEV_DEPENDENCIES:
                     scope = dependency.find("m:scope", namespaces)
                     if scope is not None and scope.text in ['test', 'provided']:
-                        parent = dependency.getparent()
-                        if parent is not None:
-                            parent.remove(dependency)
-                            artifact_id_text = artifact_id.text if artifact_id is not None else "unknown"
-                            print(f"Removed {scope.text} dependency: {artifact_id_text}")
-                            modified = True
+                        dependencies.remove(dependency)
+                        print(f"Removed {scope.text} dependency: {artifact_id_text}")
+                        modified = True
         
         if modified:
             # Create a filename based on the original filename without the full path
@@ -763,17 +762,7 @@ def process_composer_json(file_path, temp_dir):
         
         # Process require section
         if 'require' in data:
-            orig_deps = data['require'].copy()
-            for exclude in EXCLUDE_PACKAGES:
-                pkg_name = exclude['package']
-                version = exclude['version']
-                
-                if pkg_name in data['require']:
-                    # If version is empty or matches the dependency version
-                    if not version or data['require'][pkg_name] == version or data['require'][pkg_name].strip('^~>=<') == version.strip('^~>=<'):
-                        del data['require'][pkg_name]
-                        print(f"Excluded {pkg_name}@{version if version else 'all versions'} from composer.json require")
-                        modified = True
+            modified = package_exclusions.remove_excluded(EXCLUDE_INDEX, 'composer', data['require'], 'composer.json require')
         
         # Process require-dev section
         if 'require-dev' in data:
@@ -784,17 +773,7 @@ def process_composer_json(file_path, temp_dir):
                 modified = True
             else:
                 # Otherwise just remove excluded packages from require-dev
-                orig_dev_deps = data['require-dev'].copy()
-                for exclude in EXCLUDE_PACKAGES:
-                    pkg_name = exclude['package']
-                    version = exclude['version']
-                    
-                    if pkg_name in data['require-dev']:
-                        # If version is empty or matches the dependency version
-                        if not version or data['require-dev'][pkg_name] == version or data['require-dev'][pkg_name].strip('^~>=<') == version.strip('^~>=<'):
-                            del data['require-dev'][pkg_name]
-                            print(f"Excluded {pkg_name}@{version if version else 'all versions'} from composer.json require-dev")
-                            modified = True
+                modified = package_exclusions.remove_excluded(EXCLUDE_INDEX, 'composer', data['require-dev'], 'composer.json require-dev') or modified
         
         if modified:
             # Create a filename based on the original filename without the full path
@@ -811,12 +790,118 @@ def process_composer_json(file_path, temp_dir):
         print(f"Error processing composer.json {file_path}: {e}")
         return file_path
 
-def zip_folder(folder_to_zip, output_folder='src', remove_dev_dependencies=True):
+# Define the patterns to include in the zip file and the function processing each of them
+manifest_handlers = [
+    ('package.json', process_package_json),
+    ('packages.config', process_packages_config),
+    ('*.csproj', process_csproj),
+    ('requirements.txt', process_requirements_txt),
+    ('pom.xml', process_pom_xml),
+    ('composer.json', process_composer_json),
+    ('Directory.Packages.props', process_directory_packages)
+]
+match_manifest = manifest_walk.compile_manifest_matcher(manifest_handlers)
+
+def scan_directory(directory, rules):
+    # Return the (manifest file, handler) pairs, the (sub directory, ignore rules) pairs and the skipped directory and file counts of a single directory
+    manifest_files = []
+    sub_directories = []
+    skipped_dirs = 0
+    skipped_files = 0
+    try:
+        if use_ignore_files:
+            rules = manifest_walk.load_ignore_rules(directory, rules)
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if manifest_walk.is_pruned(directory, entry.name, prune_directories, rules):
+                        skipped_dirs += 1
+                    else:
+                        sub_directories.append((entry.path, rules))
+                else:
+                    handler = match_manifest(entry.name)
+                    if handler is None or not entry.is_file():
+                        continue
+                    if rules and manifest_walk.is_ignored(entry.path, False, rules):
+                        skipped_files += 1
+                    else:
+                        manifest_files.append((entry.path, handler))
+    except OSError as e:
+        print(f"Error reading directory {directory}: {e}")
+    return manifest_files, sub_directories, skipped_dirs, skipped_files
+
+def discover_manifests(folder_to_zip, executor):
+    # Walk the tree level by level, the directories of each level are scanned on the worker pool
+    manifest_files = []
+    stats = manifest_walk.new_stats()
+    directories = [(folder_to_zip, [])]
+    while directories:
+        next_directories = []
+        for files, sub_directories, skipped_dirs, skipped_files in executor.map(lambda directory: scan_directory(*directory), directories):
+            manifest_files.extend(files)
+            next_directories.extend(sub_directories)
+            stats['skipped_dirs'] += skipped_dirs
+            stats['skipped_files'] += skipped_files
+        directories = next_directories
+    manifest_walk.print_stats(stats)
+
+    # Sort by relative path so the zip content does not depend on the walk order
+    return sorted(manifest_files, key=lambda manifest_file: os.path.relpath(manifest_file[0], folder_to_zip))
+
+def process_manifest(file_path, handler, folder_to_zip, temp_dir, settings_hash=None):
+    # Process one manifest file, returns the (file path, name in zip) entries to add to the zip and whether they came from the cache
+    file = os.path.basename(file_path)
+    zip_entries = []
+    cached = False
+    try:
+        rel_path = os.path.relpath(file_path, folder_to_zip)
+
+        # Unchanged manifests with unchanged settings are copied from the cache without parsing
+        cache_key = manifest_cache.get_cache_key(file_path, handler.__name__, settings_hash) if manifest_cache_dir else None
+        cache_entry = manifest_cache.load_entry(manifest_cache_dir, cache_key)
+        if cache_entry is not None:
+            cached_files = cache_entry['files']
+            if 'converted.csproj' in cached_files:
+                zip_entries.append((cached_files['converted.csproj'], 'converted.csproj'))
+            zip_entries.append((cached_files[file] if cache_entry['modified'] else file_path, rel_path))
+            return zip_entries, True
+
+        # Each manifest gets its own temporary directory so files with the same name do not collide
+        os.makedirs(temp_dir, exist_ok=True)
+        
+        # Process the manifest with the handler of its file type to exclude packages
+        processed_file_path = handler(file_path, temp_dir)
+        cache_files = {}
+
+        if handler is process_directory_packages:
+            # Also convert to csproj
+            converted_csproj = os.path.join(temp_dir, 'converted.csproj')
+            convert_directory_packages_to_csproj(processed_file_path, converted_csproj)
+            zip_entries.append((converted_csproj, 'converted.csproj'))
+            if os.path.exists(converted_csproj):
+                cache_files['converted.csproj'] = converted_csproj
+        
+        zip_entries.append((processed_file_path, rel_path))
+
+        modified = processed_file_path != file_path
+        if modified:
+            cache_files[file] = processed_file_path
+        manifest_cache.store_entry(manifest_cache_dir, cache_key, modified, cache_files)
+
+    except Exception as e:
+        print(f"Error processing file {file}: {e}")
+
+    return zip_entries, cached
+
+def zip_folder(folder_to_zip, output_folder='src', remove_dev_dependencies=True, workers=None, reproducible=False):
     try:
         # Set the global REMOVE_DEV_DEPENDENCIES flag
         global REMOVE_DEV_DEPENDENCIES
         REMOVE_DEV_DEPENDENCIES = remove_dev_dependencies
         print(f"Remove development dependencies setting: {REMOVE_DEV_DEPENDENCIES}")
+
+        # Cached manifests are only reused with the same exclusion list and dev dependencies setting
+        settings_hash = manifest_cache.hash_settings(EXCLUDE_PACKAGES, REMOVE_DEV_DEPENDENCIES)
         
         # Get the current working directory
         current_directory = os.getcwd()
@@ -835,49 +920,35 @@ def zip_folder(folder_to_zip, output_folder='src', remove_dev_dependencies=True)
         temp_dir = tempfile.mkdtemp(prefix="sca_modified_")
         
         try:
-            # Create the zip file
-            with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(folder_to_zip):
-                    for file in files:
-                        try:
-                            # Check if the file matches any of the patterns
-                            if any(fnmatch.fnmatch(file, pattern) for pattern in manifest_patterns):
-                                file_path = os.path.join(root, file)
-                                rel_path = os.path.relpath(file_path, folder_to_zip)
-                                
-                                # Process different manifest file types to exclude packages
-                                processed_file_path = file_path
-                                
-                                if file == 'package.json':
-                                    processed_file_path = process_package_json(file_path, temp_dir)
-                                elif file == 'packages.config':
-                                    processed_file_path = process_packages_config(file_path, temp_dir)
-                                elif file.endswith('.csproj'):
-                                    processed_file_path = process_csproj(file_path, temp_dir)
-                                elif file == 'Directory.Packages.props':
-                                    processed_file_path = process_directory_packages(file_path, temp_dir)
-                                    # Also convert to csproj
-                                    converted_csproj = os.path.join(temp_dir, 'converted.csproj')
-                                    convert_directory_packages_to_csproj(processed_file_path, converted_csproj)
-                                    zipf.write(converted_csproj, 'converted.csproj')
-                                elif file == 'requirements.txt':
-                                    processed_file_path = process_requirements_txt(file_path, temp_dir)
-                                elif file == 'pom.xml':
-                                    processed_file_path = process_pom_xml(file_path, temp_dir)
-                                elif file == 'composer.json':
-                                    processed_file_path = process_composer_json(file_path, temp_dir)
-                                
-                                # Add the processed file to the zip
-                                zipf.write(processed_file_path, rel_path)
-                            
-                        except Exception as e:
-                            print(f"Error processing file {file}: {e}")
+            # Discover and process the manifests on a worker pool, this thread is the only zip writer
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                manifest_files = discover_manifests(folder_to_zip, executor)
+                print(f"Found {len(manifest_files)} manifest files")
+
+                processed_manifests = executor.map(
+                    lambda indexed_file: process_manifest(*indexed_file[1], folder_to_zip, os.path.join(temp_dir, str(indexed_file[0])), settings_hash),
+                    enumerate(manifest_files)
+                )
+
+                # Create the zip file, entries are written in the sorted manifest order
+                cache_hits = 0
+                with archive_utils.open_zip(zip_file_path) as zipf:
+                    for zip_entries, cached in processed_manifests:
+                        cache_hits += cached
+                        for processed_file_path, arcname in zip_entries:
+                            try:
+                                archive_utils.add_file(zipf, processed_file_path, arcname, reproducible)
+                            except Exception as e:
+                                print(f"Error processing file {arcname}: {e}")
+                if manifest_cache_dir:
+                    print(f"Manifest cache: {cache_hits} of {len(manifest_files)} manifests reused")
                 
         finally:
             # Clean up temporary directory
             shutil.rmtree(temp_dir, ignore_errors=True)
                             
         # print(f"Successfully created zip file: {zip_file_path}")
+        archive_utils.print_digest(zip_file_path)
         return zip_file_path
 
     except Exception as e:
@@ -953,6 +1024,8 @@ def validate_csproj_dependencies(csproj_path):
 # main code
 #################################################
 def main():
+    global prune_directories, use_ignore_files, manifest_cache_dir
+
     # Initialize variables at the start to avoid UnboundLocalError
     zip_file_name = None  
     scan_status = 0
@@ -964,12 +1037,28 @@ def main():
         parser.add_argument("file_path", help="The path to the source folder to scan.")
         parser.add_argument("project_name", help="The name of the project.")
         parser.add_argument("--team_name", default="", help="Optional: The name of the team.")
+        parser.add_argument("--workers", type=int, default=None, help="Optional: Number of threads used to find and process manifest files.")
+        parser.add_argument("--prune_dirs", default=None, help="Optional: Comma separated directory names that are never scanned, replaces the default list.")
+        parser.add_argument("--no_ignore_files", action="store_true", help="Optional: Do not honor .gitignore and .scaignore files.")
+        parser.add_argument("--manifest_cache", default=manifest_cache_dir, help="Optional: Folder caching processed manifests between runs.")
+        parser.add_argument("--no_manifest_cache", action="store_true", help="Optional: Process every manifest without using the cache.")
+        parser.add_argument("--compression", choices=sorted(archive_utils.compression_methods), default=archive_utils.default_compression, help="Optional: Compression of the zip, 'auto' stores already compressed files as is.")
+        parser.add_argument("--compression_level", type=int, default=None, help="Optional: Compression level, 0-9 for deflated and 1-9 for bzip2.")
+        parser.add_argument("--reproducible", action="store_true", help="Optional: Create a byte for byte reproducible zip (sorted entries, fixed timestamps and permissions).")
+        parser.add_argument("--reuse_results", "--reuse-results", action="store_true", help="Optional: Skip the upload and reuse the last scan results when the manifests did not change.")
 
         args = parser.parse_args()
 
         source_folder = args.file_path
         project_name = args.project_name
         team_name = args.team_name
+
+        if args.prune_dirs is not None:
+            prune_directories = [name.strip() for name in args.prune_dirs.split(',') if name.strip()]
+        use_ignore_files = not args.no_ignore_files
+        manifest_cache_dir = None if args.no_manifest_cache else args.manifest_cache
+        archive_utils.default_compression = args.compression
+        archive_utils.default_compresslevel = args.compression_level
       
         if package_exclude_json:
             # Read package exclusion list from JSON file provided
@@ -984,11 +1073,11 @@ def main():
         if team_name:
             print(f"Team name = {team_name}")
 
-        zip_file_name = zip_folder(source_folder, 'src')
+        zip_file_name = zip_folder(source_folder, 'src', workers=args.workers, reproducible=args.reproducible)
 
         if zip_file_name and os.path.exists(zip_file_name):
             # If zip file is generated, proceed with scanning
-            scan_status = SCA_scan_packages(project_name, zip_file_name, team_name)
+            scan_status = SCA_scan_packages(project_name, zip_file_name, team_name, args.reuse_results)
         else:
             print("Error: Failed to create zip file or zip file not found")
             sys.exit(1)
@@ -1,9 +1,13 @@
+# Standalone script with its settings inline. It needs these local modules copied next to it:
+# archive_utils, json_stream, manifest_walk, package_exclusions and risk_reports.
 import requests
 import os
 import sys
 import json
-import zipfile
-import fnmatch
+import manifest_walk
+import archive_utils
+import risk_reports
+import package_exclusions
 import xml.etree.ElementTree as ET
 import time
 import shutil
@@ -21,6 +25,11 @@ proxy_servers = {
    'https': SCA_proxy
 }
 
+# Zip with sorted entries, fixed timestamps and permissions, see archive_utils.add_file
+reproducible_zip = False
+# Zip compression: 'deflated', 'stored', 'bzip2', 'lzma' or 'auto' (already compressed files are stored as is)
+archive_utils.default_compression = 'deflated'
+
 # Global exclude package list
 EXCLUDE_PACKAGES = [
     # Format: {"package": "package-name", "version": "version-to-exclude"}
@@ -29,15 +38,19 @@ EXCLUDE_PACKAGES = [
     # Example: {"package": "jquery", "version": "1.9.1"}
 ]
 
+# Lookup index of EXCLUDE_PACKAGES, rebuilt by load_exclude_packages, see package_exclusions
+EXCLUDE_INDEX = package_exclusions.build_exclude_index(EXCLUDE_PACKAGES)
+
 # Load exclude packages from JSON file if it exists
 def load_exclude_packages():
-    global EXCLUDE_PACKAGES
+    global EXCLUDE_PACKAGES, EXCLUDE_INDEX
     try:
         exclude_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exclude_packages.json')
         if os.path.exists(exclude_file):
             with open(exclude_file, 'r') as f:
                 EXCLUDE_PACKAGES = json.load(f)
                 print(f"Loaded {len(EXCLUDE_PACKAGES)} packages to exclude")
+        EXCLUDE_INDEX = package_exclusions.build_exclude_index(EXCLUDE_PACKAGES)
     except Exception as e:
         print(f"Error loading exclude packages: {e}")
 
@@ -250,54 +263,6 @@ def SCA_get_scan_status(scan_id, access_token=""):
         print('SCA_get_scan_status')
         return current_status
 
-def SCA_get_report(project_name, report_type, access_token=""):
-    if(not access_token):
-        access_token = SCA_get_access_token()
-
-    scan_id = SCA_get_project_latest_scan_id(project_name, access_token)
-    if scan_id:
-        try:
-            url = SCA_api_url + "/risk-management/risk-reports/" + scan_id + '/' + 'export?format=' + report_type + '&dataType[]=All'
-        
-            payload = {}
-            headers = {
-            'Authorization': 'Bearer ' + access_token
-            }
-
-            response = requests.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
-            pdf_content = response.content
-            if report_type.lower() == 'csv':
-                report_path = os.getcwd() + '\\' + project_name + '_SCA_report.zip'
-            else:    
-                report_path = os.getcwd() + '\\' + project_name + '_SCA_report.' + report_type
-            with open(report_path, 'wb') as f:
-                f.write(pdf_content)
-        except Exception as e:
-            print("Exception: SCA_get_report", str(e))
-            return ""
-        else:
-            print('SCA_get_report')
-            return report_path
-    else:
-        return ""
-
-
-def SCA_report_get_details_from_json(file_path):
-    try:
-        # Load JSON data from the file with explicit encoding
-        with open(file_path, encoding='utf-8') as file:
-            json_data = json.load(file)
-
-        high_vulnerability_count = json_data['RiskReportSummary']['HighVulnerabilityCount']
-        medium_vulnerability_count = json_data['RiskReportSummary']['MediumVulnerabilityCount']
-        resultUrl = SCA_url + '/#/projects/' + json_data['RiskReportSummary']['ProjectId']
-
-    except Exception as e:
-        print("Exception: SCA_report_get_high_vulnerabilities_count failed:", str(e))
-        return 0
-    else:
-        return resultUrl, high_vulnerability_count, medium_vulnerability_count
-
 def SCA_scan_packages(project_name, zip_manifest_file, team_name=None):
     access_token = SCA_get_access_token()
     if access_token:
@@ -321,10 +286,9 @@ def SCA_scan_packages(project_name, zip_manifest_file, team_name=None):
                         status = SCA_get_scan_status(scan_id, access_token)
                         print('scan status:' + status)
 
-                    report_path = SCA_get_report(project_name, 'json')
-                    resultUrl, high_vulnerability_count, medium_vulnerability_count = SCA_report_get_details_from_json(report_path)
+                    resultUrl, high_vulnerability_count, medium_vulnerability_count = risk_reports.get_report_details(
+                        requests.request, SCA_api_url, SCA_url, scan_id, access_token, proxies=proxy_servers, verify=False)
                     print('high vulnerabilities = ' + str(high_vulnerability_count))
-                    os.remove(report_path)
 
                     if(high_vulnerability_count > SCA_high_threshold):
                         return 1
@@ -342,31 +306,11 @@ def process_package_json(file_path, temp_dir):
         
         # Process dependencies
         if 'dependencies' in data:
-            orig_deps = data['dependencies'].copy()
-            for exclude in EXCLUDE_PACKAGES:
-                pkg_name = exclude['package']
-                version = exclude['version']
-                
-                if pkg_name in data['dependencies']:
-                    # If version is empty or matches the dependency version
-                    if not version or data['dependencies'][pkg_name] == version or data['dependencies'][pkg_name].strip('^~>=<') == version.strip('^~>=<'):
-                        del data['dependencies'][pkg_name]
-                        print(f"Excluded {pkg_name}@{version if version else 'all versions'} from dependencies")
-                        modified = True
+            modified = package_exclusions.remove_excluded(EXCLUDE_INDEX, 'npm', data['dependencies'], 'dependencies')
         
         # Process devDependencies
         if 'devDependencies' in data:
-            orig_dev_deps = data['devDependencies'].copy()
-            for exclude in EXCLUDE_PACKAGES:
-                pkg_name = exclude['package']
-                version = exclude['version']
-                
-                if pkg_name in data['devDependencies']:
-                    # If version is empty or matches the dependency version
-                    if not version or data['devDependencies'][pkg_name] == version or data['devDependencies'][pkg_name].strip('^~>=<') == version.strip('^~>=<'):
-                        del data['devDependencies'][pkg_name]
-                        print(f"Excluded {pkg_name}@{version if version else 'all versions'} from devDependencies")
-                        modified = True
+            modified = package_exclusions.remove_excluded(EXCLUDE_INDEX, 'npm', data['devDependencies'], 'devDependencies') or modified
         
         if modified:
             # Write the modified file to temp directory
@@ -393,18 +337,13 @@ def process_packages_config(file_path, temp_dir):
         root = tree.getroot()
         modified = False
         
-        # Find and remove excluded packages
-        for exclude in EXCLUDE_PACKAGES:
-            pkg_name = exclude['package']
-            version = exclude['version']
-            
-            for package in root.findall(".//package"):
-                if package.get('id') == pkg_name:
-                    # If version is empty or matches
-                    if not version or package.get('version') == version:
-                        root.remove(package)
-                        print(f"Excluded {pkg_name}@{version if version else 'all versions'} from packages.config")
-                        modified = True
+        # Find and remove excluded packages in a single pass
+        for package in root.findall("package"):
+            rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'nuget', package.get('id'), package.get('version'))
+            if rule:
+                root.remove(package)
+                print(f"Excluded {package.get('id')} ({rule['label']}) from packages.config")
+                modified = True
         
         if modified:
             # Write the modified file to temp directory
@@ -429,21 +368,14 @@ def process_csproj(file_path, temp_dir):
         root = tree.getroot()
         modified = False
         
-        # Find and remove excluded packages
-        for exclude in EXCLUDE_PACKAGES:
-            pkg_name = exclude['package']
-            version = exclude['version']
-            
-            for package_ref in root.findall(".//PackageReference"):
-                if package_ref.get('Include') == pkg_name:
-                    # If version is empty or matches
-                    if not version or package_ref.get('Version') == version:
-                        # Remove from parent
-                        parent = package_ref.getparent()
-                        if parent is not None:
-                            parent.remove(package_ref)
-                            print(f"Excluded {pkg_name}@{version if version else 'all versions'} from csproj")
-                            modified = True
+        # Find and remove excluded packages in a single pass, ElementTree elements do not know their parent
+        for item_group in root.findall(".//ItemGroup"):
+            for package_ref in item_group.findall("PackageReference"):
+                rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'nuget', package_ref.get('Include'), package_ref.get('Version'))
+                if rule:
+                    item_group.remove(package_ref)
+                    print(f"Excluded {package_ref.get('Include')} ({rule['label']}) from csproj")
+                    modified = True
         
         if modified:
             # Write the modified file to temp directory
@@ -468,21 +400,14 @@ def process_directory_packages(file_path, temp_dir):
         root = tree.getroot()
         modified = False
         
-        # Find and remove excluded packages
-        for exclude in EXCLUDE_PACKAGES:
-            pkg_name = exclude['package']
-            version = exclude['version']
-            
-            for package_version in root.findall(".//PackageVersion"):
-                if package_version.get('Include') == pkg_name:
-                    # If version is empty or matches
-                    if not version or package_version.get('Version') == version:
-                        # Remove from parent
-                        parent = package_version.getparent()
-                        if parent is not None:
-                            parent.remove(package_version)
-                            print(f"Excluded {pkg_name}@{version if version else 'all versions'} from Directory.Packages.props")
-                            modified = True
+        # Find and remove excluded packages in a single pass, ElementTree elements do not know their parent
+        for item_group in root.findall(".//ItemGroup"):
+            for package_version in item_group.findall("PackageVersion"):
+                rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'nuget', package_version.get('Include'), package_version.get('Version'))
+                if rule:
+                    item_group.remove(package_version)
+                    print(f"Excluded {package_version.get('Include')} ({rule['label']}) from Directory.Packages.props")
+                    modified = True
         
         if modified:
             # Write the modified file to temp directory
@@ -535,13 +460,11 @@ def process_requirements_txt(file_path, temp_dir):
             
             # Check if package should be excluded
             exclude_this = False
-            for exclude in EXCLUDE_PACKAGES:
-                if exclude['package'] == pkg_name:
-                    if not exclude['version'] or exclude['version'] == pkg_version:
-                        print(f"Excluded {pkg_name}@{pkg_version if pkg_version else 'all versions'} from requirements.txt")
-                        exclude_this = True
-                        modified = True
-                        break
+            rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'pypi', pkg_name, pkg_version)
+            if rule:
+                print(f"Excluded {pkg_name}@{pkg_version if pkg_version else 'all versions'} ({rule['label']}) from requirements.txt")
+                exclude_this = True
+                modified = True
             
             if not exclude_this:
                 new_lines.append(line)
@@ -571,27 +494,26 @@ def process_pom_xml(file_path, temp_dir):
         root = tree.getroot()
         # Handle default namespace in pom.xml
         namespaces = {'m': 'http://maven.apache.org/POM/4.0.0'}
+        ET.register_namespace('', namespaces['m'])
         modified = False
         
-        # Find and remove excluded dependencies
-        for exclude in EXCLUDE_PACKAGES:
-            pkg_name = exclude['package']
-            version = exclude['version']
-            
-            # Find dependencies with matching artifactId
-            for dependency in root.findall(".//m:dependencies/m:dependency", namespaces):
+        # Find and remove excluded dependencies in a single pass, each dependencies element is the parent of its entries
+        for dependencies in root.findall(".//m:dependencies", namespaces):
+            for dependency in dependencies.findall("m:dependency", namespaces):
                 artifact_id = dependency.find("m:artifactId", namespaces)
+                artifact_id_text = artifact_id.text if artifact_id is not None else "unknown"
                 
-                if artifact_id is not None and artifact_id.text == pkg_name:
-                    # If version is empty or matches
-                    dep_version = dependency.find("m:version", namespaces)
-                    if not version or (dep_version is not None and dep_version.text == version):
-                        # Remove from parent
-                        parent = dependency.getparent()
-                        if parent is not None:
-                            parent.remove(dependency)
-                            print(f"Excluded {pkg_name}@{version if version else 'all versions'} from pom.xml")
-                            modified = True
+                # Exclude entries match either the artifactId or groupId:artifactId
+                group_id = dependency.find("m:groupId", namespaces)
+                dep_version = dependency.find("m:version", namespaces)
+                dep_version_text = dep_version.text if dep_version is not None else ''
+                rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'maven', artifact_id_text, dep_version_text)
+                if rule is None and group_id is not None:
+                    rule = package_exclusions.find_exclusion(EXCLUDE_INDEX, 'maven', f"{group_id.text}:{artifact_id_text}", dep_version_text)
+                if rule:
+                    dependencies.remove(dependency)
+                    print(f"Excluded {artifact_id_text} ({rule['label']}) from pom.xml")
+                    modified = True
         
         if modified:
             # Write the modified file to temp directory
@@ -619,31 +541,11 @@ def process_composer_json(file_path, temp_dir):
         
         # Process require section
         if 'require' in data:
-            orig_deps = data['require'].copy()
-            for exclude in EXCLUDE_PACKAGES:
-                pkg_name = exclude['package']
-                version = exclude['version']
-                
-                if pkg_name in data['require']:
-                    # If version is empty or matches the dependency version
-                    if not version or data['require'][pkg_name] == version or data['require'][pkg_name].strip('^~>=<') == version.strip('^~>=<'):
-                        del data['require'][pkg_name]
-                        print(f"Excluded {pkg_name}@{version if version else 'all versions'} from composer.json require")
-                        modified = True
+            modified = package_exclusions.remove_excluded(EXCLUDE_INDEX, 'composer', data['require'], 'composer.json require')
         
         # Process require-dev section
         if 'require-dev' in data:
-            orig_dev_deps = data['require-dev'].copy()
-            for exclude in EXCLUDE_PACKAGES:
-                pkg_name = exclude['package']
-                version = exclude['version']
-                
-                if pkg_name in data['require-dev']:
-                    # If version is empty or matches the dependency version
-                    if not version or data['require-dev'][pkg_name] == version or data['require-dev'][pkg_name].strip('^~>=<') == version.strip('^~>=<'):
-                        del data['require-dev'][pkg_name]
-                        print(f"Excluded {pkg_name}@{version if version else 'all versions'} from composer.json require-dev")
-                        modified = True
+            modified = package_exclusions.remove_excluded(EXCLUDE_INDEX, 'composer', data['require-dev'], 'composer.json require-dev') or modified
         
         if modified:
             # Write the modified file to temp directory
@@ -728,7 +630,19 @@ def validate_csproj_dependencies(csproj_path):
         print(f"Error validating dependencies in {csproj_path}: {e}")
         return False
 
-def zip_folder(folder_to_zip, output_folder='src'):
+# Define the patterns to include in the zip file and the function processing each of them
+manifest_handlers = [
+    ('package.json', process_package_json),
+    ('packages.config', process_packages_config),
+    ('*.csproj', process_csproj),
+    ('requirements.txt', process_requirements_txt),
+    ('pom.xml', process_pom_xml),
+    ('composer.json', process_composer_json),
+    ('Directory.Packages.props', process_directory_packages)
+]
+match_manifest = manifest_walk.compile_manifest_matcher(manifest_handlers)
+
+def zip_folder(folder_to_zip, output_folder='src', reproducible=False):
     try:
         # Load the exclude package list at the start
         load_exclude_packages()
@@ -746,47 +660,34 @@ def zip_folder(folder_to_zip, output_folder='src'):
         zip_file_name = folder_name + '.zip'
         zip_file_path = os.path.join(output_folder_path, zip_file_name)
 
-        # Define the patterns to include in the zip file
-        patterns = ['package.json', 'packages.config', '*.csproj', 'requirements.txt', 'pom.xml', 'composer.json', 'Directory.Packages.props']
-
         # Create a temporary directory for modified files
         temp_dir = tempfile.mkdtemp(prefix="sca_modified_")
         
         try:
             # Create the zip file
-            with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            with archive_utils.open_zip(zip_file_path) as zipf:
                 for root, dirs, files in os.walk(folder_to_zip):
-                    for file in files:
+                    # Walk in sorted order so the entry order does not depend on the file system
+                    dirs.sort()
+                    for file in sorted(files):
                         try:
                             # Check if the file matches any of the patterns
-                            if any(fnmatch.fnmatch(file, pattern) for pattern in patterns):
+                            handler = match_manifest(file)
+                            if handler is not None:
                                 file_path = os.path.join(root, file)
                                 rel_path = os.path.relpath(file_path, folder_to_zip)
                                 
-                                # Process different manifest file types to exclude packages
-                                processed_file_path = file_path
+                                # Process the manifest with the handler of its file type to exclude packages
+                                processed_file_path = handler(file_path, temp_dir)
                                 
-                                if file == 'package.json':
-                                    processed_file_path = process_package_json(file_path, temp_dir)
-                                elif file == 'packages.config':
-                                    processed_file_path = process_packages_config(file_path, temp_dir)
-                                elif file.endswith('.csproj'):
-                                    processed_file_path = process_csproj(file_path, temp_dir)
-                                elif file == 'Directory.Packages.props':
-                                    processed_file_path = process_directory_packages(file_path, temp_dir)
+                                if handler is process_directory_packages:
                                     # Also convert to csproj
                                     converted_csproj = os.path.join(temp_dir, 'converted.csproj')
                                     convert_directory_packages_to_csproj(processed_file_path, converted_csproj)
-                                    zipf.write(converted_csproj, 'converted.csproj')
-                                elif file == 'requirements.txt':
-                                    processed_file_path = process_requirements_txt(file_path, temp_dir)
-                                elif file == 'pom.xml':
-                                    processed_file_path = process_pom_xml(file_path, temp_dir)
-                                elif file == 'composer.json':
-                                    processed_file_path = process_composer_json(file_path, temp_dir)
+                                    archive_utils.add_file(zipf, converted_csproj, 'converted.csproj', reproducible)
                                 
                                 # Add the processed file to the zip
-                                zipf.write(processed_file_path, rel_path)
+                                archive_utils.add_file(zipf, processed_file_path, rel_path, reproducible)
                             
                         except Exception as e:
                             print(f"Error processing file {file}: {e}")
@@ -796,6 +697,7 @@ def zip_folder(folder_to_zip, output_folder='src'):
             shutil.rmtree(temp_dir, ignore_errors=True)
                             
         print(f"Successfully created zip file: {zip_file_path}")
+        archive_utils.print_digest(zip_file_path)
         return zip_file_path
 
     except Exception as e:
@@ -824,7 +726,7 @@ def main():
         print('source folder =' + source_folder)
         print('project name =' + project_name)
 
-        zip_file_name = zip_folder(source_folder, 'src')
+        zip_file_name = zip_folder(source_folder, 'src', reproducible=reproducible_zip)
 
         if(zip_file_name != ""):
             # If zip file is generated, proceed with scanning
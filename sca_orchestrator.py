@@ -0,0 +1,198 @@
+import SCA_api
+import scaresolver
+import polling
+import project_cache
+import asyncio
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+def load_jobs(jobs_file):
+    """
+    Load scan jobs from a JSON file.
+
+    The file holds a list of objects with 'source_folder', 'project_name' and optional 'team_name',
+    or a list of [source_folder, project_name, team_name] entries.
+
+    Returns:
+        list: List of (source_folder, project_name, team_name) tuples
+    """
+    with open(jobs_file, 'r') as f:
+        entries = json.load(f)
+
+    jobs = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            jobs.append((entry['source_folder'], entry['project_name'], entry.get('team_name', '')))
+        else:
+            source_folder, project_name = entry[0], entry[1]
+            jobs.append((source_folder, project_name, entry[2] if len(entry) > 2 else ''))
+    return jobs
+
+async def run_in_thread(executor, running, func, *args):
+    # Like asyncio.to_thread, the future of the call is kept in running so that a cancelled job can wait for it
+    future = executor.submit(func, *args)
+    running[:] = [future]
+    return await asyncio.wrap_future(future)
+
+async def scan_project(source_folder, project_name, team_name, result, executor):
+    # upload -> scan -> poll -> report sequence of SCA_api.SCA_scan_packages, blocking calls run in worker threads
+    output_folder = tempfile.mkdtemp(prefix="sca_orchestrator_")
+    running = []
+    try:
+        zip_file_name = await run_in_thread(executor, running, scaresolver.zip_folder, source_folder, project_name, output_folder)
+        if not zip_file_name:
+            result['error'] = 'failed to create manifest zip'
+            return
+
+        access_token = await run_in_thread(executor, running, SCA_api.get_access_token)
+        if not access_token:
+            result['error'] = 'failed to get access token'
+            return
+
+        project_id = await run_in_thread(executor, running, SCA_api.SCA_get_project_id, project_name, access_token)
+        if project_id == '':
+            project_id = await run_in_thread(executor, running, SCA_api.SCA_create_project, project_name, access_token, team_name)
+        if project_id == '':
+            result['error'] = 'failed to get or create project'
+            return
+
+        upload_file_url = await run_in_thread(executor, running, SCA_api.SCA_get_upload_link, project_id, access_token)
+        if not upload_file_url:
+            result['error'] = 'failed to get upload link'
+            return
+
+        await run_in_thread(executor, running, SCA_api.SCA_upload_file, upload_file_url, zip_file_name, access_token)
+        scan_id = await run_in_thread(executor, running, SCA_api.SCA_scan_zip, project_id, upload_file_url, access_token)
+        if not scan_id:
+            result['error'] = 'failed to start scan'
+            return
+        result['scan_id'] = scan_id
+        project_cache.set_cached(SCA_api.SCA_cache_namespace, project_name, 'latest_scan_id', scan_id, SCA_api.SCA_project_cache_file)
+
+        if SCA_api.SCA_high_threshold is None or SCA_api.SCA_high_threshold <= 0:
+            result['status'] = 'scanned'
+            return
+
+        poll_settings = dict(SCA_api.SCA_poll_settings, deadline=None)
+        status, poll_stats = await polling.async_poll_until(
+            lambda: run_in_thread(executor, running, SCA_api.SCA_poll_scan_status, scan_id, access_token),
+            lambda status: status != 'Running',
+            name=project_name + ' scan status',
+            **poll_settings
+        )
+        result['polls'] = poll_stats['polls']
+        result['scan_status'] = status
+        if status != 'Done':
+            result['error'] = f"scan ended with status '{status}'" if status else 'failed to read scan status'
+            return
+
+        details = await run_in_thread(executor, running, SCA_api.SCA_get_report_details, project_name, access_token, scan_id)
+        if not details:
+            result['error'] = 'failed to read report'
+            return
+
+        result['result_url'], result['high'], result['medium'] = details
+        result['threshold_exceeded'] = result['high'] > SCA_api.SCA_high_threshold
+        result['status'] = 'failed' if result['threshold_exceeded'] else 'passed'
+    finally:
+        # A job cancelled by its deadline leaves its last call running, the folder goes once that call returned
+        if running and not running[-1].done():
+            running[-1].add_done_callback(lambda future: shutil.rmtree(output_folder, ignore_errors=True))
+        else:
+            shutil.rmtree(output_folder, ignore_errors=True)
+
+async def run_job(job, semaphore, job_deadline, executor):
+    source_folder, project_name, team_name = job
+    result = {
+        'project_name': project_name,
+        'source_folder': source_folder,
+        'status': 'error',
+        'scan_id': None,
+        'scan_status': None,
+        'high': None,
+        'medium': None,
+        'result_url': None,
+        'threshold_exceeded': False,
+        'polls': 0,
+        'elapsed': 0.0,
+        'error': None
+    }
+
+    async with semaphore:
+        start_time = time.monotonic()
+        try:
+            await asyncio.wait_for(scan_project(source_folder, project_name, team_name, result, executor), timeout=job_deadline)
+        except asyncio.TimeoutError:
+            result['status'] = 'timeout'
+            result['error'] = f'job did not finish within {job_deadline} seconds'
+        except Exception as e:
+            result['error'] = str(e)
+        result['elapsed'] = time.monotonic() - start_time
+
+    print(f"{project_name}: {result['status']}" + (f" ({result['error']})" if result['error'] else ''))
+    return result
+
+async def run_jobs(jobs, concurrency=8, job_deadline=900):
+    """
+    Scan many projects in parallel.
+
+    Args:
+        jobs (list): List of (source_folder, project_name, team_name) tuples
+        concurrency (int, optional): Maximum number of jobs in flight. Defaults to 8.
+        job_deadline (float, optional): Time limit for each job in seconds, None for no limit. Defaults to 900.
+
+    Returns:
+        list: One result dict per job, in the order of the jobs list
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    # Room for the calls of timed out jobs, which keep their thread until they return
+    with ThreadPoolExecutor(max_workers=concurrency * 2, thread_name_prefix='sca_orchestrator') as executor:
+        return await asyncio.gather(*(run_job(job, semaphore, job_deadline, executor) for job in jobs))
+
+def scan_projects(jobs, concurrency=8, job_deadline=900):
+    return asyncio.run(run_jobs(jobs, concurrency, job_deadline))
+
+#################################################
+# main code
+#################################################
+def main():
+    parser = argparse.ArgumentParser(description="Scan many projects with SCA in parallel")
+    parser.add_argument("jobs_file", help="JSON file with the list of jobs (source_folder, project_name, team_name).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum number of scans in flight.")
+    parser.add_argument("--deadline", type=float, default=900, help="Time limit for each job in seconds.")
+    parser.add_argument("--output", default="", help="Optional: JSON file to write the per-project results to.")
+
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.jobs_file)
+    print(f"jobs = {len(jobs)}")
+    print(f"concurrency = {args.concurrency}")
+    print(f"deadline = {args.deadline}")
+
+    results = scan_projects(jobs, max(1, args.concurrency), args.deadline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    passed = sum(1 for result in results if result['status'] in ('passed', 'scanned'))
+    failed = sum(1 for result in results if result['threshold_exceeded'])
+    print(f"{passed} passed, {failed} exceeded the high vulnerability threshold, {len(results) - passed - failed} errors")
+
+    if failed:
+        print('exit -1: high vulnerability threshold exceeded')
+        exit(-1)
+    elif passed < len(results):
+        print('exit 1: some scans failed or did not complete')
+        exit(1)
+    else:
+        print('exit 0: scans completed successfully')
+        exit(0)
+
+if __name__ == '__main__':
+    main()
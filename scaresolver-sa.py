@@ -1,9 +1,12 @@
+# Standalone script with its settings inline. It needs these local modules copied next to it:
+# archive_utils, json_stream, manifest_walk and risk_reports.
 import requests
 import os
 import sys
 import json
-import zipfile
-import fnmatch
+import manifest_walk
+import archive_utils
+import risk_reports
 import xml.etree.ElementTree as ET
 import time
 
@@ -19,6 +22,11 @@ proxy_servers = {
    'https': SCA_proxy
 }
 
+# Zip with sorted entries, fixed timestamps and permissions, see archive_utils.add_file
+reproducible_zip = False
+# Zip compression: 'deflated', 'stored', 'bzip2', 'lzma' or 'auto' (already compressed files are stored as is)
+archive_utils.default_compression = 'deflated'
+
 
 def SCA_get_access_token():
     try:
@@ -228,54 +236,6 @@ def SCA_get_scan_status(scan_id, access_token=""):
         print('SCA_get_scan_status')
         return current_status
 
-def SCA_get_report(project_name, report_type, access_token=""):
-    if(not access_token):
-        access_token = SCA_get_access_token()
-
-    scan_id = SCA_get_project_latest_scan_id(project_name, access_token)
-    if scan_id:
-        try:
-            url = SCA_api_url + "/risk-management/risk-reports/" + scan_id + '/' + 'export?format=' + report_type + '&dataType[]=All'
-        
-            payload = {}
-            headers = {
-            'Authorization': 'Bearer ' + access_token
-            }
-
-            response = requests.request("GET", url, headers=headers, data=payload, proxies=proxy_servers, verify=False)
-            pdf_content = response.content
-            if report_type.lower() == 'csv':
-                report_path = os.getcwd() + '\\' + project_name + '_SCA_report.zip'
-            else:    
-                report_path = os.getcwd() + '\\' + project_name + '_SCA_report.' + report_type
-            with open(report_path, 'wb') as f:
-                f.write(pdf_content)
-        except Exception as e:
-            print("Exception: SCA_get_report", str(e))
-            return ""
-        else:
-            print('SCA_get_report')
-            return report_path
-    else:
-        return ""
-
-
-def SCA_report_get_details_from_json(file_path):
-    try:
-        # Load JSON data from the file with explicit encoding
-        with open(file_path, encoding='utf-8') as file:
-            json_data = json.load(file)
-
-        high_vulnerability_count = json_data['RiskReportSummary']['HighVulnerabilityCount']
-        medium_vulnerability_count = json_data['RiskReportSummary']['MediumVulnerabilityCount']
-        resultUrl = SCA_url + '/#/projects/' + json_data['RiskReportSummary']['ProjectId']
-
-    except Exception as e:
-        print("Exception: SCA_report_get_high_vulnerabilities_count failed:", str(e))
-        return 0
-    else:
-        return resultUrl, high_vulnerability_count, medium_vulnerability_count
-
 def SCA_scan_packages(project_name, zip_manifest_file, team_name=None):
     access_token = SCA_get_access_token()
     if access_token:
@@ -295,10 +255,9 @@ def SCA_scan_packages(project_name, zip_manifest_file, team_name=None):
                         status = SCA_get_scan_status(scan_id, access_token)
                         print('scan status:' + status)
 
-                    report_path = SCA_get_report(project_name, 'json')
-                    resultUrl, high_vulnerability_count, medium_vulnerability_count = SCA_report_get_details_from_json(report_path)
+                    resultUrl, high_vulnerability_count, medium_vulnerability_count = risk_reports.get_report_details(
+                        requests.request, SCA_api_url, SCA_url, scan_id, access_token, proxies=proxy_servers, verify=False)
                     print('high vulnerabilities = ' + str(high_vulnerability_count))
-                    os.remove(report_path)
 
                     if(high_vulnerability_count > SCA_high_threshold):
                         return 1
@@ -371,7 +330,19 @@ def validate_csproj_dependencies(csproj_path):
         print(f"Error validating dependencies in {csproj_path}: {e}")
         return False
 
-def zip_folder(folder_to_zip, output_folder='src'):
+# Define patterns to include in the zip file and how each matching file is added
+manifest_handlers = [
+    ('package.json', 'copy'),
+    ('packages.config', 'copy'),
+    ('*.csproj', 'validate'),
+    ('requirements.txt', 'copy'),
+    ('pom.xml', 'copy'),
+    ('composer.json', 'copy'),
+    ('Directory.Packages.props', 'convert')
+]
+match_manifest = manifest_walk.compile_manifest_matcher(manifest_handlers)
+
+def zip_folder(folder_to_zip, output_folder='src', prune_dirs=None, use_ignore_files=True, reproducible=False):
     try:
         # Get the current working directory
         current_directory = os.getcwd()
@@ -386,39 +357,44 @@ def zip_folder(folder_to_zip, output_folder='src'):
         zip_file_name = folder_name + '.zip'
         zip_file_path = os.path.join(output_folder_path, zip_file_name)
 
-        # Define the patterns to include in the zip file
-        patterns = ['package.json', 'packages.config', '*.csproj', 'requirements.txt', 'pom.xml', 'composer.json', 'Directory.Packages.props']
-
         converted_csproj = None
 
+        # Directories that are never entered, see manifest_walk
+        if prune_dirs is None:
+            prune_dirs = manifest_walk.default_prune_dirs
+        walk_stats = manifest_walk.new_stats()
+
         # Create the zip file
-        with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(folder_to_zip):
-                for file in files:
+        with archive_utils.open_zip(zip_file_path) as zipf:
+            for root, dirs, files in manifest_walk.walk(folder_to_zip, prune_dirs, use_ignore_files, walk_stats):
+                # Walk in sorted order so the entry order does not depend on the file system
+                dirs.sort()
+                for file in sorted(files):
                     try:
                         # Check if the file matches any of the patterns
-                        if any(fnmatch.fnmatch(file, pattern) for pattern in patterns):
+                        handler = match_manifest(file)
+                        if handler is not None:
                             file_path = os.path.join(root, file)
 
                             # Handle Directory.Packages.props by converting it to .csproj
-                            if file == 'Directory.Packages.props':
+                            if handler == 'convert':
                                 converted_csproj = os.path.join(output_folder_path, 'converted.csproj')
                                 convert_directory_packages_to_csproj(file_path, converted_csproj)
 
                                 # Ensure the converted csproj is actually written to zip
                                 if os.path.exists(converted_csproj):
-                                    zipf.write(converted_csproj, 'converted.csproj')
+                                    archive_utils.add_file(zipf, converted_csproj, 'converted.csproj', reproducible)
                             
                             # Validate .csproj files to ensure all PackageReference elements have a Version attribute
-                            elif fnmatch.fnmatch(file, '*.csproj'):
+                            elif handler == 'validate':
                                 if validate_csproj_dependencies(file_path):
-                                    zipf.write(file_path, os.path.relpath(file_path, folder_to_zip))
+                                    archive_utils.add_file(zipf, file_path, os.path.relpath(file_path, folder_to_zip), reproducible)
                                 else:
                                     print(f"Excluding {file_path} from zip due to missing Version attributes in PackageReference.")
 
                             # Add other files directly to the zip
                             else:
-                                zipf.write(file_path, os.path.relpath(file_path, folder_to_zip))
+                                archive_utils.add_file(zipf, file_path, os.path.relpath(file_path, folder_to_zip), reproducible)
 
                     except Exception as e:
                         print(f"Error processing file {file} in zip creation: {e}")
@@ -427,7 +403,9 @@ def zip_folder(folder_to_zip, output_folder='src'):
             if converted_csproj and os.path.exists(converted_csproj):
                 os.remove(converted_csproj)
 
+        manifest_walk.print_stats(walk_stats)
         print(f"Successfully created zip file: {zip_file_path}")
+        archive_utils.print_digest(zip_file_path)
         return zip_file_path
 
     except Exception as e:
@@ -456,7 +434,7 @@ def main():
         print('source folder =' + source_folder)
         print('project name =' + project_name)
 
-        zip_file_name = zip_folder(source_folder, 'src')
+        zip_file_name = zip_folder(source_folder, 'src', reproducible=reproducible_zip)
 
         if(zip_file_name != ""):
             # If zip file is generated, proceed with scanning
@@ -3,8 +3,8 @@ import os
 import datetime
 import argparse
 import xml.etree.ElementTree as ET
-import zipfile
-import fnmatch
+import manifest_walk
+import archive_utils
 
 def convert_directory_packages_to_csproj(props_file_path, csproj_output_path):
     try:
@@ -71,7 +71,19 @@ def validate_csproj_dependencies(csproj_path):
         print(f"Error validating dependencies in {csproj_path}: {e}")
         return False
 
-def zip_folder(folder_to_zip, project_name, output_folder=None):
+# Define patterns to include in the zip file and how each matching file is added
+manifest_handlers = [
+    ('package.json', 'copy'),
+    ('packages.config', 'copy'),
+    ('*.csproj', 'validate'),
+    ('requirements.txt', 'copy'),
+    ('pom.xml', 'copy'),
+    ('composer.json', 'copy'),
+    ('Directory.Packages.props', 'convert')
+]
+match_manifest = manifest_walk.compile_manifest_matcher(manifest_handlers)
+
+def zip_folder(folder_to_zip, project_name, output_folder=None, prune_dirs=None, use_ignore_files=True, reproducible=False, in_memory=False):
     try:
 
         # Determine output folder path
@@ -89,44 +101,55 @@ def zip_folder(folder_to_zip, project_name, output_folder=None):
         if not os.path.exists(output_folder_path):
             os.makedirs(output_folder_path)
 
-        # Generate zip file name with current datetime
-        current_datetime = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        zip_file_name = f"{project_name}_{current_datetime}.zip"
+        # Generate zip file name with current datetime, reproducible zips get the same name for the same project
+        if reproducible:
+            zip_file_name = f"{project_name}.zip"
+        else:
+            current_datetime = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+            zip_file_name = f"{project_name}_{current_datetime}.zip"
         zip_file_path = os.path.join(output_folder_path, zip_file_name)
 
-        # Define patterns to include in the zip file
-        patterns = ['package.json', 'packages.config', '*.csproj', 'requirements.txt', 'pom.xml', 'composer.json', 'Directory.Packages.props']
-
         converted_csproj = None
 
+        # Directories that are never entered, see manifest_walk
+        if prune_dirs is None:
+            prune_dirs = manifest_walk.default_prune_dirs
+        walk_stats = manifest_walk.new_stats()
+
+        # Build the zip in memory (spilling to a temporary file when large) or in the output folder
+        zip_target = archive_utils.new_spooled_buffer() if in_memory else zip_file_path
+
         # Create the zip file
-        with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(folder_to_zip):
-                for file in files:
+        with archive_utils.open_zip(zip_target) as zipf:
+            for root, dirs, files in manifest_walk.walk(folder_to_zip, prune_dirs, use_ignore_files, walk_stats):
+                # Walk in sorted order so the entry order does not depend on the file system
+                dirs.sort()
+                for file in sorted(files):
                     try:
                         # Check if the file matches any of the patterns
-                        if any(fnmatch.fnmatch(file, pattern) for pattern in patterns):
+                        handler = match_manifest(file)
+                        if handler is not None:
                             file_path = os.path.join(root, file)
 
                             # Handle Directory.Packages.props by converting it to .csproj
-                            if file == 'Directory.Packages.props':
+                            if handler == 'convert':
                                 converted_csproj = os.path.join(output_folder_path, 'converted.csproj')
                                 convert_directory_packages_to_csproj(file_path, converted_csproj)
 
                                 # Ensure the converted csproj is written to the zip
                                 if os.path.exists(converted_csproj):
-                                    zipf.write(converted_csproj, 'converted.csproj')
+                                    archive_utils.add_file(zipf, converted_csproj, 'converted.csproj', reproducible)
                             
                             # Validate .csproj files to ensure all PackageReference elements have a Version attribute
-                            elif fnmatch.fnmatch(file, '*.csproj'):
+                            elif handler == 'validate':
                                 if validate_csproj_dependencies(file_path):
-                                    zipf.write(file_path, os.path.relpath(file_path, folder_to_zip))
+                                    archive_utils.add_file(zipf, file_path, os.path.relpath(file_path, folder_to_zip), reproducible)
                                 else:
                                     print(f"Excluding {file_path} from zip due to missing Version attributes in PackageReference.")
 
                             # Add other files directly to the zip
                             else:
-                                zipf.write(file_path, os.path.relpath(file_path, folder_to_zip))
+                                archive_utils.add_file(zipf, file_path, os.path.relpath(file_path, folder_to_zip), reproducible)
 
                     except Exception as e:
                         print(f"Error processing file {file} in zip creation: {e}")
@@ -135,8 +158,13 @@ def zip_folder(folder_to_zip, project_name, output_folder=None):
             if converted_csproj and os.path.exists(converted_csproj):
                 os.remove(converted_csproj)
 
-        print(f"Successfully created zip file: {zip_file_path}")
-        return zip_file_path
+        manifest_walk.print_stats(walk_stats)
+        if in_memory:
+            print(f"Successfully created in-memory zip: {archive_utils.get_size(zip_target)} bytes")
+        else:
+            print(f"Successfully created zip file: {zip_file_path}")
+        archive_utils.print_digest(zip_target)
+        return zip_target
 
     except Exception as e:
         print(f"Error zipping folder {folder_to_zip}: {e}")
@@ -169,6 +197,43 @@ def main():
             default=None, 
             help="Optional: The path of the temp folder to create zip. Defaults to 'manifest' in current directory."
         )
+        parser.add_argument(
+            "--prune_dirs", 
+            default=None, 
+            help="Optional: Comma separated directory names that are never scanned, replaces the default list."
+        )
+        parser.add_argument(
+            "--no_ignore_files", 
+            action="store_true", 
+            help="Optional: Do not honor .gitignore and .scaignore files."
+        )
+        parser.add_argument(
+            "--reproducible", 
+            action="store_true", 
+            help="Optional: Create a byte for byte reproducible zip (sorted entries, fixed timestamps and permissions, no datetime in the name)."
+        )
+        parser.add_argument(
+            "--compression", 
+            choices=sorted(archive_utils.compression_methods), 
+            default=archive_utils.default_compression, 
+            help="Optional: Compression of the zip, 'auto' stores already compressed files as is."
+        )
+        parser.add_argument(
+            "--compression_level", 
+            type=int, 
+            default=None, 
+            help="Optional: Compression level, 0-9 for deflated and 1-9 for bzip2."
+        )
+        parser.add_argument(
+            "--in_memory", 
+            action="store_true", 
+            help="Optional: Build the zip in memory and upload it without writing it to the temp folder."
+        )
+        parser.add_argument(
+            "--reuse_results", "--reuse-results", 
+            action="store_true", 
+            help="Optional: Skip the upload and reuse the last scan results when the manifests did not change."
+        )
         parser.add_argument(
             "--offline", 
             action="store_true", 
@@ -188,6 +253,9 @@ def main():
         offline = args.offline
         upload = args.upload
         temp_folder = args.temp_folder
+        prune_dirs = [name.strip() for name in args.prune_dirs.split(',') if name.strip()] if args.prune_dirs is not None else None
+        archive_utils.default_compression = args.compression
+        archive_utils.default_compresslevel = args.compression_level
 
         print(f"source folder = {source_folder}")
         print(f"project name = {project_name}")
@@ -203,11 +271,11 @@ def main():
             else:
                 raise ValueError("zip file path missing!")
         else:
-            zip_file_name = zip_folder(source_folder, project_name, temp_folder)
+            zip_file_name = zip_folder(source_folder, project_name, temp_folder, prune_dirs, not args.no_ignore_files, args.reproducible, args.in_memory and not offline)
 
         if zip_file_name and not offline:
             # If zip file is generated, proceed with scanning
-            scan_status = SCA_api.SCA_scan_packages(project_name, zip_file_name, team_name)
+            scan_status = SCA_api.SCA_scan_packages(project_name, zip_file_name, team_name=team_name, reuse_results=args.reuse_results)
 
     except SystemExit as e:
         print(f"SystemExit: {e}. Check if required arguments are provided.")
@@ -215,7 +283,9 @@ def main():
         print("Exception: main:", str(e))
     finally:
         # Delete the zip file after processing, but only if not offline
-        if zip_file_name and os.path.exists(zip_file_name) and not offline:
+        if hasattr(zip_file_name, 'close'):
+            zip_file_name.close()
+        elif zip_file_name and os.path.exists(zip_file_name) and not offline:
             os.remove(zip_file_name)
         
         if(scan_status == 1):
@@ -0,0 +1,128 @@
+import os
+import manifest_walk
+import archive_utils
+
+# Source files of each language, entries without a leading dot are exact file names
+language_extensions = {
+    'java': ['.java', '.jsp', '.jspx', '.jspf', '.tag', '.properties', '.xml', '.gradle', '.kt', '.kts', '.groovy', '.scala'],
+    'csharp': ['.cs', '.cshtml', '.razor', '.aspx', '.ascx', '.asax', '.ashx', '.asmx', '.master', '.config', '.xaml', '.csproj', '.sln'],
+    'vb': ['.vb', '.vbhtml', '.vbs', '.bas', '.cls', '.frm', '.vbproj'],
+    'javascript': ['.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx', '.vue', '.svelte', '.html', '.htm', '.json'],
+    'python': ['.py', '.pyw', '.pyi', '.cfg', '.ini', '.toml', '.html', '.jinja', '.j2'],
+    'php': ['.php', '.phtml', '.php3', '.php4', '.php5', '.inc', '.tpl', '.twig'],
+    'ruby': ['.rb', '.erb', '.rake', '.gemspec', 'Gemfile', 'Rakefile'],
+    'go': ['.go', 'go.mod'],
+    'cpp': ['.c', '.cc', '.cpp', '.cxx', '.h', '.hh', '.hpp', '.hxx', '.m', '.mm'],
+    'swift': ['.swift', '.plist', '.storyboard'],
+    'sql': ['.sql', '.pls', '.pkb', '.pks', '.plsql'],
+    'apex': ['.cls', '.trigger', '.page', '.component', '.object'],
+    'config': ['.yml', '.yaml', '.env', '.conf', 'Dockerfile', 'Jenkinsfile']
+}
+
+# Files the SAST engine does not scan: binaries, build outputs, media and archives
+binary_extensions = archive_utils.compressed_extensions | {
+    '.exe', '.dll', '.so', '.dylib', '.a', '.lib', '.o', '.obj', '.pdb', '.class', '.pyc', '.pyo',
+    '.bin', '.dat', '.db', '.sqlite', '.iso', '.img', '.dmg', '.msi',
+    '.bmp', '.tif', '.tiff', '.psd', '.svgz', '.ttf', '.otf', '.eot',
+    '.wav', '.flac', '.doc', '.xls', '.ppt', '.map', '.min.js'
+}
+
+# Dependency and version control folders. Unlike manifest_walk.default_prune_dirs, bin, obj, target and vendor
+# are kept, they often hold first-party sources (Rails bin/, checked in Go or PHP vendor/, Node bin/www)
+sast_prune_dirs = ['node_modules', '.git', '.svn', '.hg', '__pycache__', '.venv']
+
+def new_filter(languages=None, exclude_extensions=None, max_file_size=None, prune_dirs=None, use_ignore_files=False):
+    """
+    Build a source filter.
+
+    Args:
+        languages (list, optional): Keys of language_extensions to keep, all files when empty. Defaults to None.
+        exclude_extensions (list, optional): Extensions never zipped, in addition to binary_extensions. Defaults to None.
+        max_file_size (int, optional): Larger files are skipped, in bytes, no limit when empty. Defaults to None.
+        prune_dirs (list, optional): Directory names never entered. Defaults to sast_prune_dirs.
+        use_ignore_files (bool, optional): Honor .gitignore and .scaignore files. Defaults to False.
+
+    Returns:
+        dict: Filter for walk_files
+    """
+    include_names = None
+    if languages:
+        include_names = set()
+        for language in languages:
+            if language not in language_extensions:
+                raise ValueError(f"Unknown language '{language}', expected one of {', '.join(sorted(language_extensions))}")
+            include_names.update(language_extensions[language])
+
+    return {
+        'include_extensions': {name.lower() for name in include_names if name.startswith('.')} if include_names is not None else None,
+        'include_file_names': {name for name in include_names if not name.startswith('.')} if include_names is not None else None,
+        'exclude_extensions': binary_extensions | {extension.lower() for extension in (exclude_extensions or [])},
+        'max_file_size': max_file_size or None,
+        'prune_dirs': sast_prune_dirs if prune_dirs is None else prune_dirs,
+        'use_ignore_files': use_ignore_files
+    }
+
+def new_stats():
+    return {'files': 0, 'bytes': 0, 'skipped_dirs': 0, 'skipped_files': 0, 'filtered_files': 0, 'filtered_bytes': 0}
+
+def print_stats(stats):
+    print(f"Kept {stats['files']} files ({stats['bytes'] / (1024 * 1024):.1f} MB), "
+          f"filtered {stats['filtered_files']} files ({stats['filtered_bytes'] / (1024 * 1024):.1f} MB), "
+          f"skipped {stats['skipped_dirs']} directories and {stats['skipped_files']} ignored files")
+
+def get_extensions(file_name):
+    # '.min.js' and '.js' for 'app.min.js', so compound extensions can be excluded
+    lower_name = file_name.lower()
+    extensions = []
+    index = lower_name.find('.', 1)
+    while index != -1:
+        extensions.append(lower_name[index:])
+        index = lower_name.find('.', index + 1)
+    return extensions
+
+def is_included(file_name, source_filter):
+    extensions = get_extensions(file_name)
+    if any(extension in source_filter['exclude_extensions'] for extension in extensions):
+        return False
+    if source_filter['include_extensions'] is None:
+        return True
+    return (file_name in source_filter['include_file_names']
+            or (bool(extensions) and extensions[-1] in source_filter['include_extensions']))
+
+def walk_files(source_folder, source_filter=None, stats=None):
+    """
+    Walk a source folder and yield the files kept by the filter, pruned directories are never entered.
+
+    Args:
+        source_folder (str): Folder to walk
+        source_filter (dict, optional): Filter from new_filter, all files when None. Defaults to None.
+        stats (dict, optional): Counters from new_stats, updated with the kept and filtered files and bytes.
+
+    Yields:
+        str: File path relative to source_folder
+    """
+    if stats is None:
+        stats = new_stats()
+    if source_filter is None:
+        walk = os.walk(source_folder)
+    else:
+        walk = manifest_walk.walk(source_folder, source_filter['prune_dirs'], source_filter['use_ignore_files'], stats)
+
+    for root, _, files in walk:
+        for file in files:
+            file_path = os.path.join(root, file)
+            try:
+                file_size = os.path.getsize(file_path)
+            except OSError as e:
+                print(f"Error reading {file_path}: {e}")
+                continue
+
+            if source_filter is not None and (not is_included(file, source_filter) or
+                                              (source_filter['max_file_size'] and file_size > source_filter['max_file_size'])):
+                stats['filtered_files'] += 1
+                stats['filtered_bytes'] += file_size
+                continue
+
+            stats['files'] += 1
+            stats['bytes'] += file_size
+            yield os.path.relpath(file_path, source_folder)
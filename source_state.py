@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+import re
+import project_cache
+
+# State directory of incremental scans when none is configured, in the per-user cache directory
+default_state_dir = os.path.join(project_cache.get_user_cache_dir(), 'sast_source_state')
+
+def get_state_file(state_dir, project_name):
+    """Return the state file of a project, one JSON file per project in state_dir."""
+    safe_name = re.sub(r'[^A-Za-z0-9._-]', '_', project_name)
+    return os.path.join(state_dir, safe_name + '.json')
+
+def load_state(state_file):
+    """
+    Load the source state of a project.
+
+    Returns:
+        dict: {'files': {relative path: [size, mtime_ns, sha256]}, 'pending': {'scan_id', 'files'}}, empty when missing
+    """
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state_file, state):
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(state_file)), mode=0o700, exist_ok=True)
+        temp_file = state_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_file, state_file)
+    except OSError as e:
+        print(f"Warning: Could not write source state '{state_file}': {e}")
+
+def get_file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def scan_files(source_folder, rel_paths, previous_files=None):
+    """
+    Return the (size, mtime, hash) of each file.
+
+    Files whose size and mtime match previous_files keep their previous hash without being read again.
+
+    Args:
+        source_folder (str): Source folder
+        rel_paths (list): File paths relative to source_folder
+        previous_files (dict, optional): Files of the previous state. Defaults to None.
+
+    Returns:
+        dict: {relative path: [size, mtime_ns, sha256]}
+    """
+    previous_files = previous_files or {}
+    files = {}
+    for rel_path in rel_paths:
+        file_path = os.path.join(source_folder, rel_path)
+        try:
+            file_stat = os.stat(file_path)
+            key = rel_path.replace(os.sep, '/')
+            previous = previous_files.get(key)
+            if previous and previous[0] == file_stat.st_size and previous[1] == file_stat.st_mtime_ns:
+                files[key] = previous
+            else:
+                files[key] = [file_stat.st_size, file_stat.st_mtime_ns, get_file_hash(file_path)]
+        except OSError as e:
+            print(f"Error reading {file_path}: {e}")
+    return files
+
+def compare(previous_files, current_files):
+    """
+    Compare two file states by content hash.
+
+    Returns:
+        tuple: (added, modified, deleted) lists of relative paths
+    """
+    added = [path for path in current_files if path not in previous_files]
+    modified = [path for path in current_files if path in previous_files and current_files[path][2] != previous_files[path][2]]
+    deleted = [path for path in previous_files if path not in current_files]
+    return added, modified, deleted
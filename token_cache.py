@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Refresh tokens this many seconds before they expire
+refresh_margin = 60
+# Lifetime used when the token response has no expires_in
+default_expires_in = 300
+
+tokens = {}
+# Guards the dicts and the cache file, held only briefly
+tokens_lock = threading.Lock()
+# One lock per cache key, held while its token is requested so each key is requested once without blocking other keys
+key_locks = defaultdict(threading.Lock)
+# Cache key of each issued access token and the request function of each key, used by renew_token
+token_keys = {}
+token_requests = {}
+
+def load_token_file(cache_file):
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_token_file(cache_file, cached_tokens):
+    # Write to a private temp file first so the cache is never readable by other users or left half written
+    temp_file = cache_file + '.tmp'
+    fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(cached_tokens, f)
+    os.chmod(temp_file, 0o600)
+    os.replace(temp_file, cache_file)
+
+def get_key_lock(cache_key):
+    with tokens_lock:
+        return key_locks[cache_key]
+
+def is_valid(token):
+    return bool(token) and token.get('access_token') and token.get('expires_at', 0) - refresh_margin > time.time()
+
+def get_token(cache_key, request_token, cache_file=None):
+    """
+    Return a cached bearer token, requesting a new one shortly before it expires.
+
+    Args:
+        cache_key (str): Key identifying the token, e.g. service and scope
+        request_token (callable): Called without arguments, returns the token response JSON
+            with 'access_token' and 'expires_in', or None on failure
+        cache_file (str, optional): File that keeps tokens between runs. Defaults to None (in-process only).
+
+    Returns:
+        str: Access token, empty string on failure
+    """
+    with get_key_lock(cache_key):
+        with tokens_lock:
+            token_requests[cache_key] = request_token
+            token = tokens.get(cache_key)
+            if not is_valid(token) and cache_file:
+                token = load_token_file(cache_file).get(cache_key)
+                if is_valid(token):
+                    tokens[cache_key] = token
+            if is_valid(token):
+                token_keys[token['access_token']] = cache_key
+                return token['access_token']
+
+        response_json = request_token()
+        if not response_json or not response_json.get('access_token'):
+            return ""
+
+        token = {
+            'access_token': response_json['access_token'],
+            'expires_at': time.time() + int(response_json.get('expires_in') or default_expires_in)
+        }
+        with tokens_lock:
+            tokens[cache_key] = token
+            token_keys[token['access_token']] = cache_key
+
+            if cache_file:
+                try:
+                    cached_tokens = load_token_file(cache_file)
+                    cached_tokens[cache_key] = token
+                    save_token_file(cache_file, cached_tokens)
+                except OSError as e:
+                    print(f"Warning: Could not write token cache '{cache_file}': {e}")
+
+        return token['access_token']
+
+def invalidate_token(cache_key, cache_file=None, access_token=None):
+    # Drop a token the server rejected so the next call requests a new one, only when it is still access_token if given
+    with get_key_lock(cache_key), tokens_lock:
+        if access_token is None or tokens.get(cache_key, {}).get('access_token') == access_token:
+            tokens.pop(cache_key, None)
+        if cache_file:
+            cached_tokens = load_token_file(cache_file)
+            if access_token is not None and cached_tokens.get(cache_key, {}).get('access_token') != access_token:
+                return
+            if cached_tokens.pop(cache_key, None) is not None:
+                try:
+                    save_token_file(cache_file, cached_tokens)
+                except OSError as e:
+                    print(f"Warning: Could not write token cache '{cache_file}': {e}")
+
+def renew_token(access_token, cache_file=None):
+    """
+    Replace a token the server rejected with 401, e.g. revoked before its expiry or stale in the cache file.
+
+    The token is dropped from the cache and a new one is requested for the same cache key. When another
+    thread already replaced it, that newer token is returned.
+
+    Args:
+        access_token (str): Rejected token
+        cache_file (str, optional): Token cache file of the token. Defaults to None.
+
+    Returns:
+        str: New access token, empty string when the token was not issued by get_token or the request failed
+    """
+    with tokens_lock:
+        cache_key = token_keys.get(access_token)
+        request_token = token_requests.get(cache_key)
+    if cache_key is None or request_token is None:
+        return ""
+    invalidate_token(cache_key, cache_file, access_token)
+    return get_token(cache_key, request_token, cache_file)